@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; every worker then runs its own sweeper.
+    fcntl = None
+from constants import DATA_FILE
+from index import get_index
+from storage import load_data, record_changes, data_write_lock
+from attendance import load_attendance
+from student_views import build_student_view
+
+# --- Alert Engine ---
+# Early-warning alerts are worked out from one student's own data, one per rule:
+#   low_grade - overall grade under ALERT_GRADE_THRESHOLD
+#   declining - the mean of the last ALERT_TREND_WINDOW scores is at least
+#               ALERT_TREND_DROP points under the window before it
+#   missing   - class assignments past their due date with no score
+#   outlier   - overall grade ALERT_OUTLIER_Z standard deviations under the class
+#   low_attendance - attendance rate under ALERT_ATTENDANCE_THRESHOLD once at
+#               least ALERT_ATTENDANCE_MIN_DAYS days count towards it
+# evaluate_student_alerts() compares the findings with the student's current
+# alerts (one per student and rule, see alert_key()) and returns the put_alert /
+# remove_alert changes needed, so evaluating twice changes nothing. Grade,
+# assignment and student writes (including imports) evaluate only the students
+# they touch; sweep_overdue_alerts() catches work that has become overdue since
+# data['alertsCheckedThrough']. It runs in one background thread per deployment
+# (started with the server, then every ALERT_SWEEP_INTERVAL seconds; 0 turns it
+# off) and as `flask sweep-alerts`, never inside a request.
+# Alerts without a rule (added by hand) are left alone.
+ALERT_GRADE_THRESHOLD = 60
+ALERT_TREND_WINDOW = 3
+ALERT_TREND_DROP = 15
+ALERT_OUTLIER_Z = 2.0
+ALERT_OUTLIER_MIN_STUDENTS = 5
+ALERT_ATTENDANCE_THRESHOLD = 75
+ALERT_ATTENDANCE_MIN_DAYS = 5
+ALERT_RULES = ('low_grade', 'declining', 'missing', 'outlier', 'low_attendance')
+ALERT_SWEEP_INTERVAL = int(os.environ.get('ALERT_SWEEP_INTERVAL', 3600))
+ALERT_SWEEP_LOCK_FILE = os.path.splitext(DATA_FILE)[0] + '.sweep.lock'
+_alert_sweeper = {'started': False}
+_alert_sweeper_lock = threading.Lock()
+
+def alert_key(student_id, rule):
+    return f"{student_id}:{rule}"
+
+def _alert_findings(index, student, today, attendance):
+    findings = {}
+    grade = student.get('overallGrade')
+    graded = isinstance(grade, (int, float))
+    if graded and grade < ALERT_GRADE_THRESHOLD:
+        findings['low_grade'] = ('grade', f"Overall grade {grade}% is below {ALERT_GRADE_THRESHOLD}%")
+    view, assignments, _ = build_student_view(index, student, today, attendance)
+    percentages = [a['percentage'] for a in assignments if a['percentage'] is not None]
+    if len(percentages) >= 2 * ALERT_TREND_WINDOW:
+        recent = sum(percentages[-ALERT_TREND_WINDOW:]) / ALERT_TREND_WINDOW
+        earlier = sum(percentages[-2 * ALERT_TREND_WINDOW:-ALERT_TREND_WINDOW]) / ALERT_TREND_WINDOW
+        if earlier - recent >= ALERT_TREND_DROP:
+            findings['declining'] = ('trend', f"Scores fell from {earlier:.0f}% to {recent:.0f}% over the last {ALERT_TREND_WINDOW} assignments")
+    missing = [a for a in assignments if a['workStatus'] == 'Missing']
+    if missing:
+        titles = ', '.join(a.get('title', 'Untitled') for a in missing[:3])
+        more = f" and {len(missing) - 3} more" if len(missing) > 3 else ''
+        findings['missing'] = ('assignment', f"{len(missing)} overdue assignment(s): {titles}{more}")
+    class_stats = index.stats_for('class', student.get('classId'))
+    if graded and class_stats.graded >= ALERT_OUTLIER_MIN_STUDENTS and class_stats.std > 0:
+        z_score = (grade - class_stats.average) / class_stats.std
+        if z_score <= -ALERT_OUTLIER_Z:
+            findings['outlier'] = ('outlier', f"Overall grade is {-z_score:.1f} standard deviations below the class average of {class_stats.average:.0f}%")
+    attendance = view['attendance']
+    counted = attendance['present'] + attendance['late'] + attendance['absent']
+    if counted >= ALERT_ATTENDANCE_MIN_DAYS and attendance['rate'] < ALERT_ATTENDANCE_THRESHOLD:
+        findings['low_attendance'] = ('attendance', f"Attendance rate {attendance['rate']}% is below {ALERT_ATTENDANCE_THRESHOLD}% ({attendance['absent']} absence(s))")
+    return findings
+
+def evaluate_student_alerts(index, student_id, today=None, attendance=None):
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    student = index.students.get(student_id)
+    attendance = attendance if attendance is not None else load_attendance()
+    findings = _alert_findings(index, student, today, attendance) if student is not None else {}
+    changes = []
+    for rule in ALERT_RULES:
+        current = index.alerts_by_key.get(alert_key(student_id, rule))
+        if rule not in findings:
+            if current is not None:
+                changes.append({'op': 'remove_alert', 'alert_id': current['id']})
+            continue
+        alert_type, issue = findings[rule]
+        if current is not None and current.get('issue') == issue and current.get('classId') == student.get('classId'):
+            continue
+        changes.append({'op': 'put_alert', 'alert': {
+            'id': current['id'] if current is not None else index.next_id('a'),
+            'studentId': student_id,
+            'classId': student.get('classId'),
+            'type': alert_type,
+            'rule': rule,
+            'key': alert_key(student_id, rule),
+            'issue': issue,
+            'createdAt': current.get('createdAt', today) if current is not None else today,
+        }})
+    return changes
+
+def alert_changes(index, student_ids, today=None):
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    attendance = load_attendance()
+    changes = []
+    for student_id in student_ids:
+        changes.extend(evaluate_student_alerts(index, student_id, today, attendance))
+    return changes
+
+def apply_alert_changes(index, changes):
+    # For routes that save a full snapshot afterwards.
+    for change in changes:
+        if change['op'] == 'put_alert':
+            index.put_alert(change['alert'])
+        else:
+            index.delete_alert(change['alert_id'])
+
+def sweep_overdue_alerts():
+    today = datetime.now().strftime('%Y-%m-%d')
+    if load_data().get('alertsCheckedThrough') == today:
+        return
+    # Evaluating only reads; record_changes() takes the lock exclusively to apply.
+    with data_write_lock(exclusive=False):
+        data = load_data()
+        checked = data.get('alertsCheckedThrough')
+        if checked == today:
+            return
+        index = get_index(data)
+        if checked is None:
+            # First sweep: nothing has been checked yet, so look at everyone once.
+            student_ids = list(index.students)
+        else:
+            class_ids = {class_id for a in index.assignments.values()
+                         if checked <= str(a.get('dueDate') or '') < today for class_id in a.get('classIds', [])}
+            student_ids = [sid for class_id in class_ids for sid in index.students_by_class.get(class_id, {})]
+        changes = alert_changes(index, student_ids, today)
+        changes.append({'op': 'set_alerts_checked', 'date': today})
+        record_changes(data, changes)
+        return len(changes) - 1
+
+def _alert_sweep_loop():
+    if fcntl is not None:
+        # Only one worker sweeps: the others wait here and take over if it exits.
+        lock_file = open(ALERT_SWEEP_LOCK_FILE, 'a')
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    while True:
+        try:
+            sweep_overdue_alerts()
+        except Exception as e:
+            print(f"Error checking for overdue work: {e}")
+        time.sleep(ALERT_SWEEP_INTERVAL)
+
+def start_alert_sweeper():
+    if ALERT_SWEEP_INTERVAL <= 0 or _alert_sweeper['started']:
+        return
+    with _alert_sweeper_lock:
+        if not _alert_sweeper['started']:
+            _alert_sweeper['started'] = True
+            threading.Thread(target=_alert_sweep_loop, name='alert-sweep', daemon=True).start()
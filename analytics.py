@@ -0,0 +1,121 @@
+import math
+import itertools
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("WARNING: numpy not found. Class analytics will not work. Install with: pip install numpy")
+
+# --- Class Analytics ---
+# Vectorised over a students x assignments matrix of percentages (NaN where a
+# score is missing), filled column by column from data['grades']. Results are
+# plain JSON-ready dicts, cached on the index per data version (see
+# DataIndex.class_analytics). Needs numpy.
+ANALYTICS_BINS = list(range(0, 100, 10))
+ANALYTICS_QUANTILES = (('min', 0), ('p25', 0.25), ('median', 0.5), ('p75', 0.75), ('p90', 0.9), ('max', 1))
+
+def _stat(value):
+    value = float(value)
+    return None if math.isnan(value) else round(value, 1)
+
+def _stat_list(values):
+    return [None if math.isnan(v) else v for v in np.round(values, 1).tolist()]
+
+def _column_stats(values):
+    # Count, mean, population std and linear-interpolated quantiles of each column,
+    # ignoring NaN. Sorting puts NaN last, so a column's scores are its first
+    # `count` rows.
+    graded = ~np.isnan(values)
+    count = graded.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(graded, values, 0).sum(axis=0) / count
+        std = np.sqrt((np.where(graded, values - mean, 0) ** 2).sum(axis=0) / count)
+    stats = {'count': count, 'mean': mean, 'std': std}
+    ordered = np.sort(values, axis=0)
+    for name, q in ANALYTICS_QUANTILES:
+        if not len(ordered):
+            stats[name] = np.full(values.shape[1], np.nan)
+            continue
+        position = q * np.maximum(count - 1, 0)
+        lower = np.floor(position).astype(np.int64)
+        low = np.take_along_axis(ordered, lower[None, :], axis=0)[0]
+        high = np.take_along_axis(ordered, np.ceil(position).astype(np.int64)[None, :], axis=0)[0]
+        with np.errstate(invalid='ignore'):
+            stats[name] = np.where(count > 0, low + (high - low) * (position - lower), np.nan)
+    return stats
+
+def _stats_entry(stats, j):
+    entry = {name: _stat(stats[name][j]) for name in ('mean', 'std') + tuple(name for name, _ in ANALYTICS_QUANTILES)}
+    entry['count'] = int(stats['count'][j])
+    return entry
+
+def _distribution(values):
+    # Scores per 10-point bin for each column, as a (columns, 10) array.
+    graded = ~np.isnan(values)
+    bins = np.clip(values[graded] // 10, 0, 9).astype(np.int64)
+    column_ids = np.nonzero(graded)[1]
+    return np.bincount(column_ids * 10 + bins, minlength=values.shape[1] * 10).reshape(values.shape[1], 10)
+
+def compute_class_analytics(index, class_id):
+    students = sorted(index.class_students(class_id), key=lambda s: (s.get('name') or '').lower())
+    assignments = index.sorted_class_assignments(class_id)
+    row_of = {student.get('id'): i for i, student in enumerate(students)}
+    grades = index.data.get('grades', {})
+    scores = np.full((len(students), len(assignments)), np.nan)
+    for j, assignment in enumerate(assignments):
+        column = grades.get(assignment['id'])
+        if not isinstance(column, dict) or not column:
+            continue
+        rows = np.array(list(map(row_of.get, column, itertools.repeat(-1))), dtype=np.int64)
+        try:
+            values = np.fromiter(column.values(), dtype=float, count=len(column))
+        except (TypeError, ValueError):
+            values = np.array([v if isinstance(v, (int, float)) else np.nan for v in column.values()], dtype=float)
+        in_class = rows >= 0
+        scores[rows[in_class], j] = values[in_class]
+    points = np.array([a.get('totalPoints') if isinstance(a.get('totalPoints'), (int, float)) and a.get('totalPoints') > 0
+                       else np.nan for a in assignments], dtype=float)
+    percent = scores / points * 100
+
+    per_assignment = _column_stats(percent)
+    distribution = _distribution(percent)
+    assignment_stats = []
+    for j, assignment in enumerate(assignments):
+        entry = _stats_entry(per_assignment, j)
+        entry.update(id=assignment['id'], title=assignment.get('title'), type=assignment.get('type'),
+                     totalPoints=assignment.get('totalPoints'), distribution=distribution[j].tolist())
+        assignment_stats.append(entry)
+
+    types = [a.get('type') or 'Other' for a in assignments]
+    type_stats = {}
+    for assignment_type in dict.fromkeys(types):
+        mask = np.array([t == assignment_type for t in types])
+        type_summary = _column_stats(percent[:, mask].reshape(-1, 1))
+        type_stats[assignment_type] = {'count': int(type_summary['count'][0]), 'mean': _stat(type_summary['mean'][0])}
+
+    # Each student's mean percentage, and how far it sits from the class mean in
+    # standard deviations.
+    graded = ~np.isnan(percent)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(graded, percent, 0).sum(axis=1) / graded.sum(axis=1)
+    overall = _column_stats(averages[:, None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_scores = (averages - overall['mean'][0]) / overall['std'][0]
+    z_scores[~np.isfinite(z_scores)] = np.nan
+    student_stats = [{'id': student.get('id'), 'name': student.get('name'), 'average': average, 'zScore': z_score}
+                     for student, average, z_score in zip(students, _stat_list(averages), _stat_list(z_scores))]
+
+    overall_entry = _stats_entry(overall, 0)
+    overall_entry['distribution'] = _distribution(averages[:, None])[0].tolist()
+    return {
+        'class_id': class_id,
+        'student_count': len(students),
+        'assignment_count': len(assignments),
+        'graded_count': int(graded.sum()),
+        'bins': ANALYTICS_BINS,
+        'overall': overall_entry,
+        'assignments': assignment_stats,
+        'types': type_stats,
+        'students': student_stats,
+    }
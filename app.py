@@ -1,21 +1,42 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, make_response, flash, session
+from flask import Flask, Response, render_template, request, jsonify, send_file, redirect, url_for, make_response, flash, session, g
 from functools import wraps
-import json
 import os
 import csv
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import math
 import io
-try:
-    from fpdf import FPDF
-    from fpdf.enums import XPos, YPos
-    FPDF_AVAILABLE = True
-except ImportError:
-    FPDF_AVAILABLE = False
-    print("WARNING: fpdf2 not found. PDF generation will not work. Install with: pip install fpdf2")
+import threading
+import time
+import re
+import click
+from werkzeug.http import is_resource_modified
+from werkzeug.middleware.proxy_fix import ProxyFix
+from constants import (DATA_FILE, CAMPUSES, DEFAULT_CAMPUS, ASSIGNMENT_TYPES, COMPANY_COLORS, DEFAULT_DATE_SORT_KEY,
+                       DEFAULT_SKILLS)
+from passwords import hash_password, verify_password, password_needs_rehash
+from migrations import SCHEMA_VERSION, migrate_data
+from index import (GradeStats, FEEDBACK_CATEGORIES, get_index, get_status_from_grade, student_key, class_key,
+                   id_number)
+from storage import (STORAGE, SQLITE_FILE, DATA_WRITE_RETRIES, DataConflictError, JSONFileStorage, SQLiteStorage,
+                     load_data, save_data, record_changes, data_write_lock, invalidate_data_cache, create_default_data)
+from photos import scan_photo_directory, student_photo_path, apply_student_photos
+from analytics import NUMPY_AVAILABLE
+from attendance import ATTENDANCE_STATUSES, ATTENDANCE_CODES, ATTENDANCE_PAGE_DAYS, attendance_day, attendance_date, load_attendance
+from student_views import build_student_view
+from alerts import alert_changes, apply_alert_changes, sweep_overdue_alerts, start_alert_sweeper
+from reports import (FPDF_AVAILABLE, render_student_report_pdf, report_classes, build_report_jobs, render_report_jobs,
+                     render_merged_report, stream_report_zip, report_cache_key, read_cached_report, store_cached_report)
+from sessions import SESSION_FILE, SQLiteSessionInterface
+from imports import start_import_job, read_import_job, import_job_path
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+
+# Number of reverse proxies in front of the app (e.g. 1 behind a load balancer or
+# the Heroku router). Their X-Forwarded-* headers are trusted only when this is
+# set, so request.remote_addr is the real client and not the proxy.
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES, x_host=TRUSTED_PROXIES)
 
 # --- Security Decorators ---
 
@@ -43,46 +64,66 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# --- Constants ---
-if os.path.exists('/app/data'):
-    DATA_FILE = '/app/data/data.json'
-else:
-    DATA_FILE = 'data.json'
-
-CLASSES = ['6th', '7th', '8th', '9th']
-SECTIONS = ['Tata', 'Google', 'Infosys', 'Mahindra', 'Intel', 'Adobe', 'Verizon']
-CAMPUSES = ['Yamuna Campus', 'Subhash Nagar Campus']
-DEFAULT_CAMPUS = 'Yamuna Campus'
-
-ASSIGNMENT_TYPES = ['Project', 'Quiz', 'Lab', 'Homework', 'Exam', 'Participation', 'Assessment', 'Test', 'Other']
-ASSESSMENT_FILTER_TYPES = ['Quiz', 'Exam', 'Assessment', 'Test']
-COMPANY_COLORS = {
-    'Blue': 'bg-blue-500',
-    'Green': 'bg-green-500',
-    'Red': 'bg-red-500',
-    'Purple': 'bg-purple-500',
-    'Sky': 'bg-sky-500',
-    'Amber': 'bg-amber-500',
-    'Teal': 'bg-teal-500'
-}
-
-SECTION_COLOR_MAP = {
-    'Tata': 'bg-red-500',
-    'Google': 'bg-blue-500',
-    'Infosys': 'bg-purple-500',
-    'Mahindra': 'bg-green-500',
-    'Intel': 'bg-sky-500',
-    'Adobe': 'bg-red-600',
-    'Verizon': 'bg-amber-500'
-}
-DEFAULT_DATE_SORT_KEY = "9999-12-31"
-
-DEFAULT_SKILLS = {
-    "Concept Understanding": 1,
-    "Practical Implementation": 1,
-    "Programming & Logic": 1,
-    "Communication": 1
-}
+# 3. Data Write (For routes that load -> mutate -> save). Holds the write lock for
+# the whole request so concurrent edits cannot overwrite each other, and re-runs
+# the route against fresh data if a save detects a conflicting write.
+def data_write(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        for attempt in range(DATA_WRITE_RETRIES):
+            try:
+                with data_write_lock():
+                    return f(*args, **kwargs)
+            except DataConflictError:
+                invalidate_data_cache()
+        return jsonify({'success': False, 'message': 'The data was changed by another user. Please try again.'}), 409
+    decorated_function.writes_data = True
+    return decorated_function
+
+# 4. Data Conditional (For read-only endpoints). The body only depends on the
+# stored data and the user's role (rendered rows show admin controls), so the
+# version and role make a weak ETag and data['updatedAt'] serves as Last-Modified.
+# A client revalidating an unchanged version gets 304 Not Modified before the
+# route loads or serialises anything. If-None-Match wins over If-Modified-Since.
+# updatedAt has one-second resolution, so Last-Modified is only sent once that
+# second is over; a later write in the same second would otherwise look unchanged
+# to a client that only sends If-Modified-Since.
+def data_conditional(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        data = load_data()
+        etag = f"v{data.get('version', 0)}-{session.get('role', '')}"
+        updated_at = data.get('updatedAt')
+        last_modified = datetime.fromtimestamp(updated_at, timezone.utc) if updated_at and updated_at < int(time.time()) else None
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = make_response('', 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return decorated_function
+
+# 5. Data Read. Every other request holds the storage read lock from start to
+# finish, so the cached data and index cannot change while it reads them. Writers
+# that change them in place wait until it is done.
+@app.before_request
+def _begin_data_read():
+    view = app.view_functions.get(request.endpoint)
+    if view is not None and request.endpoint != 'static' and not getattr(view, 'writes_data', False):
+        load_data()
+        STORAGE.begin_read()
+        g.data_read = True
+
+@app.teardown_request
+def _end_data_read(exc):
+    if g.pop('data_read', False):
+        STORAGE.end_read()
 
 @app.context_processor
 def inject_global_constants():
@@ -91,225 +132,81 @@ def inject_global_constants():
         ALL_CAMPUSES=CAMPUSES
     )
 
-# --- Data Handling Functions ---
-def load_data():
-    if os.path.exists(DATA_FILE):
-        try:
-            if os.path.getsize(DATA_FILE) == 0:
-                return create_default_data()
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return ensure_data_structure(data)
-        except json.JSONDecodeError as e:
-            return create_default_data()
-        except Exception as e:
-            return create_default_data()
-    else:
-        return create_default_data()
-
-def ensure_data_structure(data):
-    if not isinstance(data, dict):
-        return create_default_data()
-    
-    required_keys = {'classes': [], 'students': [], 'alerts': [], 'assignments': [], 'grades': {}, 'users': [], 'feedbacks': []}
-    needs_save = False
-    
-    for key, default in required_keys.items():
-        current_value = data.get(key)
-        if current_value is None:
-            data[key] = default
-            needs_save = True
-        elif key == 'grades' and not isinstance(current_value, dict):
-            data[key] = default
-            needs_save = True
-        elif key != 'grades' and not isinstance(current_value, list):
-            data[key] = default
-            needs_save = True
-        elif isinstance(current_value, list):
-            valid_items = [item for item in current_value if isinstance(item, dict)]
-            if len(valid_items) != len(current_value):
-                data[key] = valid_items
-                needs_save = True
-
-    has_admin = any(isinstance(u, dict) and u.get('role') == 'admin' for u in data.get('users', []))
-    if not has_admin:
-        data['users'].append({
-            "id": "u1",
-            "username": "admin",
-            "password": "admin123",
-            "role": "admin",
-            "name": "Super Admin"
-        })
-        data['users'].append({
-            "id": "u2",
-            "username": "teacher",
-            "password": "teacher123",
-            "role": "faculty",
-            "name": "Demo Faculty"
-        })
-        needs_save = True
-
-    for student in data.get('students', []):
-        if isinstance(student, dict) and isinstance(student.get('skills'), list):
-            student['skills'] = DEFAULT_SKILLS.copy()
-            needs_save = True
-        elif isinstance(student, dict) and not isinstance(student.get('skills'), dict):
-            student['skills'] = DEFAULT_SKILLS.copy()
-            needs_save = True
-        
-        if isinstance(student, dict) and student.get('campus') == 'Main Campus':
-            student['campus'] = DEFAULT_CAMPUS
-            needs_save = True
-        elif isinstance(student, dict) and not student.get('campus'):
-            student['campus'] = DEFAULT_CAMPUS
-            needs_save = True
-            
-    for cls in data.get('classes', []):
-        if isinstance(cls, dict) and cls.get('campus') == 'Main Campus':
-            cls['campus'] = DEFAULT_CAMPUS
-            needs_save = True
-        elif isinstance(cls, dict) and not cls.get('campus'):
-            cls['campus'] = DEFAULT_CAMPUS
-            needs_save = True
-    
-    for assignment in data.get('assignments', []):
-        if isinstance(assignment, dict) and 'classId' in assignment:
-            class_id = assignment.pop('classId')
-            if class_id:
-                assignment['classIds'] = [class_id]
-            else:
-                assignment['classIds'] = []
-            needs_save = True
-        
-    PHOTO_DIR_NAME = 'student_photos'
-    PHOTO_DIR_PATH = os.path.join(app.static_folder, PHOTO_DIR_NAME)
-    
-    if os.path.exists(PHOTO_DIR_PATH):
-        found_photos = {}
-        try:
-            for filename in os.listdir(PHOTO_DIR_PATH):
-                file_lower = filename.lower()
-                if file_lower.endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
-                    student_uid = os.path.splitext(filename)[0].lower()
-                    found_photos[student_uid] = filename
-        except Exception as e:
-            pass
-
-        if found_photos:
-            students_list = data.get('students', [])
-            for student in students_list:
-                if isinstance(student, dict):
-                    student_uid_from_data = student.get('uid')
-                    if student_uid_from_data:
-                        student_uid_lower = student_uid_from_data.lower()
-                        if student_uid_lower in found_photos:
-                            new_photo_path = f"/static/{PHOTO_DIR_NAME}/{found_photos[student_uid_lower]}"
-                            if student.get('photo') != new_photo_path:
-                                student['photo'] = new_photo_path
-                                needs_save = True
-    else:
-        try:
-            os.makedirs(PHOTO_DIR_PATH)
-        except Exception as e:
-            pass
+# --- Grade Changes ---
+# Overall grades follow assignment scores: after scores change, the affected
+# students' computed grades are written as set_overall_grade changes (and their
+# alerts re-evaluated), so replaying the journal never needs to recompute
+# anything. Students with no scores keep the grade they have. The scores are
+# applied to the index first so the derived changes can be worked out, then
+# everything is recorded together (applying a change twice is harmless).
+def overall_grade_changes(index, student_ids):
+    changes = []
+    for student_id in student_ids:
+        student = index.students.get(student_id)
+        grade = index.computed_overall_grade(student_id)
+        if student is not None and grade is not None and student.get('overallGrade') != grade:
+            changes.append({'op': 'set_overall_grade', 'student_id': student_id, 'grade': grade})
+    return changes
+
+def record_grade_changes(data, changes):
+    index = get_index(data)
+    for change in changes:
+        index.set_grade(change['assignment_id'], change['student_id'], change.get('score'))
+    student_ids = list(dict.fromkeys(c['student_id'] for c in changes))
+    grade_changes = overall_grade_changes(index, student_ids)
+    for change in grade_changes:
+        index.set_overall_grade(index.students[change['student_id']], change['grade'])
+    record_changes(data, changes + grade_changes + alert_changes(index, student_ids))
+    return {c['student_id']: c['grade'] for c in grade_changes}
+
+def refresh_overall_grades(index, student_ids):
+    # For routes that save a full snapshot afterwards.
+    changes = overall_grade_changes(index, student_ids)
+    for change in changes:
+        index.set_overall_grade(index.students[change['student_id']], change['grade'])
+    return len(changes)
+
+# Called at login when the stored hash was made with another PASSWORD_HASH_METHOD.
+def upgrade_password_hash(user_id, password):
+    with data_write_lock():
+        data = load_data()
+        user = get_index(data).users.get(user_id)
+        if user is not None and password_needs_rehash(user) and verify_password(user, password):
+            user['passwordHash'] = hash_password(password)
+            save_data(data)
+
+# For the development server (`python app.py`): run pending migrations and pick
+# up student photos before serving. Deployments run `flask migrate-data` and
+# `flask rescan-photos` instead.
+def init_data_store():
+    with data_write_lock():
+        data = load_data()
+        changed = migrate_data(data) or STORAGE.migrated_from is not None
+        scan_photo_directory()
+        if apply_student_photos(data) or changed:
+            save_data(data)
+            STORAGE.migrated_from = None
+        return data
+
+def parse_assignment_score(grade_input, assignment):
+    if grade_input is None or grade_input == '':
+        return None
+    total_points = assignment.get('totalPoints', 100)
+    try:
+        grade_num = int(grade_input)
+        assert 0 <= grade_num <= total_points
+    except (ValueError, TypeError, AssertionError):
+        raise ValueError(f'Invalid score. Must be 0-{total_points} or empty.')
+    return grade_num
 
-    if needs_save:
-        save_data(data)
-    return data
-
-def create_default_data():
-    default_data = {"classes": [], "students": [], "alerts": [], "assignments": [], "grades": {}, "users": [], "feedbacks": []}
-    
-    default_data["users"] = [
-        {"id": "u1", "username": "admin", "password": "admin123", "role": "admin", "name": "Super Admin"},
-        {"id": "u2", "username": "teacher", "password": "teacher123", "role": "faculty", "name": "Demo Faculty"}
-    ]
-    
-    class_id_c = 1
-    student_id_c = 1
-    for grade in CLASSES:
-        for section in SECTIONS:
-            c_id = f"c{class_id_c}"
-            class_data = {
-                "id": c_id,
-                "name": f"Grade {grade}",
-                "section": section,
-                "studentCount": 5,
-                "color": SECTION_COLOR_MAP.get(section, 'bg-gray-500'),
-                "grade": grade,
-                "campus": DEFAULT_CAMPUS
-            }
-            default_data["classes"].append(class_data)
-            for i in range(1, 6):
-                s_id = f"s{student_id_c}"
-                student = {
-                    "id": s_id,
-                    "classId": c_id,
-                    "name": f"Student {student_id_c}",
-                    "email": f"student{student_id_c}@school.edu",
-                    "overallGrade": 70 + (student_id_c % 30),
-                    "status": "Active",
-                    "lastMilestone": "Initial Setup",
-                    "uid": f"UID{1000 + student_id_c}",
-                    "rollNumber": f"ROLL{student_id_c:03d}",
-                    "campus": DEFAULT_CAMPUS,
-                    "photo": f"/static/avatars/student{(student_id_c % 5) + 1}.jpg",
-                    "parentPhone": "+91 98765 43210",
-                    "joinDate": datetime.now().strftime('%Y-%m-%d'),
-                    "roboticsTeam": f"Team {section}",
-                    "skills": DEFAULT_SKILLS.copy()
-                }
-                student['status'] = get_status_from_grade(student['overallGrade'])
-                default_data["students"].append(student)
-                student_id_c += 1
-            class_id_c += 1
-    default_data["alerts"] = [
-        {"id": "a1", "studentId": "s5", "classId": "c1", "issue": "Low score on Quiz 1", "type": "grade"},
-        {"id": "a2", "studentId": "s12", "classId": "c3", "issue": "Overall grade dropped below 60%", "type": "grade"},
-        {"id": "a3", "studentId": "s25", "classId": "c5", "issue": "Project 'RoboDesign' overdue", "type": "assignment"}
-    ]
-    default_data["assignments"] = [
-        {"id": "as1", "classIds": ["c1"], "title": "Intro Circuit Lab", "dueDate": (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'), "totalPoints": 50, "type": "Lab"},
-        {"id": "as2", "classIds": ["c1", "c2"], "title": "Unit 1 Test", "dueDate": (datetime.now() + timedelta(days=5)).strftime('%Y-%m-%d'), "totalPoints": 100, "type": "Test"},
-        {"id": "as3", "classIds": ["c3"], "title": "Algorithm Quiz", "dueDate": (datetime.now() + timedelta(days=9)).strftime('%Y-%m-%d'), "totalPoints": 20, "type": "Quiz"}
-    ]
-    default_data["grades"] = {
-        "as1": {"s1": 40, "s2": 45, "s3": 35},
-        "as2": {"s1": 78, "s2": 85, "s4": 91, "s6": 72},
-        "as3": {"s11": 15, "s12": 18}
-    }
-    save_data(default_data)
-    return default_data
+# Started by the first request a server process handles, never on import, so
+# `flask` CLI commands (including `flask sweep-alerts`) run without it.
+@app.before_request
+def _start_background_tasks():
+    start_alert_sweeper()
 
-def save_data(data):
-    try:
-        if not isinstance(data.get('grades'), dict): data['grades'] = {}
-        if not isinstance(data.get('assignments'), list): data['assignments'] = []
-        if not isinstance(data.get('students'), list): data['students'] = []
-        if not isinstance(data.get('classes'), list): data['classes'] = []
-        if not isinstance(data.get('users'), list): data['users'] = []
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"Error saving data to {DATA_FILE}: {e}")
-
-def get_status_from_grade(grade):
-    if grade is None: return 'N/A'
-    if not isinstance(grade, (int, float)): return 'Invalid'
-    if grade >= 90: return 'Excellent'
-    if grade >= 70: return 'Good'
-    if grade >= 60: return 'Needs Help'
-    return 'At Risk'
-
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Helvetica', 'B', 12)
-        self.cell(0, 10, 'Robotics Academy - Student Report', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
-        self.ln(10)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Helvetica', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
+app.secret_key = os.environ.get('SECRET_KEY')
+app.session_interface = SQLiteSessionInterface(SESSION_FILE)
 
 # --- Routes ---
 
@@ -321,11 +218,13 @@ def login():
         password = request.form.get('password')
         
         data = load_data()
-        users = data.get('users', [])
-        
-        user = next((u for u in users if isinstance(u, dict) and u.get('username') == username and u.get('password') == password), None)
+        user = get_index(data).users_by_username.get(username)
         
-        if user:
+        if user and verify_password(user, password):
+            if password_needs_rehash(user):
+                upgrade_password_hash(user.get('id'), password)
+            session.clear()
+            session.regenerate()
             session['logged_in'] = True
             session['username'] = user.get('username')
             session['role'] = user.get('role', 'faculty')
@@ -347,92 +246,151 @@ def feedback_form():
     faculty_list = [u for u in data.get('users', []) if isinstance(u, dict) and u.get('role') == 'faculty']
     return render_template('feedback.html', faculty_members=faculty_list)
 
+# --- Feedback Intake ---
+# /api/submit_feedback is the one write path open without a login. Submissions are
+# throttled per client IP and per student UID with in-memory token buckets, then
+# recorded as a single add_feedback change (one journal append, or one row in
+# SQLite) under the write lock, so ids come from the index and never collide.
+# The journal's compaction folds them into the snapshot in batches.
+# The per-IP bucket keys on request.remote_addr: behind a proxy set TRUSTED_PROXIES,
+# or every client shares the proxy's address (and its bucket).
+FEEDBACK_IP_BURST = 120
+FEEDBACK_IP_PER_SECOND = 2.0
+FEEDBACK_UID_BURST = 10
+FEEDBACK_UID_PER_SECOND = 0.1
+
+class TokenBucketLimiter:
+    # Each key holds up to `capacity` tokens, refilled at `rate` per second; a
+    # request takes one. Buckets live in this process only (each gunicorn worker
+    # keeps its own), and the least recently used are dropped past max_keys.
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        # Returns 0 when allowed, otherwise the seconds until a token is free.
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+            return wait
+
+FEEDBACK_IP_LIMITER = TokenBucketLimiter(FEEDBACK_IP_BURST, FEEDBACK_IP_PER_SECOND)
+FEEDBACK_UID_LIMITER = TokenBucketLimiter(FEEDBACK_UID_BURST, FEEDBACK_UID_PER_SECOND)
+
+def _rate_limited(wait):
+    response = jsonify({'success': False, 'message': 'Too many submissions. Please wait a moment and try again.'})
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response, 429
+
 @app.route('/api/submit_feedback', methods=['POST'])
 def submit_feedback():
-    data = load_data()
-    feedback_data = request.json
+    wait = FEEDBACK_IP_LIMITER.take(request.remote_addr or '')
+    if wait:
+        return _rate_limited(wait)
+    feedback_data = request.get_json(silent=True) or {}
     
-    uid = feedback_data.get('uid', '').strip()
+    uid = str(feedback_data.get('uid') or '').strip()
     faculty_id = feedback_data.get('faculty_id')
     ratings = feedback_data.get('ratings', {})
-    comment = feedback_data.get('comment', '').strip()
+    comment = str(feedback_data.get('comment') or '').strip()
     
     if not uid or not faculty_id or not ratings:
         return jsonify({'success': False, 'message': 'Missing required fields.'}), 400
+    wait = FEEDBACK_UID_LIMITER.take(student_key(uid))
+    if wait:
+        return _rate_limited(wait)
         
-    student = next((s for s in data.get('students', []) if isinstance(s, dict) and s.get('uid', '').lower() == uid.lower()), None)
+    # Checked against the cached data first; only the duplicate check and the
+    # append need the write lock.
+    index = get_index(load_data())
+    student = index.students_by_uid.get(student_key(uid))
     if not student:
         return jsonify({'success': False, 'message': 'Invalid Student UID. Please check and try again.'}), 400
-        
-    existing_feedback = next((f for f in data.get('feedbacks', []) if f.get('uid', '').lower() == uid.lower() and f.get('faculty_id') == faculty_id), None)
-    if existing_feedback:
-        return jsonify({'success': False, 'message': 'You have already submitted an evaluation for this instructor.'}), 400
-
-    new_feedback = {
-        'id': f"fb{len(data.get('feedbacks', [])) + 1}",
-        'uid': uid,
-        'faculty_id': faculty_id,
-        'ratings': ratings,
-        'comment': comment,
-        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    if 'feedbacks' not in data:
-        data['feedbacks'] = []
-        
-    data['feedbacks'].append(new_feedback)
-    save_data(data)
+    faculty = index.users.get(faculty_id)
+    if not faculty or faculty.get('role') != 'faculty':
+        return jsonify({'success': False, 'message': 'Invalid instructor selected.'}), 400
+    if not isinstance(ratings, dict) or not all(isinstance(ratings.get(cat), int) and 1 <= ratings.get(cat) <= 5 for cat in FEEDBACK_CATEGORIES):
+        return jsonify({'success': False, 'message': 'Please provide a rating from 1 to 5 for every category.'}), 400
+
+    with data_write_lock():
+        data = load_data()
+        index = get_index(data)
+        if index.feedback_key(uid, faculty_id) in index.feedbacks_by_key:
+            return jsonify({'success': False, 'message': 'You have already submitted an evaluation for this instructor.'}), 400
+        new_feedback = {
+            'id': index.next_id('fb'),
+            'uid': uid,
+            'faculty_id': faculty_id,
+            'ratings': {cat: ratings[cat] for cat in FEEDBACK_CATEGORIES},
+            'comment': comment,
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        record_changes(data, [{'op': 'add_feedback', 'feedback': new_feedback}])
     
     return jsonify({'success': True, 'message': 'Thank you for your feedback!'})
 
+FEEDBACK_COMMENTS_PAGE = 10
+FEEDBACK_COMMENTS_MAX = 100
+
+def _feedback_period_arg(args):
+    period = (args.get('period') or 'all').strip()
+    return period if period == 'all' or re.fullmatch(r'\d{4}(-\d{2})?', period) else 'all'
+
+def comment_rows(comments):
+    return [{'text': fb.get('comment'), 'date': fb.get('date') or ''} for fb in comments]
+
 @app.route('/faculty_insights')
 @admin_required
 def faculty_insights():
     data = load_data()
+    index = get_index(data)
+    period = _feedback_period_arg(request.args)
     faculty_list = [u for u in data.get('users', []) if isinstance(u, dict) and u.get('role') == 'faculty']
-    feedbacks = data.get('feedbacks', [])
 
     insights = []
-    categories = ['knowledge', 'communication', 'approachability', 'punctuality', 'practical']
-
     for faculty in faculty_list:
         f_id = faculty.get('id')
-        f_feedbacks = [fb for fb in feedbacks if isinstance(fb, dict) and fb.get('faculty_id') == f_id]
-        
-        if not f_feedbacks:
-            insights.append({
-                'faculty': faculty,
-                'total_reviews': 0,
-                'averages': {cat: 0.0 for cat in categories},
-                'overall_average': 0.0,
-                'comments': []
-            })
-            continue
-        
-        sums = {cat: 0 for cat in categories}
-        for fb in f_feedbacks:
-            ratings = fb.get('ratings', {})
-            for cat in categories:
-                sums[cat] += int(ratings.get(cat, 0))
-        
-        count = len(f_feedbacks)
-        averages = {cat: round(sums[cat] / count, 1) for cat in categories}
-        overall_avg = round(sum(averages.values()) / len(categories), 1)
-        comments = [{'text': fb.get('comment'), 'date': fb.get('date')} for fb in f_feedbacks if fb.get('comment')]
-        
+        stats = index.faculty_feedback_stats(f_id, period)
+        comments, comment_total = index.faculty_comments(f_id, period, 0, FEEDBACK_COMMENTS_PAGE)
         insights.append({
             'faculty': faculty,
-            'total_reviews': count,
-            'averages': averages,
-            'overall_average': overall_avg,
-            'comments': comments
+            'total_reviews': stats.count,
+            'averages': stats.averages,
+            'overall_average': stats.overall_average,
+            'comments': comment_rows(comments),
+            'comment_total': comment_total
         })
 
-    return render_template('faculty_insights.html', insights=insights)
+    return render_template('faculty_insights.html', insights=insights, period=period,
+                           months=index.feedback_months(), comments_page_size=FEEDBACK_COMMENTS_PAGE)
+
+@app.route('/api/faculty/<faculty_id>/comments')
+@admin_required
+def faculty_feedback_comments(faculty_id):
+    data = load_data()
+    index = get_index(data)
+    if faculty_id not in index.users:
+        return jsonify({'success': False, 'message': 'Faculty not found'}), 404
+    period = _feedback_period_arg(request.args)
+    offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+    limit = min(max(request.args.get('limit', FEEDBACK_COMMENTS_PAGE, type=int) or FEEDBACK_COMMENTS_PAGE, 1), FEEDBACK_COMMENTS_MAX)
+    comments, total = index.faculty_comments(faculty_id, period, offset, limit)
+    return jsonify({'success': True, 'comments': comment_rows(comments), 'total': total, 'offset': offset})
 
 # --- NEW: Add Faculty API ---
 @app.route('/api/add_faculty', methods=['POST'])
 @admin_required
+@data_write
 def add_faculty():
     data = load_data()
     faculty_data = request.json
@@ -444,25 +402,17 @@ def add_faculty():
     if not name or not username or not password:
         return jsonify({'success': False, 'message': 'All fields are required.'}), 400
         
+    index = get_index(data)
     # Prevent duplicate usernames
-    if any(isinstance(u, dict) and u.get('username') == username for u in data.get('users', [])):
+    if username in index.users_by_username:
         return jsonify({'success': False, 'message': f'Username "{username}" is already taken.'}), 400
         
-    # Generate new user ID
-    highest_id_num = 0
-    for u in data.get('users', []):
-        if isinstance(u, dict) and u.get('id', '').startswith('u'):
-            try:
-                num = int(u['id'][1:])
-                highest_id_num = max(highest_id_num, num)
-            except ValueError:
-                continue
-    new_user_id = f"u{highest_id_num + 1}"
+    new_user_id = index.next_id('u')
     
     new_faculty = {
         'id': new_user_id,
         'username': username,
-        'password': password,
+        'passwordHash': hash_password(password),
         'role': 'faculty',
         'name': name
     }
@@ -471,11 +421,27 @@ def add_faculty():
         data['users'] = []
         
     data['users'].append(new_faculty)
+    index.add_user(new_faculty)
     save_data(data)
     
     return jsonify({'success': True, 'message': 'Faculty account created successfully!'})
 
 
+DASHBOARD_ALERT_LIMIT = 20
+
+def alert_rows(index, alerts):
+    rows = []
+    for alert in alerts:
+        student = index.students.get(alert.get('studentId'))
+        class_info = index.classes.get(alert.get('classId'))
+        if student and class_info:
+            alert_copy = alert.copy()
+            alert_copy['studentName'] = student.get('name', 'Unknown')
+            alert_copy['className'] = f"{class_info.get('name', '')} - {class_info.get('section', '')}"
+            rows.append(alert_copy)
+    rows.sort(key=lambda a: a.get('createdAt', ''), reverse=True)
+    return rows
+
 @app.route('/')
 @login_required
 def dashboard():
@@ -484,43 +450,43 @@ def dashboard():
     selected_section = request.args.get('section', '')
     all_classes = data.get('classes', [])
     filtered_classes = [c for c in all_classes if (not selected_grade or c.get('grade') == selected_grade) and (not selected_section or c.get('section') == selected_section)]
-    all_students = data.get('students', [])
-    total_students = len(all_students)
-    if total_students > 0:
-        valid_grades = [s.get('overallGrade', 0) for s in all_students if isinstance(s, dict) and isinstance(s.get('overallGrade'), (int, float))]
-        avg_grade = sum(valid_grades) / len(valid_grades) if valid_grades else 0
-        status_counts = {'Excellent': 0, 'Good': 0, 'Needs Help': 0, 'At Risk': 0, 'N/A': 0, 'Invalid': 0}
-        for s in all_students:
-            if isinstance(s, dict):
-                status = get_status_from_grade(s.get('overallGrade'))
-                if status not in status_counts: status = 'Invalid'
-                status_counts[status] = status_counts.get(status, 0) + 1
+    index = get_index(data)
+    if selected_grade and selected_section:
+        stats = GradeStats()
+        for c in filtered_classes:
+            stats.merge(index.stats_for('class', c.get('id')))
+    elif selected_grade:
+        stats = index.stats_for('grade', selected_grade)
+    elif selected_section:
+        stats = index.stats_for('section', selected_section)
     else:
-        avg_grade = 0
-        status_counts = {k: 0 for k in ['Excellent', 'Good', 'Needs Help', 'At Risk', 'N/A', 'Invalid']}
-    alerts_display = []
-    class_map = {c.get('id'): c for c in all_classes if isinstance(c, dict)}
-    student_map = {s.get('id'): s for s in all_students if isinstance(s, dict)}
-    for alert in data.get('alerts', []):
-        if not isinstance(alert, dict): continue
-        student = student_map.get(alert.get('studentId'))
-        class_info = class_map.get(alert.get('classId'))
-        if student and class_info:
-            alert_copy = alert.copy()
-            alert_copy['studentName'] = student.get('name', 'Unknown')
-            alert_copy['className'] = f"{class_info.get('name', '')} - {class_info.get('section', '')}"
-            alerts_display.append(alert_copy)
+        stats = index.stats_for('all')
+    total_students = stats.count
+    avg_grade = stats.average
+    status_counts = dict(stats.status_counts)
+    if selected_grade or selected_section:
+        alerts = [a for c in filtered_classes for a in index.alerts_by_class.get(c.get('id'), {}).values()]
+    else:
+        alerts = list(index.alerts.values())
+    alerts_display = alert_rows(index, alerts)
+    if selected_grade or selected_section:
+        attendance_ids = [sid for c in filtered_classes for sid in index.students_by_class.get(c.get('id'), {})]
+    else:
+        attendance_ids = list(index.students)
+    attendance = load_attendance().summary(attendance_ids)
     
-    available_grades = sorted(set(c.get('grade') for c in all_classes if c.get('grade')))
-    available_sections = sorted(set(c.get('section') for c in all_classes if c.get('section')))
-    available_campuses = sorted(set(c.get('campus') for c in all_classes if c.get('campus')))
+    available_grades = index.available('grade')
+    available_sections = index.available('section')
+    available_campuses = index.available('campus')
 
     return render_template('dashboard.html',
                            classes=filtered_classes,
                            all_classes=all_classes,
-                           alerts=alerts_display,
+                           alerts=alerts_display[:DASHBOARD_ALERT_LIMIT],
+                           alert_total=len(alerts_display),
                            total_students=total_students,
                            avg_grade=round(avg_grade),
+                           attendance_rate=attendance['rate'],
                            status_counts=status_counts,
                            selected_grade=selected_grade,
                            selected_section=selected_section,
@@ -529,21 +495,65 @@ def dashboard():
                            available_campuses=available_campuses,
                            COMPANY_COLORS=COMPANY_COLORS)
 
-@app.route('/students', methods=['GET'])
-@login_required
-def students():
-    data = load_data()
-    all_classes = data.get('classes', [])
-    all_students = data.get('students', [])
-    class_map = {c.get('id'): c for c in all_classes if isinstance(c, dict)}
+STUDENTS_PAGE_SIZE = 50
+STUDENTS_PAGE_MAX = 200
+STUDENT_SORT_KEYS = ('name', 'grade', 'class', 'uid', 'rollNumber')
+
+def _filter_arg(args, name):
+    value = (args.get(name) or '').strip()
+    return '' if value.lower() == 'all' else value
+
+def query_students(data, args):
+    index = get_index(data)
+    grade = _filter_arg(args, 'grade').lower()
+    section = _filter_arg(args, 'section').lower()
+    campus = _filter_arg(args, 'campus').lower()
+    status = _filter_arg(args, 'status')
+    query = (args.get('q') or '').strip()
+    sort_key = args.get('sort') if args.get('sort') in STUDENT_SORT_KEYS else 'name'
+    descending = args.get('order') == 'desc'
+    page = max(args.get('page', 1, type=int) or 1, 1)
+    per_page = min(max(args.get('per_page', STUDENTS_PAGE_SIZE, type=int) or STUDENTS_PAGE_SIZE, 1), STUDENTS_PAGE_MAX)
+    
+    # Narrow down by class first (there are far fewer classes than students),
+    # then by search match; status is checked while walking the sorted ids.
+    candidates = None
+    if grade or section or campus:
+        candidates = set()
+        for class_id, cls in index.classes.items():
+            if ((not grade or (cls.get('grade') or '').lower() == grade) and
+                    (not section or (cls.get('section') or '').lower() == section) and
+                    (not campus or (cls.get('campus') or '').lower() == campus)):
+                candidates.update(index.students_by_class.get(class_id, {}))
+    if query:
+        matched = set(index.search.search(query, len(index.students)))
+        candidates = matched if candidates is None else candidates & matched
+    
+    ordered = index.sorted_student_ids(sort_key)
+    start = (page - 1) * per_page
+    if candidates is None and not status:
+        total = len(ordered)
+        if descending:
+            page_ids = ordered[max(total - start - per_page, 0):max(total - start, 0)][::-1]
+        else:
+            page_ids = ordered[start:start + per_page]
+    else:
+        total = 0
+        page_ids = []
+        for student_id in (reversed(ordered) if descending else ordered):
+            if candidates is not None and student_id not in candidates:
+                continue
+            if status and get_status_from_grade(index.students[student_id].get('overallGrade')) != status:
+                continue
+            if start <= total < start + per_page:
+                page_ids.append(student_id)
+            total += 1
     
-    processed_students = []
-    for student in all_students:
-        if not isinstance(student, dict):
-            continue
+    page_students = []
+    for student_id in page_ids:
+        student = index.students[student_id]
         student_copy = student.copy()
-        class_info = class_map.get(student.get('classId'))
-        
+        class_info = index.classes.get(student.get('classId'))
         if class_info:
             student_copy['className'] = f"{class_info.get('name', '')} - {class_info.get('section', '')} ({class_info.get('campus', '')})"
             student_copy['gradeName'] = class_info.get('grade', 'unknown')
@@ -554,27 +564,52 @@ def students():
             student_copy['gradeName'] = 'unknown'
             student_copy['sectionName'] = 'unknown'
             student_copy['campusName'] = 'unknown'
-            
         student_copy['status'] = get_status_from_grade(student.get('overallGrade'))
-        processed_students.append(student_copy)
-    
-    available_grades = sorted(list(set(c.get('grade') for c in all_classes if c.get('grade'))))
-    available_sections = sorted(list(set(c.get('section') for c in all_classes if c.get('section'))))
-    available_campuses = sorted(list(set(c.get('campus') for c in all_classes if c.get('campus'))))
+        page_students.append(student_copy)
+    
+    return {
+        'students': page_students,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'has_more': start + len(page_students) < total,
+        'sort': sort_key,
+        'order': 'desc' if descending else 'asc',
+    }
+
+@app.route('/students', methods=['GET'])
+@login_required
+def students():
+    data = load_data()
+    index = get_index(data)
+    listing = query_students(data, request.args)
 
     response = make_response(render_template('students.html',
-                                           students=processed_students,
-                                           all_classes=all_classes,
-                                           available_grades=available_grades,
-                                           sections=available_sections,
-                                           available_campuses=available_campuses,
+                                           students=listing['students'],
+                                           listing=listing,
+                                           all_classes=data.get('classes', []),
+                                           available_grades=index.available('grade'),
+                                           sections=index.available('section'),
+                                           available_campuses=index.available('campus'),
                                            import_summary=None,
                                            import_errors=[]))
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     return response
 
+@app.route('/api/students', methods=['GET'])
+@login_required
+@data_conditional
+def api_students():
+    data = load_data()
+    listing = query_students(data, request.args)
+    if request.args.get('format') == 'html':
+        listing['html'] = render_template('student_rows.html', students=listing['students'], listing=listing)
+    listing['success'] = True
+    return jsonify(listing)
+
 @app.route('/api/get_sections', methods=['GET'])
 @login_required
+@data_conditional
 def get_sections():
     data = load_data()
     sections = sorted(set(c.get('section') for c in data.get('classes', []) if isinstance(c, dict) and c.get('section')))
@@ -582,6 +617,7 @@ def get_sections():
 
 @app.route('/api/get_classes', methods=['GET'])
 @login_required
+@data_conditional
 def get_classes():
     data = load_data()
     classes = data.get('classes', [])
@@ -589,9 +625,10 @@ def get_classes():
 
 @app.route('/api/get_class/<class_id>', methods=['GET'])
 @login_required
+@data_conditional
 def get_class(class_id):
     data = load_data()
-    class_data = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == class_id), None)
+    class_data = get_index(data).classes.get(class_id)
     if class_data:
         return jsonify(class_data)
     return jsonify({'error': 'Class not found'}), 404
@@ -599,6 +636,7 @@ def get_class(class_id):
 # --- ADMIN PROTECTED ROUTES ---
 @app.route('/add_class', methods=['POST'])
 @admin_required
+@data_write
 def add_class():
     data = load_data()
     class_data = request.json
@@ -611,18 +649,11 @@ def add_class():
         
     if class_data['color'] not in COMPANY_COLORS.values():
         return jsonify({'success': False, 'message': 'Invalid color selected'}), 400
-    if any(c.get('name') == class_data['name'] and c.get('section') == class_data['section'] and c.get('campus') == class_data['campus'] for c in data.get('classes', []) if isinstance(c, dict)):
+    index = get_index(data)
+    if class_key(class_data['name'], class_data['section'], class_data['campus']) in index.classes_by_key:
         return jsonify({'success': False, 'message': f"Class '{class_data['name']}' with section '{class_data['section']}' at '{class_data['campus']}' already exists"}), 400
     
-    highest_id_num = 0
-    for c in data.get('classes', []):
-        if isinstance(c, dict) and c.get('id', '').startswith('c'):
-            try:
-                num = int(c['id'][1:])
-                highest_id_num = max(highest_id_num, num)
-            except ValueError:
-                continue
-    new_class_id = f"c{highest_id_num + 1}"
+    new_class_id = index.next_id('c')
     
     grade_name = class_data['name'].replace('Grade ', '').strip()
 
@@ -636,11 +667,13 @@ def add_class():
         'studentCount': 0
     }
     data['classes'].append(new_class)
+    index.add_class(new_class)
     save_data(data)
     return jsonify({'success': True, 'class_id': new_class_id})
 
 @app.route('/edit_class/<class_id>', methods=['POST'])
 @admin_required
+@data_write
 def edit_class(class_id):
     data = load_data()
     class_data = request.json
@@ -654,54 +687,53 @@ def edit_class(class_id):
     if class_data['color'] not in COMPANY_COLORS.values():
         return jsonify({'success': False, 'message': 'Invalid color selected'}), 400
     
-    class_index = -1
-    for i, c in enumerate(data.get('classes', [])):
-        if isinstance(c, dict) and c.get('id') == class_id:
-            class_index = i
-            break
-    if class_index == -1:
+    index = get_index(data)
+    current_class = index.classes.get(class_id)
+    if not current_class:
         return jsonify({'success': False, 'message': 'Class not found'}), 404
     
-    if any(c.get('name') == class_data['name'] and c.get('section') == class_data['section'] and c.get('campus') == class_data['campus'] and c.get('id') != class_id for c in data.get('classes', []) if isinstance(c, dict)):
+    existing = index.classes_by_key.get(class_key(class_data['name'], class_data['section'], class_data['campus']))
+    if existing is not None and existing.get('id') != class_id:
         return jsonify({'success': False, 'message': f"Class '{class_data['name']}' with section '{class_data['section']}' at '{class_data['campus']}' already exists"}), 400
     
     grade_name = class_data['name'].replace('Grade ', '').strip()
 
-    data['classes'][class_index].update({
+    index.remove_class(current_class)
+    current_class.update({
         'name': class_data['name'].strip(),
         'section': class_data['section'].strip(),
         'campus': class_data['campus'].strip(),
         'color': class_data['color'],
         'grade': grade_name
     })
+    index.add_class(current_class)
     save_data(data)
     return jsonify({'success': True, 'class_id': class_id})
 
 @app.route('/delete_class/<class_id>', methods=['POST'])
 @admin_required
+@data_write
 def delete_class(class_id):
     data = load_data()
-    class_index = -1
-    for i, c in enumerate(data.get('classes', [])):
-        if isinstance(c, dict) and c.get('id') == class_id:
-            class_index = i
-            break
-    if class_index == -1:
+    index = get_index(data)
+    current_class = index.classes.get(class_id)
+    if not current_class:
         return jsonify({'success': False, 'message': 'Class not found'}), 404
     
-    student_count = 0
-    for s in data.get('students', []):
-        if isinstance(s, dict) and s.get('classId') == class_id:
-            student_count += 1
-            break
-            
-    if student_count > 0:
+    if index.students_by_class.get(class_id):
         return jsonify({'success': False, 'message': 'Cannot delete class with enrolled students. Please reassign students first.'}), 400
         
-    data['classes'].pop(class_index)
-    data['assignments'] = [a for a in data.get('assignments', []) if not (isinstance(a, dict) and a.get('classIds') == [class_id])]
-    deleted_assignment_ids = {a.get('id') for a in data.get('assignments', []) if isinstance(a, dict) and a.get('classIds') == [class_id]}
-    data['grades'] = {k: v for k, v in data.get('grades', {}).items() if k not in deleted_assignment_ids}
+    data['classes'] = [c for c in data.get('classes', []) if c is not current_class]
+    index.remove_class(current_class)
+    deleted_assignments = [a for a in index.class_assignments(class_id) if a.get('classIds') == [class_id]]
+    deleted_assignment_ids = {a.get('id') for a in deleted_assignments}
+    data['assignments'] = [a for a in data.get('assignments', []) if a.get('id') not in deleted_assignment_ids]
+    affected_students = set()
+    for assignment in deleted_assignments:
+        index.remove_assignment(assignment)
+        affected_students.update(index.remove_assignment_grades(assignment.get('id')))
+    refresh_overall_grades(index, affected_students)
+    apply_alert_changes(index, alert_changes(index, affected_students))
     
     save_data(data)
     return jsonify({'success': True, 'message': 'Class deleted successfully'})
@@ -712,7 +744,7 @@ def assignments():
     data = load_data()
     all_assignments_raw = data.get('assignments', [])
     all_classes = data.get('classes', [])
-    class_map = {c.get('id'): c for c in all_classes if isinstance(c, dict)}
+    class_map = get_index(data).classes
     all_grades = data.get('grades', {})
     if not isinstance(all_grades, dict):
         all_grades = {}
@@ -722,6 +754,7 @@ def assignments():
         if not isinstance(assignment, dict) or 'id' not in assignment:
             continue
             
+        assignment = assignment.copy()
         assignment_id = assignment['id']
         class_ids = assignment.get('classIds', [])
         
@@ -754,10 +787,8 @@ def gradebook():
     data = load_data()
     all_assignments = data.get('assignments', [])
     all_classes = data.get('classes', [])
-    all_students = data.get('students', [])
     all_grades = data.get('grades', {})
-
-    class_map = {c.get('id'): c for c in all_classes if isinstance(c, dict)}
+    index = get_index(data)
 
     assignment_options = []
     for a in all_assignments:
@@ -780,7 +811,7 @@ def gradebook():
     relevant_classes_for_assignment = []
 
     if selected_assignment_id:
-        selected_assignment_details = next((a for a in all_assignments if a.get('id') == selected_assignment_id), None)
+        selected_assignment_details = index.assignments.get(selected_assignment_id)
         if selected_assignment_details:
              selected_assignment = selected_assignment_details.copy()
              relevant_class_ids = selected_assignment.get('classIds', [])
@@ -788,11 +819,11 @@ def gradebook():
 
 
     if selected_class_id:
-        selected_class = next((c for c in all_classes if isinstance(c, dict) and c.get('id') == selected_class_id), None)
+        selected_class = index.classes.get(selected_class_id)
 
     if selected_assignment and selected_class:
         if selected_class_id in selected_assignment.get('classIds', []):
-            filtered_students = [s for s in all_students if isinstance(s, dict) and s.get('classId') == selected_class_id]
+            filtered_students = index.class_students(selected_class_id)
             filtered_students.sort(key=lambda x: x.get('name', ''))
             student_scores = all_grades.get(selected_assignment_id, {})
             if not isinstance(student_scores, dict): student_scores = {}
@@ -820,14 +851,18 @@ def gradebook():
 def settings():
     return render_template('settings.html')
 
+SEARCH_RESULT_LIMIT = 20
+SEARCH_RESULT_MAX = 100
+
 @app.route('/search')
 @login_required
 def search_students():
-    query = request.args.get('q', '').lower()
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', SEARCH_RESULT_LIMIT, type=int), 1), SEARCH_RESULT_MAX)
     data = load_data()
-    students = data.get('students', [])
-    class_map = {c.get('id'): c for c in data.get('classes', []) if isinstance(c, dict)}
-    results = [s for s in students if isinstance(s, dict) and query and (query in s.get('name', '').lower() or query in s.get('email', '').lower() or query in s.get('uid', '').lower())]
+    index = get_index(data)
+    class_map = index.classes
+    results = [index.students[sid].copy() for sid in index.search.search(query, limit)] if query else []
     for res in results:
         class_info = class_map.get(res.get('classId'))
         res['className'] = f"{class_info['name']} - {class_info['section']} ({class_info.get('campus', '')})" if class_info else "N/A"
@@ -837,10 +872,11 @@ def search_students():
 @login_required
 def class_view(class_id):
     data = load_data()
-    current_class = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == class_id), None)
+    index = get_index(data)
+    current_class = index.classes.get(class_id)
     if not current_class:
         return "Class not found", 404
-    class_students = [s for s in data.get('students', []) if isinstance(s, dict) and s.get('classId') == class_id]
+    class_students = index.class_students(class_id)
     available_campuses = sorted(list(set(c.get('campus') for c in data.get('classes', []) if c.get('campus'))))
     
     return render_template('class_view.html', 
@@ -848,47 +884,101 @@ def class_view(class_id):
                            students=class_students,
                            available_campuses=available_campuses)
 
+@app.route('/attendance/<class_id>')
+@login_required
+def class_attendance(class_id):
+    data = load_data()
+    index = get_index(data)
+    current_class = index.classes.get(class_id)
+    if not current_class:
+        return "Class not found", 404
+    class_students = index.class_students(class_id)
+    student_ids = [s.get('id') for s in class_students]
+    store = load_attendance()
+    recorded = store.recorded_days(student_ids)
+    # The latest recorded days plus the day being marked (today unless ?date= is given).
+    days = set(recorded[-ATTENDANCE_PAGE_DAYS:])
+    try:
+        days.add(attendance_day(request.args.get('date') or datetime.now().strftime('%Y-%m-%d')))
+    except ValueError:
+        pass
+    days = sorted(days)
+    dates = [attendance_date(day) for day in days]
+    attendance = {date: {} for date in dates}
+    students = []
+    for student in class_students:
+        for day, status in store.statuses(student.get('id'), days).items():
+            attendance[attendance_date(day)][student.get('id')] = status
+        students.append(dict(student, attendanceRate=store.summary([student.get('id')])['rate']))
+    return render_template('attendance.html',
+                           class_data=current_class,
+                           dates=dates,
+                           weekdays={date: datetime.strptime(date, '%Y-%m-%d').strftime('%a') for date in dates},
+                           students=students,
+                           attendance=attendance,
+                           class_days=len(recorded),
+                           class_summary=store.summary(student_ids),
+                           statuses=ATTENDANCE_STATUSES)
+
+@app.route('/update_attendance', methods=['POST'])
+@login_required
+@data_write
+def update_attendance():
+    data = load_data()
+    index = get_index(data)
+    payload = request.json or {}
+    class_id = payload.get('class_id')
+    date = payload.get('date')
+    if class_id not in index.classes:
+        return jsonify({'success': False, 'message': 'Class not found'}), 404
+    try:
+        attendance_day(date)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid date. Use YYYY-MM-DD.'}), 400
+    class_students = index.students_by_class.get(class_id, {})
+    # One student, {student_id: status} for several, or a status for the whole class.
+    if 'marks' in payload:
+        marks = payload.get('marks')
+    elif 'student_id' in payload:
+        marks = {payload.get('student_id'): payload.get('status')}
+    else:
+        marks = dict.fromkeys(class_students, payload.get('status'))
+    if not isinstance(marks, dict) or not marks:
+        return jsonify({'success': False, 'message': 'No attendance marks given'}), 400
+    for student_id, status in marks.items():
+        if student_id not in class_students or not id_number(student_id, 's'):
+            return jsonify({'success': False, 'message': f'Student {student_id} is not in this class'}), 400
+        if status not in ATTENDANCE_CODES:
+            return jsonify({'success': False, 'message': f'Invalid attendance status: {status}'}), 400
+    store = load_attendance()
+    store.mark([(student_id, date, status) for student_id, status in marks.items()])
+    changes = alert_changes(index, list(marks))
+    if changes:
+        record_changes(data, changes)
+    return jsonify({
+        'success': True,
+        'message': f'Attendance saved for {len(marks)} student(s)',
+        'class_attendance': store.summary(class_students)
+    })
+
 @app.route('/student/<student_id>')
 @login_required
 def student_profile(student_id):
     data = load_data()
-    student = next((s for s in data.get('students', []) if isinstance(s, dict) and s.get('id') == student_id), None)
+    index = get_index(data)
+    student = index.students.get(student_id)
     if not student:
         return "Student not found", 404
-    student_class = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == student.get('classId')), {})
-    student['className'] = f"{student_class.get('name', '')} - {student_class.get('section', '')}"
-    student['campus'] = student_class.get('campus', student.get('campus', 'N/A'))
-    
-    student_assignments_view = []
-    all_grades = data.get('grades', {})
-    if not isinstance(all_grades, dict):
-        all_grades = {}
-    all_assignments = data.get('assignments', [])
-    if not isinstance(all_assignments, list):
-        all_assignments = []
-    for assignment in all_assignments:
-        if not isinstance(assignment, dict) or 'id' not in assignment:
-            continue
-        
-        if student.get('classId') in assignment.get('classIds', []):
-            assignment_copy = assignment.copy()
-            assignment_grades = all_grades.get(assignment['id'], {})
-            if not isinstance(assignment_grades, dict):
-                assignment_grades = {}
-            student_score = assignment_grades.get(student_id)
-            assignment_copy['score'] = student_score
-            student_assignments_view.append(assignment_copy)
-            
-    student_assignments_view.sort(key=lambda x: x.get('dueDate', DEFAULT_DATE_SORT_KEY))
-    student['status'] = get_status_from_grade(student.get('overallGrade', 0))
-    student['skills'] = student.get('skills', DEFAULT_SKILLS.copy())
+    student_class = index.classes.get(student.get('classId'), {})
+    student, assignments, assignment_summary = build_student_view(index, student)
     all_classes = data.get('classes', [])
     
     available_campuses = sorted(list(set(c.get('campus') for c in all_classes if c.get('campus'))))
 
     return render_template('student_profile.html', 
                            student=student, 
-                           assignments=student_assignments_view, 
+                           assignments=assignments, 
+                           assignment_summary=assignment_summary,
                            class_data=student_class, 
                            all_classes=all_classes,
                            available_campuses=available_campuses)
@@ -897,38 +987,14 @@ def student_profile(student_id):
 @login_required
 def student_report_html(student_id):
     data = load_data()
-    student = next((s for s in data.get('students', []) if isinstance(s, dict) and s.get('id') == student_id), None)
+    index = get_index(data)
+    student = index.students.get(student_id)
     if not student:
         return "Student not found", 404
-    student_class = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == student.get('classId')), {})
-    student['className'] = f"{student_class.get('name', '')} - {student_class.get('section', '')}"
-    student['campus'] = student_class.get('campus', student.get('campus', 'N/A'))
-    
-    student_assignments_view = []
-    all_grades = data.get('grades', {})
-    if not isinstance(all_grades, dict):
-        all_grades = {}
-    all_assignments = data.get('assignments', [])
-    if not isinstance(all_assignments, list):
-        all_assignments = []
-    for assignment in all_assignments:
-        if not isinstance(assignment, dict) or 'id' not in assignment:
-            continue
-        
-        if student.get('classId') in assignment.get('classIds', []):
-            assignment_copy = assignment.copy()
-            assignment_grades = all_grades.get(assignment['id'], {})
-            if not isinstance(assignment_grades, dict):
-                assignment_grades = {}
-            student_score = assignment_grades.get(student_id)
-            assignment_copy['score'] = student_score
-            student_assignments_view.append(assignment_copy)
-            
-    student_assignments_view.sort(key=lambda x: x.get('dueDate', DEFAULT_DATE_SORT_KEY))
-    student['status'] = get_status_from_grade(student.get('overallGrade', 0))
-    student['skills'] = student.get('skills', DEFAULT_SKILLS.copy())
+    student, assignments, assignment_summary = build_student_view(index, student)
     generation_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    return render_template('student_report.html', student=student, assignments=student_assignments_view, generated_date=generation_date)
+    return render_template('student_report.html', student=student, assignments=assignments,
+                           assignment_summary=assignment_summary, generated_date=generation_date)
 
 @app.route('/report/student/<student_id>/pdf')
 @login_required
@@ -936,130 +1002,65 @@ def student_report_pdf(student_id):
     if not FPDF_AVAILABLE:
         return "PDF generation library (fpdf2) not installed. Please install it: pip install fpdf2", 501
     data = load_data()
-    student = next((s for s in data.get('students', []) if isinstance(s, dict) and s.get('id') == student_id), None)
+    index = get_index(data)
+    student = index.students.get(student_id)
     if not student:
         return "Student not found", 404
-    student_class = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == student.get('classId')), {})
-    student['className'] = f"{student_class.get('name', '')} - {student_class.get('section', '')}"
-    student['campus'] = student_class.get('campus', student.get('campus', 'N/A'))
-
-    student_assignments_view = []
-    all_grades = data.get('grades', {})
-    if not isinstance(all_grades, dict):
-        all_grades = {}
-    all_assignments = data.get('assignments', [])
-    if not isinstance(all_assignments, list):
-        all_assignments = []
-    for assignment in all_assignments:
-        if not isinstance(assignment, dict) or 'id' not in assignment:
-            continue
-        
-        if student.get('classId') in assignment.get('classIds', []):
-            assignment_copy = assignment.copy()
-            assignment_grades = all_grades.get(assignment['id'], {})
-            if not isinstance(assignment_grades, dict):
-                assignment_grades = {}
-            student_score = assignment_grades.get(student_id)
-            assignment_copy['score'] = student_score
-            student_assignments_view.append(assignment_copy)
-            
-    student_assignments_view.sort(key=lambda x: x.get('dueDate', DEFAULT_DATE_SORT_KEY))
-    student['status'] = get_status_from_grade(student.get('overallGrade', 0))
-    student['skills'] = student.get('skills', DEFAULT_SKILLS.copy())
-    generation_date = datetime.now().strftime('%Y-%m-%d')
-    try:
-        pdf = PDF(orientation='P', unit='mm', format='A4')
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.set_font('Helvetica', 'B', 18)
-        pdf.cell(0, 10, student.get('name', 'Unknown Student'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.set_font('Helvetica', '', 10)
-        pdf.cell(0, 6, f"Class: {student.get('className', 'N/A')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(0, 6, f"Campus: {student.get('campus', 'N/A')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(0, 6, f"UID: {student.get('uid', '-')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(0, 6, f"Report Generated: {generation_date}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.ln(5)
-        pdf.set_font('Helvetica', 'B', 14)
-        pdf.cell(0, 10, "Overall Performance", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.set_font('Helvetica', '', 10)
-        pdf.set_fill_color(248, 250, 252)
-        pdf.cell(95, 10, "Overall Grade:", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-        pdf.set_font('Helvetica', 'B', 12)
-        pdf.cell(95, 10, f"{student.get('overallGrade', 0)}%", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R', fill=True)
-        pdf.set_font('Helvetica', '', 10)
-        pdf.cell(95, 10, "Status:", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-        pdf.set_font('Helvetica', 'B', 12)
-        pdf.cell(95, 10, student.get('status', 'N/A'), border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R', fill=True)
-        pdf.ln(10)
-        pdf.set_font('Helvetica', 'B', 14)
-        pdf.cell(0, 10, "Basic Information", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.set_font('Helvetica', '', 10)
-        pdf.cell(40, 7, "Email:", new_x=XPos.RIGHT, new_y=YPos.TOP)
-        pdf.cell(0, 7, student.get('email', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(40, 7, "Parent Phone:", new_x=XPos.RIGHT, new_y=YPos.TOP)
-        pdf.cell(0, 7, student.get('parentPhone', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(40, 7, "Join Date:", new_x=XPos.RIGHT, new_y=YPos.TOP)
-        pdf.cell(0, 7, student.get('joinDate', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.cell(40, 7, "Robotics Team:", new_x=XPos.RIGHT, new_y=YPos.TOP)
-        pdf.cell(0, 7, student.get('roboticsTeam', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.ln(10)
-        pdf.set_font('Helvetica', 'B', 14)
-        pdf.cell(0, 10, "Skills", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.set_font('Helvetica', '', 10)
-        skills_dict = student.get('skills', {})
-        if skills_dict and isinstance(skills_dict, dict):
-            for skill_name, rating in skills_dict.items():
-                pdf.cell(60, 7, f"{skill_name}:", new_x=XPos.RIGHT, new_y=YPos.TOP, align='L')
-                pdf.cell(0, 7, f"{rating} / 5", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        else:
-            pdf.multi_cell(0, 7, "No skills listed.", align='L')
-        pdf.ln(10)
-        if student_assignments_view:
-            pdf.add_page()
-            pdf.set_font('Helvetica', 'B', 14)
-            pdf.cell(0, 10, "Assignments & Scores", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-            pdf.set_font('Helvetica', 'B', 9)
-            pdf.set_fill_color(248, 250, 252)
-            col_widths = {'title': 70, 'type': 30, 'due': 25, 'max': 15, 'score': 15, 'pct': 15}
-            pdf.cell(col_widths['title'], 7, "Title", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-            pdf.cell(col_widths['type'], 7, "Type", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-            pdf.cell(col_widths['due'], 7, "Due Date", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-            pdf.cell(col_widths['max'], 7, "Max", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
-            pdf.cell(col_widths['score'], 7, "Score", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
-            pdf.cell(col_widths['pct'], 7, "%", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
-            pdf.set_font('Helvetica', '', 9)
-            fill = False
-            for assignment in student_assignments_view:
-                pdf.set_fill_color(255, 255, 255) if not fill else pdf.set_fill_color(248, 250, 252)
-                pdf.cell(col_widths['title'], 8, str(assignment.get('title', '-'))[:40], border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-                pdf.cell(col_widths['type'], 8, str(assignment.get('type', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-                pdf.cell(col_widths['due'], 8, str(assignment.get('dueDate', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
-                pdf.cell(col_widths['max'], 8, str(assignment.get('totalPoints', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
-                score = assignment.get('score')
-                score_str = str(score) if score is not None else '-'
-                pdf.cell(col_widths['score'], 8, score_str, border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
-                pct_str = '-'
-                if score is not None and isinstance(assignment.get('totalPoints'), int) and assignment['totalPoints'] > 0:
-                    pct = round((score / assignment['totalPoints']) * 100)
-                    pct_str = f"{pct}%"
-                pdf.cell(col_widths['pct'], 8, pct_str, border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
-                fill = not fill
-        else:
-            pdf.set_font('Helvetica', 'I', 10)
-            pdf.cell(0, 10, "No assignments found for this student's class.", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf_bytes = bytes(pdf.output())
+    student, assignments, _ = build_student_view(index, student)
+    updated_at = datetime.fromtimestamp(data['updatedAt']) if data.get('updatedAt') else datetime.now()
+    generation_date = updated_at.strftime('%Y-%m-%d')
+    cache_key = report_cache_key(data, student, assignments)
+    if request.if_none_match.contains(cache_key):
+        response = make_response('', 304)
+    else:
+        pdf_bytes = read_cached_report(cache_key)
+        if pdf_bytes is None:
+            try:
+                pdf_bytes = render_student_report_pdf(student, assignments, generation_date)
+            except Exception as e:
+                print(f"Error generating fpdf2 report for {student_id}: {e}")
+                return f"Error generating PDF report: {e}", 500
+            store_cached_report(cache_key, pdf_bytes)
         filename = f"Report_{student.get('name', 'Student').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
         response = make_response(pdf_bytes)
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.set_etag(cache_key)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/reports/batch')
+@login_required
+def batch_reports():
+    if not FPDF_AVAILABLE:
+        return "PDF generation library (fpdf2) not installed. Please install it: pip install fpdf2", 501
+    data = load_data()
+    index = get_index(data)
+    args = {field: (request.args.get(field) or '').strip() for field in ('class_id', 'campus', 'grade', 'section')}
+    if not any(args.values()):
+        return "Choose a class, campus, grade or section", 400
+    classes = report_classes(index, **args)
+    if not classes:
+        return "No matching classes", 404
+    jobs = build_report_jobs(index, classes)
+    if not jobs:
+        return "No students found", 404
+    generation_date = datetime.now().strftime('%Y-%m-%d')
+    label = re.sub(r'[^A-Za-z0-9._-]+', '_', '_'.join(v for v in (
+        classes[0].get('name') if args['class_id'] else '', args['campus'], args['grade'], args['section']) if v)).strip('_') or 'Class'
+    stamp = datetime.now().strftime('%Y%m%d')
+    if request.args.get('format') == 'pdf':
+        response = make_response(render_merged_report(jobs, generation_date))
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename="Reports_{label}_{stamp}.pdf"'
         return response
-    except Exception as e:
-        print(f"Error generating fpdf2 report for {student_id}: {e}")
-        return f"Error generating PDF report: {e}", 500
+    return Response(stream_report_zip(render_report_jobs(jobs, generation_date)), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="Reports_{label}_{stamp}.zip"'})
 
 # --- API Endpoints ---
 @app.route('/update_grade', methods=['POST'])
 @login_required
+@data_write
 def update_grade():
     data = load_data()
     student_id = request.json.get('student_id')
@@ -1071,22 +1072,19 @@ def update_grade():
         assert 0 <= new_grade <= 100
     except (ValueError, AssertionError):
         return jsonify({'success': False, 'message': 'Invalid grade (0-100 required)'}), 400
-    student_updated = False
-    students_list = data.get('students', [])
-    for i, student in enumerate(students_list):
-        if isinstance(student, dict) and student.get('id') == student_id:
-            students_list[i]['overallGrade'] = new_grade
-            students_list[i]['status'] = get_status_from_grade(new_grade)
-            student_updated = True
-            break
-    if student_updated:
-        save_data(data)
+    index = get_index(data)
+    student = index.students.get(student_id)
+    if student is not None:
+        index.set_overall_grade(student, new_grade)
+        changes = [{'op': 'set_overall_grade', 'student_id': student_id, 'grade': new_grade}]
+        record_changes(data, changes + alert_changes(index, [student_id]))
         return jsonify({'success': True})
     else:
         return jsonify({'success': False, 'message': 'Student not found'}), 404
 
 @app.route('/update_assignment_grade', methods=['POST'])
 @login_required
+@data_write
 def update_assignment_grade():
     data = load_data()
     assignment_id = request.json.get('assignment_id')
@@ -1094,33 +1092,115 @@ def update_assignment_grade():
     grade_input = request.json.get('grade')
     if not all([assignment_id, student_id]):
         return jsonify({'success': False, 'message': 'Missing ID(s)'}), 400
-    assignment = next((a for a in data.get('assignments', []) if isinstance(a, dict) and a.get('id') == assignment_id), None)
+    index = get_index(data)
+    assignment = index.assignments.get(assignment_id)
     if not assignment:
         return jsonify({'success': False, 'message': 'Assignment not found'}), 404
-    if not any(isinstance(s, dict) and s.get('id') == student_id for s in data.get('students', [])):
+    if student_id not in index.students:
         return jsonify({'success': False, 'message': 'Student not found'}), 404
-    total_points = assignment.get('totalPoints', 100)
-    grade_to_save = None
-    if grade_input is not None and grade_input != '':
-        try:
-            grade_num = int(grade_input)
-            assert 0 <= grade_num <= total_points
-            grade_to_save = grade_num
-        except (ValueError, TypeError, AssertionError):
-            return jsonify({'success': False, 'message': f'Invalid score. Must be 0-{total_points} or empty.'}), 400
-    if not isinstance(data.get('grades'), dict):
-        data['grades'] = {}
-    if assignment_id not in data['grades'] or not isinstance(data['grades'][assignment_id], dict):
-        data['grades'][assignment_id] = {}
-    if grade_to_save is not None:
-        data['grades'][assignment_id][student_id] = grade_to_save
-    elif student_id in data['grades'][assignment_id]:
-        del data['grades'][assignment_id][student_id]
-    save_data(data)
-    return jsonify({'success': True})
+    try:
+        grade_to_save = parse_assignment_score(grade_input, assignment)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    overall_grades = record_grade_changes(data, [{'op': 'set_grade', 'assignment_id': assignment_id, 'student_id': student_id, 'score': grade_to_save}])
+    return jsonify({'success': True, 'overall_grades': overall_grades})
+
+@app.route('/api/alerts')
+@login_required
+def api_alerts():
+    data = load_data()
+    index = get_index(data)
+    student_id = request.args.get('student_id')
+    class_id = request.args.get('class_id')
+    if student_id:
+        alerts = list(index.alerts_by_student.get(student_id, {}).values())
+    elif class_id:
+        alerts = list(index.alerts_by_class.get(class_id, {}).values())
+    else:
+        alerts = list(index.alerts.values())
+    return jsonify({'success': True, 'alerts': alert_rows(index, alerts)})
+
+@app.route('/api/classes/<class_id>/analytics')
+@login_required
+@data_conditional
+def class_analytics(class_id):
+    if not NUMPY_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Class analytics need numpy. Install it: pip install numpy'}), 501
+    data = load_data()
+    index = get_index(data)
+    if class_id not in index.classes:
+        return jsonify({'success': False, 'message': 'Class not found'}), 404
+    return jsonify(dict(index.class_analytics(class_id), success=True))
+
+@app.route('/api/attendance/summary')
+@login_required
+def attendance_summary():
+    data = load_data()
+    index = get_index(data)
+    student_id = request.args.get('student_id')
+    class_id = request.args.get('class_id')
+    campus = (request.args.get('campus') or '').strip().lower()
+    if student_id:
+        if student_id not in index.students:
+            return jsonify({'success': False, 'message': 'Student not found'}), 404
+        student_ids = [student_id]
+    elif class_id:
+        if class_id not in index.classes:
+            return jsonify({'success': False, 'message': 'Class not found'}), 404
+        student_ids = list(index.students_by_class.get(class_id, {}))
+    elif campus:
+        student_ids = [sid for cid, cls in index.classes.items() if (cls.get('campus') or '').lower() == campus
+                       for sid in index.students_by_class.get(cid, {})]
+    else:
+        student_ids = list(index.students)
+    return jsonify({'success': True, 'attendance': load_attendance().summary(student_ids)})
+
+@app.route('/update_assignment_grades_bulk', methods=['POST'])
+@login_required
+@data_write
+def update_assignment_grades_bulk():
+    data = load_data()
+    payload = request.json or {}
+    if 'grades' in payload:
+        grades_in = payload.get('grades')
+    else:
+        grades_in = {payload.get('assignment_id'): payload.get('scores')}
+    if not isinstance(grades_in, dict) or not all(isinstance(v, dict) for v in grades_in.values()):
+        return jsonify({'success': False, 'message': 'Expected {assignment_id: {student_id: score}}'}), 400
+    
+    index = get_index(data)
+    current_grades = data.get('grades', {})
+    changes = []
+    errors = []
+    for assignment_id, scores in grades_in.items():
+        assignment = index.assignments.get(assignment_id)
+        if not assignment:
+            errors.extend({'assignment_id': assignment_id, 'student_id': student_id, 'message': 'Assignment not found'} for student_id in scores)
+            continue
+        assignment_grades = current_grades.get(assignment_id, {})
+        for student_id, grade_input in scores.items():
+            if student_id not in index.students:
+                errors.append({'assignment_id': assignment_id, 'student_id': student_id, 'message': 'Student not found'})
+                continue
+            try:
+                score = parse_assignment_score(grade_input, assignment)
+            except ValueError as e:
+                errors.append({'assignment_id': assignment_id, 'student_id': student_id, 'message': str(e)})
+                continue
+            if assignment_grades.get(student_id) != score:
+                changes.append({'op': 'set_grade', 'assignment_id': assignment_id, 'student_id': student_id, 'score': score})
+    
+    overall_grades = record_grade_changes(data, changes)
+    saved = sum(len(scores) for scores in grades_in.values()) - len(errors)
+    message = f'{saved} score(s) saved.'
+    if errors:
+        message += f' {len(errors)} score(s) rejected.'
+    return jsonify({'success': not errors, 'message': message, 'saved': saved, 'errors': errors,
+                    'overall_grades': overall_grades})
 
 @app.route('/add_assignment', methods=['POST'])
 @login_required
+@data_write
 def add_assignment():
     data = load_data()
     assignment_data = request.json
@@ -1148,19 +1228,16 @@ def add_assignment():
     if not isinstance(class_ids, list) or len(class_ids) == 0:
         return jsonify({'success': False, 'message': 'Please select at least one class.'}), 400
     
-    valid_classes = [c for c in data.get('classes', []) if isinstance(c, dict)]
-    valid_class_ids = {c['id'] for c in valid_classes}
-    
+    index = get_index(data)
     for class_id in class_ids:
-        if class_id not in valid_class_ids:
+        if class_id not in index.classes:
             return jsonify({'success': False, 'message': f'Class ID {class_id} not found.'}), 400
     
     if 'assignments' not in data or not isinstance(data['assignments'], list):
         data['assignments'] = []
     
     new_id_num = 1
-    existing_ids = {a.get('id') for a in data['assignments'] if isinstance(a, dict)}
-    while f"as{new_id_num}" in existing_ids:
+    while f"as{new_id_num}" in index.assignments:
         new_id_num += 1
     
     new_assignment_id = f"as{new_id_num}"
@@ -1174,6 +1251,8 @@ def add_assignment():
     }
     
     data['assignments'].append(new_assignment)
+    index.add_assignment(new_assignment)
+    apply_alert_changes(index, alert_changes(index, [sid for class_id in class_ids for sid in index.students_by_class.get(class_id, {})]))
     
     save_data(data)
     return jsonify({
@@ -1184,6 +1263,7 @@ def add_assignment():
 
 @app.route('/add_student', methods=['POST'])
 @admin_required
+@data_write
 def add_student():
     data = load_data()
     student_data = request.json
@@ -1199,30 +1279,23 @@ def add_student():
     if new_campus not in CAMPUSES:
          return jsonify({'success': False, 'message': f"Invalid campus. Must be one of: {', '.join(CAMPUSES)}"}), 400
 
-    if any(isinstance(s, dict) and s.get('email', '').lower() == new_email for s in data.get('students', [])):
+    index = get_index(data)
+    if student_key(new_email) in index.students_by_email:
         return jsonify({'success': False, 'message': f'Email "{new_email}" already exists.'}), 400
-    if any(isinstance(s, dict) and s.get('uid', '').lower() == new_uid.lower() for s in data.get('students', [])):
+    if student_key(new_uid) in index.students_by_uid:
         return jsonify({'success': False, 'message': f'UID "{new_uid}" already exists.'}), 400
-    if any(isinstance(s, dict) and s.get('rollNumber', '').lower() == new_rollNumber.lower() for s in data.get('students', [])):
+    if student_key(new_rollNumber) in index.students_by_roll:
         return jsonify({'success': False, 'message': f'Roll Number "{new_rollNumber}" already exists.'}), 400
     
-    class_info = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == student_data.get('classId')), None)
+    class_info = index.classes.get(student_data.get('classId'))
     if not class_info:
         return jsonify({'success': False, 'message': 'Selected class not found.'}), 400
         
     if 'students' not in data or not isinstance(data['students'], list):
         data['students'] = []
         
-    highest_id_num = 0
-    for s in data['students']:
-        if isinstance(s, dict) and s.get('id', '').startswith('s'):
-            try:
-                num = int(s['id'][1:])
-                highest_id_num = max(highest_id_num, num)
-            except ValueError:
-                continue
-    new_student_num = highest_id_num + 1
-    new_student_id = f"s{new_student_num}"
+    new_student_id = index.next_id('s')
+    new_student_num = id_number(new_student_id, 's')
     
     new_student = {
         'id': new_student_id,
@@ -1235,38 +1308,33 @@ def add_student():
         'uid': new_uid,
         'rollNumber': new_rollNumber,
         'campus': new_campus,
-        'photo': f"/static/avatars/student{(new_student_num % 5) + 1}.jpg",
+        'photo': student_photo_path(new_uid, f"/static/avatars/student{(new_student_num % 5) + 1}.jpg"),
         'parentPhone': student_data.get('parentPhone', ''),
         'joinDate': datetime.now().strftime('%Y-%m-%d'),
         'roboticsTeam': f"Team {class_info.get('section', 'Unknown')}",
         'skills': DEFAULT_SKILLS.copy()
     }
 
-    for i, c in enumerate(data.get('classes', [])):
-        if isinstance(c, dict) and c.get('id') == new_student['classId']:
-            data['classes'][i]['studentCount'] = c.get('studentCount', 0) + 1
-            break
+    class_info['studentCount'] = class_info.get('studentCount', 0) + 1
             
     data['students'].append(new_student)
+    index.add_student(new_student)
+    apply_alert_changes(index, alert_changes(index, [new_student_id]))
     save_data(data)
     return jsonify({'success': True, 'student_id': new_student_id})
 
 @app.route('/edit_student/<student_id>', methods=['POST'])
 @admin_required
+@data_write
 def edit_student(student_id):
     data = load_data()
     updated_data = request.json
     if not updated_data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
     
-    student_index = -1
-    students_list = data.get('students', [])
-    for i, student in enumerate(students_list):
-        if isinstance(student, dict) and student.get('id') == student_id:
-            student_index = i
-            break
-    
-    if student_index == -1:
+    index = get_index(data)
+    current_student = index.students.get(student_id)
+    if not current_student:
         return jsonify({'success': False, 'message': 'Student not found'}), 404
     
     required_fields = ['name', 'email', 'classId', 'uid', 'rollNumber']
@@ -1276,7 +1344,6 @@ def edit_student(student_id):
     new_uid = updated_data['uid'].strip()
     new_roll_number = updated_data['rollNumber'].strip()
     new_email = updated_data['email'].strip().lower()
-    current_student = students_list[student_index]
 
     campus_value_from_request = updated_data.get('campus')
     if campus_value_from_request is not None:
@@ -1290,14 +1357,15 @@ def edit_student(student_id):
     if not isinstance(new_campus, str) or new_campus not in CAMPUSES:
          new_campus = DEFAULT_CAMPUS
 
-    for student in students_list:
-        if isinstance(student, dict) and student.get('id') != student_id:
-            if student.get('uid', '').strip().lower() == new_uid.lower():
-                return jsonify({'success': False, 'message': f'UID "{new_uid}" is already used.'}), 400
-            if student.get('rollNumber', '').strip().lower() == new_roll_number.lower():
-                return jsonify({'success': False, 'message': f'Roll Number "{new_roll_number}" is already used.'}), 400
-            if student.get('email', '').lower() == new_email:
-                return jsonify({'success': False, 'message': f'Email "{new_email}" is already used.'}), 400
+    uid_owner = index.students_by_uid.get(student_key(new_uid))
+    if uid_owner is not None and uid_owner.get('id') != student_id:
+        return jsonify({'success': False, 'message': f'UID "{new_uid}" is already used.'}), 400
+    roll_owner = index.students_by_roll.get(student_key(new_roll_number))
+    if roll_owner is not None and roll_owner.get('id') != student_id:
+        return jsonify({'success': False, 'message': f'Roll Number "{new_roll_number}" is already used.'}), 400
+    email_owner = index.students_by_email.get(student_key(new_email))
+    if email_owner is not None and email_owner.get('id') != student_id:
+        return jsonify({'success': False, 'message': f'Email "{new_email}" is already used.'}), 400
     
     original_class_id = current_student.get('classId')
     new_class_id = updated_data['classId']
@@ -1306,6 +1374,7 @@ def edit_student(student_id):
     if not isinstance(new_skills, dict):
         new_skills = current_student.get('skills', DEFAULT_SKILLS.copy())
     
+    index.remove_student(current_student)
     current_student.update({
         'name': updated_data['name'].strip(),
         'email': new_email,
@@ -1316,17 +1385,19 @@ def edit_student(student_id):
         'skills': new_skills,
         'campus': new_campus
     })
+    current_student['photo'] = student_photo_path(new_uid, current_student.get('photo'))
+    index.add_student(current_student)
     
     if original_class_id != new_class_id:
-        new_class_info = next((c for c in data.get('classes', []) if c.get('id') == new_class_id), None)
+        new_class_info = index.classes.get(new_class_id)
         current_student['roboticsTeam'] = f"Team {new_class_info.get('section', 'Unknown')}" if new_class_info else ''
         
-        for i, c in enumerate(data.get('classes', [])):
-            if isinstance(c, dict):
-                if c.get('id') == original_class_id:
-                    data['classes'][i]['studentCount'] = max(0, c.get('studentCount', 1) - 1)
-                elif c.get('id') == new_class_id:
-                    data['classes'][i]['studentCount'] = c.get('studentCount', 0) + 1
+        original_class_info = index.classes.get(original_class_id)
+        if original_class_info:
+            original_class_info['studentCount'] = max(0, original_class_info.get('studentCount', 1) - 1)
+        if new_class_info:
+            new_class_info['studentCount'] = new_class_info.get('studentCount', 0) + 1
+        apply_alert_changes(index, alert_changes(index, [student_id]))
     
     save_data(data)
     return jsonify({'success': True, 'student_id': student_id})
@@ -1345,14 +1416,15 @@ def check_student_duplicates():
     
     duplicate_uid = None
     duplicate_roll = None
+    index = get_index(data)
     
-    for student in data.get('students', []):
-        if isinstance(student, dict) and student.get('id') != student_id:
-            if student.get('uid', '').strip().lower() == new_uid.lower():
-                duplicate_uid = student.get('name', 'Unknown Student')
-            
-            if student.get('rollNumber', '').strip().lower() == new_roll_number.lower():
-                duplicate_roll = student.get('name', 'Unknown Student')
+    uid_owner = index.students_by_uid.get(student_key(new_uid))
+    if uid_owner is not None and uid_owner.get('id') != student_id:
+        duplicate_uid = uid_owner.get('name', 'Unknown Student')
+    
+    roll_owner = index.students_by_roll.get(student_key(new_roll_number))
+    if roll_owner is not None and roll_owner.get('id') != student_id:
+        duplicate_roll = roll_owner.get('name', 'Unknown Student')
     
     has_duplicates = duplicate_uid is not None or duplicate_roll is not None
     
@@ -1365,70 +1437,59 @@ def check_student_duplicates():
 
 @app.route('/delete_student/<student_id>', methods=['POST'])
 @admin_required
+@data_write
 def delete_student(student_id):
     data = load_data()
-    students_list = data.get('students', [])
-    initial_len = len(students_list)
-    original_class_id = None
-    student_found = False
-    data['students'] = []
-    for student in students_list:
-        if isinstance(student, dict) and student.get('id') == student_id:
-            original_class_id = student.get('classId')
-            student_found = True
-        else:
-            data['students'].append(student)
-    if not student_found:
+    index = get_index(data)
+    student = index.students.get(student_id)
+    if not student:
         return jsonify({'success': False, 'message': 'Student not found'}), 404
-    grades_dict = data.get('grades', {})
-    if isinstance(grades_dict, dict):
-        for assignment_id in list(grades_dict.keys()):
-            if isinstance(grades_dict[assignment_id], dict) and student_id in grades_dict[assignment_id]:
-                del grades_dict[assignment_id][student_id]
-    if original_class_id:
-        for i, c in enumerate(data.get('classes', [])):
-            if isinstance(c, dict) and c.get('id') == original_class_id:
-                data['classes'][i]['studentCount'] = max(0, c.get('studentCount', 1) - 1)
-                break
+    original_class_id = student.get('classId')
+    data['students'] = [s for s in data.get('students', []) if s.get('id') != student_id]
+    index.remove_student(student)
+    index.remove_student_grades(student_id)
+    apply_alert_changes(index, alert_changes(index, [student_id]))
+    original_class_info = index.classes.get(original_class_id)
+    if original_class_info:
+        original_class_info['studentCount'] = max(0, original_class_info.get('studentCount', 1) - 1)
     save_data(data)
+    load_attendance().forget([student_id])
     return jsonify({'success': True, 'message': 'Student deleted successfully'})
 
 @app.route('/delete_students_bulk', methods=['POST'])
 @admin_required
+@data_write
 def delete_students_bulk():
     data = load_data()
     student_ids = request.json.get('student_ids', [])
     if not student_ids or not isinstance(student_ids, list):
         return jsonify({'success': False, 'message': 'Invalid or missing student_ids list'}), 400
     students_list = data.get('students', [])
-    grades_dict = data.get('grades', {})
+    index = get_index(data)
     class_counts = {}
     deleted_count = 0
     not_found_ids = []
-    valid_student_ids = {s.get('id') for s in students_list if isinstance(s, dict)}
+    deleted_ids = set()
     for student_id in student_ids:
-        if student_id not in valid_student_ids:
-            not_found_ids.append(student_id)
-            continue
-        student = next((s for s in students_list if isinstance(s, dict) and s.get('id') == student_id), None)
+        student = index.students.get(student_id)
         if not student:
             not_found_ids.append(student_id)
             continue
+        index.remove_student(student)
+        deleted_ids.add(student_id)
         original_class_id = student.get('classId')
         if original_class_id:
             class_counts[original_class_id] = class_counts.get(original_class_id, 0) + 1
-        if isinstance(grades_dict, dict):
-            for assignment_id in list(grades_dict.keys()):
-                if isinstance(grades_dict[assignment_id], dict) and student_id in grades_dict[assignment_id]:
-                    del grades_dict[assignment_id][student_id]
+        index.remove_student_grades(student_id)
+        apply_alert_changes(index, alert_changes(index, [student_id]))
         deleted_count += 1
-    data['students'] = [s for s in students_list if isinstance(s, dict) and s.get('id') not in set(student_ids)]
+    data['students'] = [s for s in students_list if isinstance(s, dict) and s.get('id') not in deleted_ids]
     for class_id, count in class_counts.items():
-        for i, c in enumerate(data.get('classes', [])):
-            if isinstance(c, dict) and c.get('id') == class_id:
-                data['classes'][i]['studentCount'] = max(0, c.get('studentCount', 1) - count)
-                break
+        class_info = index.classes.get(class_id)
+        if class_info:
+            class_info['studentCount'] = max(0, class_info.get('studentCount', 1) - count)
     save_data(data)
+    load_attendance().forget(deleted_ids)
     message = f"Successfully deleted {deleted_count} students."
     if not_found_ids:
         message += f" {len(not_found_ids)} student(s) not found: {', '.join(not_found_ids)}."
@@ -1441,115 +1502,121 @@ def delete_students_bulk():
 
 @app.route('/delete_assignment', methods=['POST'])
 @login_required
+@data_write
 def delete_assignment():
     data = load_data()
     assignment_id = request.json.get('assignment_id')
     if not assignment_id:
         return jsonify({'success': False, 'message': 'Missing assignment ID'}), 400
     
-    initial_len = len(data.get('assignments', []))
-    data['assignments'] = [a for a in data.get('assignments', []) if not (isinstance(a, dict) and a.get('id') == assignment_id)]
+    index = get_index(data)
+    assignment = index.assignments.get(assignment_id)
     
-    if assignment_id in data.get('grades', {}):
-        del data['grades'][assignment_id]
-        
-    if len(data.get('assignments', [])) < initial_len:
+    if assignment:
+        data['assignments'] = [a for a in data.get('assignments', []) if a.get('id') != assignment_id]
+        index.remove_assignment(assignment)
+        affected_students = set(index.remove_assignment_grades(assignment_id))
+        affected_students.update(sid for class_id in assignment.get('classIds', []) for sid in index.students_by_class.get(class_id, {}))
+        refresh_overall_grades(index, affected_students)
+        apply_alert_changes(index, alert_changes(index, affected_students))
         save_data(data)
         return jsonify({'success': True, 'message': 'Assignment deleted'})
     else:
         return jsonify({'success': False, 'message': 'Assignment not found'}), 404
 
+# --- CSV Exports ---
+# Exports are streamed: csv_response() writes one row at a time into a small
+# buffer and yields it, so memory stays flat and nothing touches the disk.
+def _csv_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def csv_response(rows, filename):
+    response = Response(_csv_rows(rows), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f"attachment; filename={filename}"
+    return response
+
 @app.route('/export_assignment_grades/<assignment_id>/<class_id>')
 @login_required
 def export_assignment_grades(assignment_id, class_id):
     data = load_data()
-    
-    class_info = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == class_id), None)
-    assignment_info = next((a for a in data.get('assignments', []) if isinstance(a, dict) and a.get('id') == assignment_id), None)
+    index = get_index(data)
+    class_info = index.classes.get(class_id)
+    assignment_info = index.assignments.get(assignment_id)
     
     if not class_info or not assignment_info:
         return "Class or Assignment not found", 404
         
-    class_students = [s for s in data.get('students', []) if isinstance(s, dict) and s.get('classId') == class_id]
+    class_students = index.class_students(class_id)
     assignment_scores = data.get('grades', {}).get(assignment_id, {})
     total_points = assignment_info.get('totalPoints', 100)
     
-    si = io.StringIO()
-    writer = csv.writer(si)
-    
-    writer.writerow([
-        'Student Name', 
-        'Email', 
-        'UID', 
-        'Roll Number', 
-        f'Score (Max {total_points})', 
-        'Percentage',
-        'Status'
-    ])
-    
-    for student in sorted(class_students, key=lambda s: s.get('name', '')):
-        student_id = student.get('id')
-        score = assignment_scores.get(student_id)
-        
-        score_str = str(score) if score is not None else 'N/A'
-        percentage_str = 'N/A'
-        status_str = 'Not Graded'
-        
-        if score is not None and total_points > 0:
-            percentage = round((score / total_points) * 100)
-            percentage_str = f"{percentage}%"
-            status_str = get_status_from_grade(percentage)
-        
-        writer.writerow([
-            student.get('name', ''),
-            student.get('email', ''),
-            student.get('uid', ''),
-            student.get('rollNumber', ''),
-            score_str,
-            percentage_str,
-            status_str
-        ])
+    def rows():
+        yield [
+            'Student Name', 
+            'Email', 
+            'UID', 
+            'Roll Number', 
+            f'Score (Max {total_points})', 
+            'Percentage',
+            'Status'
+        ]
+        for student in sorted(class_students, key=lambda s: s.get('name', '')):
+            score = assignment_scores.get(student.get('id'))
+            
+            score_str = str(score) if score is not None else 'N/A'
+            percentage_str = 'N/A'
+            status_str = 'Not Graded'
+            
+            if score is not None and total_points > 0:
+                percentage = round((score / total_points) * 100)
+                percentage_str = f"{percentage}%"
+                status_str = get_status_from_grade(percentage)
+            
+            yield [
+                student.get('name', ''),
+                student.get('email', ''),
+                student.get('uid', ''),
+                student.get('rollNumber', ''),
+                score_str,
+                percentage_str,
+                status_str
+            ]
         
     class_name_clean = f"{class_info.get('name', '')}_{class_info.get('section', '')}".replace(' ', '_')
     assignment_title_clean = assignment_info.get('title', 'Assignment').replace(' ', '_')
     
     filename = f"{assignment_title_clean}_{class_name_clean}_Grades_{datetime.now().strftime('%Y%m%d')}.csv"
-    
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = f"attachment; filename={filename}"
-    output.headers["Content-type"] = "text/csv"
-    return output
+    return csv_response(rows(), filename)
 
 @app.route('/export/student_template_csv')
 @admin_required
 def export_student_template():
     data = load_data()
-    all_classes = data.get('classes', [])
-    si = io.StringIO()
-    writer = csv.writer(si)
-    
-    headers = ['UID', 'Student Name', 'Email', 'Parent Phone', 'Class Name', 'Section', 'Campus']
-    writer.writerow(headers)
-    writer.writerow(['KYC041JO', 'Example Student', 'example@school.edu', '+919876543210', 'Grade 8', 'Adobe', 'Yamuna Campus'])
-    writer.writerow([])
-    writer.writerow(["--- VALID OPTIONS (Use these exact names for 'Class Name', 'Section', 'Campus') ---"])
-    writer.writerow(["Valid Class Names:", "Valid Sections:", "Valid Campuses:"])
-    
-    valid_class_names = sorted(list(set(c.get('name') for c in all_classes if c.get('name'))))
-    valid_sections = sorted(list(set(c.get('section') for c in all_classes if c.get('section'))))
+    index = get_index(data)
+    valid_class_names = sorted(set(c.get('name') for c in index.classes.values() if c.get('name')))
+    valid_sections = index.available('section')
     valid_campuses = CAMPUSES
     
-    max_rows = max(len(valid_class_names), len(valid_sections), len(valid_campuses))
-    for i in range(max_rows):
-        class_name = valid_class_names[i] if i < len(valid_class_names) else ""
-        section = valid_sections[i] if i < len(valid_sections) else ""
-        campus = valid_campuses[i] if i < len(valid_campuses) else ""
-        writer.writerow([class_name, section, campus])
-        
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = "attachment; filename=student_import_template.csv"
-    output.headers["Content-type"] = "text/csv"
-    return output
+    def rows():
+        yield ['UID', 'Student Name', 'Email', 'Parent Phone', 'Class Name', 'Section', 'Campus']
+        yield ['KYC041JO', 'Example Student', 'example@school.edu', '+919876543210', 'Grade 8', 'Adobe', 'Yamuna Campus']
+        yield []
+        yield ["--- VALID OPTIONS (Use these exact names for 'Class Name', 'Section', 'Campus') ---"]
+        yield ["Valid Class Names:", "Valid Sections:", "Valid Campuses:"]
+        max_rows = max(len(valid_class_names), len(valid_sections), len(valid_campuses))
+        for i in range(max_rows):
+            class_name = valid_class_names[i] if i < len(valid_class_names) else ""
+            section = valid_sections[i] if i < len(valid_sections) else ""
+            campus = valid_campuses[i] if i < len(valid_campuses) else ""
+            yield [class_name, section, campus]
+    
+    return csv_response(rows(), "student_import_template.csv")
 
 @app.route('/upload_students_csv', methods=['POST'])
 @admin_required
@@ -1562,141 +1629,55 @@ def upload_students_csv():
     if file.filename == '':
         return jsonify({'success': False, 'message': 'No file selected.'}), 400
     
-    if file and file.filename.endswith('.csv'):
-        data = load_data()
-        all_students = data.get('students', [])
-        all_classes = data.get('classes', [])
-        class_lookup = {(c.get('name', '').lower(), c.get('section', '').lower(), c.get('campus', '').lower()): c.get('id') for c in all_classes if isinstance(c, dict)}
-        uid_lookup = {s.get('uid', '').lower(): s for s in all_students if isinstance(s, dict) and s.get('uid')}
-        email_lookup = {s.get('email', '').lower(): s for s in all_students if isinstance(s, dict) and s.get('email')}
-        
-        highest_id_num = 0
-        for s in all_students:
-            if isinstance(s, dict) and s.get('id', '').startswith('s'):
-                try:
-                    num = int(s['id'][1:])
-                    highest_id_num = max(highest_id_num, num)
-                except ValueError:
-                    continue
-        
-        new_students = []
-        errors = []
-        success_count = 0
-        
-        try:
-            stream = io.StringIO(file.stream.read().decode("UTF-8"), newline=None)
-            csv_reader = csv.DictReader(stream)
-            
-            for i, row in enumerate(csv_reader):
-                line_num = i + 2
-                row_headers = {(k or '').lower().strip().replace('\ufeff', ''): v for k, v in row.items()}
-                
-                uid = row_headers.get('uid', '').strip()
-                name = row_headers.get('student name', '').strip()
-                email = row_headers.get('email', '').strip().lower()
-                class_name_raw = row_headers.get('class name', '').strip()
-                section_raw = row_headers.get('section', '').strip()
-                campus_raw = row_headers.get('campus', '').strip()
-                
-                if not uid or not name or not email or not class_name_raw or not section_raw:
-                    errors.append(f"Row {line_num}: Missing required field (UID, Student Name, Email, Class Name, or Section).")
-                    continue
-                
-                if not campus_raw:
-                    campus = DEFAULT_CAMPUS
-                elif campus_raw.lower() not in [c.lower() for c in CAMPUSES]:
-                    errors.append(f"Row {line_num}: Invalid campus '{campus_raw}'. Defaulting to {DEFAULT_CAMPUS}.")
-                    campus = DEFAULT_CAMPUS
-                else:
-                    campus = next(c for c in CAMPUSES if c.lower() == campus_raw.lower())
-
-                if uid.lower() in uid_lookup:
-                    errors.append(f"Row {line_num}: UID '{uid}' already exists for student {uid_lookup[uid.lower()].get('name')}.")
-                    continue
-                
-                if email in email_lookup:
-                    errors.append(f"Row {line_num}: Email '{email}' already exists for student {email_lookup[email].get('name')}.")
-                    continue
-                
-                class_key = (class_name_raw.lower(), section_raw.lower(), campus.lower())
-                class_id = class_lookup.get(class_key)
-                
-                if not class_id:
-                    errors.append(f"Row {line_num}: Class combination not found: {class_name_raw} - {section_raw} - {campus}.")
-                    continue
-                
-                highest_id_num += 1
-                new_student_id = f"s{highest_id_num}"
-                new_roll = f"ROLL{highest_id_num:03d}"
-                
-                new_student = {
-                    'id': new_student_id,
-                    'classId': class_id,
-                    'name': name,
-                    'email': email,
-                    'overallGrade': 70,
-                    'status': get_status_from_grade(70),
-                    'lastMilestone': 'Bulk Imported',
-                    'uid': uid,
-                    'rollNumber': new_roll,
-                    'campus': campus,
-                    'photo': f"/static/avatars/student{(highest_id_num % 5) + 1}.jpg",
-                    'parentPhone': row_headers.get('parent phone', ''),
-                    'joinDate': datetime.now().strftime('%Y-%m-%d'),
-                    'roboticsTeam': f"Team {section_raw}",
-                    'skills': DEFAULT_SKILLS.copy()
-                }
-                
-                new_students.append(new_student)
-                uid_lookup[uid.lower()] = new_student
-                email_lookup[email] = new_student
-                success_count += 1
-            
-            if new_students:
-                data['students'].extend(new_students)
-                class_counts = {}
-                for s in data['students']:
-                    if isinstance(s, dict):
-                        cid = s.get('classId')
-                        class_counts[cid] = class_counts.get(cid, 0) + 1
-                for i, c in enumerate(data['classes']):
-                    if isinstance(c, dict):
-                        data['classes'][i]['studentCount'] = class_counts.get(c.get('id'), 0)
-                save_data(data)
-            
-            summary = f"Import complete: {success_count} students added."
-            if errors:
-                summary += f" {len(errors)} rows had warnings/errors."
-            
-            return jsonify({
-                'success': True,
-                'message': summary,
-                'errors': errors
-            })
-            
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'An unexpected error occurred: {e}',
-                'errors': [str(e)]
-            }), 500
-    else:
+    if not file.filename.lower().endswith('.csv'):
         return jsonify({
             'success': False,
             'message': 'Invalid file type. Please upload a .csv file.',
             'errors': ['Invalid file type']
         }), 400
+    
+    dry_run = request.form.get('dry_run', request.args.get('dry_run', '')).lower() in ('1', 'true', 'on', 'yes')
+    try:
+        job = start_import_job(file, dry_run=dry_run)
+    except OSError as e:
+        return jsonify({'success': False, 'message': f'Could not store the upload: {e}'}), 500
+    return jsonify({
+        'success': True,
+        'message': 'Validation started.' if dry_run else 'Import started.',
+        'job_id': job['id'],
+        'status_url': url_for('import_job_status', job_id=job['id'])
+    }), 202
+
+@app.route('/api/import_jobs/<job_id>')
+@admin_required
+def import_job_status(job_id):
+    job = read_import_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Import job not found'}), 404
+    return jsonify(dict(job, success=True))
+
+@app.route('/api/import_jobs/<job_id>/errors.csv')
+@admin_required
+def import_job_errors(job_id):
+    job = read_import_job(job_id)
+    errors_path = import_job_path(job_id, '.errors.csv') if job else None
+    if not errors_path or not os.path.exists(errors_path):
+        return "Error report not found", 404
+    return send_file(errors_path, as_attachment=True, download_name=f"import_errors_{job_id[:8]}.csv", mimetype='text/csv')
 
 @app.route('/get_student_details')
 @login_required
+@data_conditional
 def get_student_details():
     student_id = request.args.get('student_id')
     if not student_id:
         return jsonify({'error': 'ID required'}), 400
     data = load_data()
-    student = next((s for s in data.get('students', []) if isinstance(s, dict) and s.get('id') == student_id), None)
+    index = get_index(data)
+    student = index.students.get(student_id)
     if student:
-        class_info = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == student.get('classId')), {})
+        student = student.copy()
+        class_info = index.classes.get(student.get('classId'), {})
         student['className'] = f"{class_info.get('name', '')} - {class_info.get('section', '')}"
         student['campus'] = class_info.get('campus', student.get('campus', 'N/A'))
         student['status'] = get_status_from_grade(student.get('overallGrade', 0))
@@ -1709,43 +1690,163 @@ def get_student_details():
 @login_required
 def export_grades(class_id):
     data = load_data()
-    class_info = next((c for c in data.get('classes', []) if isinstance(c, dict) and c.get('id') == class_id), None)
+    index = get_index(data)
+    class_info = index.classes.get(class_id)
     if not class_info:
         return "Class not found", 404
     filename = f"overall_grades_{class_info.get('grade', '')}_{class_info.get('section', '')}_{datetime.now().strftime('%Y%m%d')}.csv"
-    filepath = os.path.join('.', filename)
-    try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Student Name', 'Email', 'Overall Grade', 'Status', 'UID', 'Roll Number', 'Campus'])
-            for student in data.get('students', []):
-                if isinstance(student, dict) and student.get('classId') == class_id:
-                    writer.writerow([student.get(k, '') for k in ['name', 'email', 'overallGrade', 'status', 'uid', 'rollNumber', 'campus']])
-        resp = send_file(filepath, as_attachment=True, download_name=filename)
-        try:
-            os.remove(filepath)
-        except OSError:
-            pass
-        return resp
-    except Exception:
-        if os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError:
-                pass
-        return "Error creating export file.", 500
+    
+    def rows():
+        yield ['Student Name', 'Email', 'Overall Grade', 'Status', 'UID', 'Roll Number', 'Campus']
+        for student in index.class_students(class_id):
+            yield [student.get(k, '') for k in ['name', 'email', 'overallGrade', 'status', 'uid', 'rollNumber', 'campus']]
+    
+    return csv_response(rows(), filename)
+
+@app.route('/export/all_grades_csv')
+@login_required
+def export_all_grades():
+    data = load_data()
+    index = get_index(data)
+    campus = (request.args.get('campus') or '').strip()
+    classes = sorted((c for c in index.classes.values() if not campus or c.get('campus') == campus),
+                     key=lambda c: (c.get('campus', ''), c.get('name', ''), c.get('section', '')))
+    class_ids = {c.get('id') for c in classes}
+    assignments = sorted((a for a in index.assignments.values() if class_ids.intersection(a.get('classIds', []))),
+                         key=lambda a: (a.get('dueDate', ''), a.get('id', '')))
+    grades = data.get('grades', {})
+    assignment_scores = [grades.get(a.get('id'), {}) for a in assignments]
+    
+    def rows():
+        yield (['Student Name', 'Email', 'UID', 'Roll Number', 'Class', 'Section', 'Campus', 'Overall Grade', 'Status'] +
+               [f"{a.get('title', a.get('id'))} (Max {a.get('totalPoints', 100)})" for a in assignments])
+        for cls in classes:
+            for student in sorted(index.class_students(cls.get('id')), key=lambda s: s.get('name', '')):
+                student_id = student.get('id')
+                yield ([student.get('name', ''), student.get('email', ''), student.get('uid', ''), student.get('rollNumber', ''),
+                        cls.get('name', ''), cls.get('section', ''), cls.get('campus', ''),
+                        student.get('overallGrade', ''), get_status_from_grade(student.get('overallGrade'))] +
+                       [scores.get(student_id, '') for scores in assignment_scores])
+    
+    campus_part = campus.replace(' ', '_') if campus else 'all_campuses'
+    return csv_response(rows(), f"grades_{campus_part}_{datetime.now().strftime('%Y%m%d')}.csv")
+
+@app.route('/api/rescan_photos', methods=['POST'])
+@admin_required
+@data_write
+def rescan_photos():
+    found_photos = scan_photo_directory()
+    data = load_data()
+    updated = apply_student_photos(data)
+    if updated:
+        save_data(data)
+    return jsonify({'success': True, 'message': f'Found {len(found_photos)} photos, updated {updated} students.', 'updated': updated})
 
 @app.route('/reset_data', methods=['POST'])
 @admin_required
+@data_write
 def reset_data():
     try:
         create_default_data()
+        load_attendance().clear()
         return jsonify({'success': True, 'message': 'Data reset to default'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
 
 app.jinja_env.globals.update(get_status_from_grade=get_status_from_grade)
 
+# --- CLI Commands ---
+@app.cli.command('migrate-data')
+def migrate_data_command():
+    """Apply pending schema migrations to data.json."""
+    with data_write_lock():
+        data = load_data()
+        from_version = STORAGE.migrated_from if STORAGE.migrated_from is not None else data.get('schemaVersion', 0)
+        if migrate_data(data) or STORAGE.migrated_from is not None:
+            save_data(data)
+            STORAGE.migrated_from = None
+    print(f"Data schema at version {SCHEMA_VERSION} (was {from_version}).")
+
+@app.cli.command('rescan-photos')
+def rescan_photos_command():
+    """Re-scan static/student_photos and attach photos to students by UID."""
+    found_photos = scan_photo_directory()
+    with data_write_lock():
+        data = load_data()
+        updated = apply_student_photos(data)
+        if updated:
+            save_data(data)
+    print(f"Found {len(found_photos)} photos, updated {updated} students.")
+
+@app.cli.command('migrate-to-sqlite')
+def migrate_to_sqlite_command():
+    """Copy data.json (including its change journal) into the SQLite database."""
+    if not os.path.exists(DATA_FILE):
+        print(f"{DATA_FILE} not found; nothing to migrate.")
+        return
+    source = JSONFileStorage(DATA_FILE)
+    target = SQLiteStorage(SQLITE_FILE)
+    with source.write_lock(), target.write_lock():
+        data = source.load()
+        migrate_data(data)
+        target.save(data, replace=True)
+    print(f"Copied {len(data['students'])} students, {len(data['classes'])} classes and "
+          f"{len(data['assignments'])} assignments into {SQLITE_FILE}.")
+    print("Start the app with STORAGE_BACKEND=sqlite to use it.")
+
+@app.cli.command('recompute-grades')
+def recompute_grades_command():
+    """Recompute every student's overall grade from their weighted assignment scores."""
+    with data_write_lock():
+        data = load_data()
+        index = get_index(data)
+        updated = refresh_overall_grades(index, list(index.students))
+        if updated:
+            save_data(data)
+    print(f"Updated the overall grade of {updated} student(s).")
+
+@app.cli.command('sweep-alerts')
+def sweep_alerts_command():
+    """Raise or clear alerts for work that has become overdue since the last sweep."""
+    changed = sweep_overdue_alerts()
+    if changed is None:
+        print("Alerts were already checked today.")
+    else:
+        print(f"Checked overdue work: {changed} alert change(s).")
+
+@app.cli.command('export-reports')
+@click.option('--class-id', help='Class id to export.')
+@click.option('--campus', help='Export every class on this campus.')
+@click.option('--grade', help='Export every class in this grade.')
+@click.option('--section', help='Export every class in this section.')
+@click.option('--output', required=True, help='Directory for per-student PDFs, or a .pdf/.zip file.')
+def export_reports_command(class_id, campus, grade, section, output):
+    """Render student PDF reports for a class, campus, grade or section."""
+    if not FPDF_AVAILABLE:
+        raise click.ClickException("fpdf2 is not installed")
+    if not any((class_id, campus, grade, section)):
+        raise click.UsageError("Pass --class-id, --campus, --grade or --section")
+    data = load_data()
+    index = get_index(data)
+    jobs = build_report_jobs(index, report_classes(index, class_id, campus, grade, section))
+    if not jobs:
+        raise click.ClickException("No students matched")
+    generation_date = datetime.now().strftime('%Y-%m-%d')
+    if output.lower().endswith('.pdf'):
+        with open(output, 'wb') as f:
+            f.write(render_merged_report(jobs, generation_date))
+    elif output.lower().endswith('.zip'):
+        with open(output, 'wb') as f:
+            for chunk in stream_report_zip(render_report_jobs(jobs, generation_date)):
+                f.write(chunk)
+    else:
+        os.makedirs(output, exist_ok=True)
+        for filename, pdf_bytes in render_report_jobs(jobs, generation_date):
+            with open(os.path.join(output, filename), 'wb') as f:
+                f.write(pdf_bytes)
+    print(f"Wrote {len(jobs)} report(s) to {output}")
+
 if __name__ == '__main__':
+    init_data_store()
     port = int(os.environ.get("PORT", 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=port)
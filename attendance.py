@@ -0,0 +1,193 @@
+import os
+import threading
+import tempfile
+import struct
+from datetime import datetime
+from constants import DATA_FILE
+from index import id_number
+from storage import data_write_lock
+
+# --- Attendance ---
+# Attendance is kept out of data.json. In memory each student has one status byte
+# per day (an index into ATTENDANCE_STATUSES, 0 = not recorded) in a bytearray
+# that starts at their first recorded day, plus a running count per status, so
+# rates for a student, class or campus are sums of counts. On disk it is
+# ATTENDANCE_FILE, an append-only log of 7-byte (student number, day, status)
+# records written under data_write_lock(); readers replay whatever another
+# process appended since their last look. Once most of the log is overwritten
+# marks it is rewritten with only the latest status per student and day.
+ATTENDANCE_FILE = os.path.splitext(DATA_FILE)[0] + '.attendance'
+ATTENDANCE_STATUSES = ['not-recorded', 'present', 'absent', 'late', 'excused']
+ATTENDANCE_CODES = {status: code for code, status in enumerate(ATTENDANCE_STATUSES)}
+ATTENDANCE_EPOCH = datetime(2000, 1, 1).toordinal()
+ATTENDANCE_COMPACT_RECORDS = 100000
+ATTENDANCE_PAGE_DAYS = 10
+
+def attendance_day(value):
+    day = datetime.strptime(value, '%Y-%m-%d').toordinal() - ATTENDANCE_EPOCH
+    if not 0 <= day <= 0xFFFF:
+        raise ValueError(f"Date out of range: {value}")
+    return day
+
+def attendance_date(day):
+    return datetime.fromordinal(day + ATTENDANCE_EPOCH).strftime('%Y-%m-%d')
+
+class AttendanceStore:
+    RECORD = struct.Struct('<IHB')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.days = {}
+        self.counts = {}
+        self.records = 0
+        self._offset = 0
+        self._inode = None
+
+    def _set(self, number, day, code):
+        entry = self.days.get(number)
+        if entry is None:
+            if not code:
+                return
+            entry = self.days[number] = [day, bytearray(1)]
+            self.counts[number] = [0] * len(ATTENDANCE_STATUSES)
+        first, statuses = entry
+        if day < first:
+            statuses[0:0] = bytes(first - day)
+            entry[0] = first = day
+        position = day - first
+        if position >= len(statuses):
+            statuses.extend(bytes(position + 1 - len(statuses)))
+        counts = self.counts[number]
+        counts[statuses[position]] -= 1
+        counts[code] += 1
+        statuses[position] = code
+
+    def _apply(self, payload):
+        for number, day, code in self.RECORD.iter_unpack(payload):
+            if code < len(ATTENDANCE_STATUSES):
+                self._set(number, day, code)
+        self.records += len(payload) // self.RECORD.size
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            st = None
+        with self._lock:
+            if st is None:
+                if self._inode is not None:
+                    self._reset()
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                # New file (first read, or another process compacted it).
+                self._reset()
+                self._inode = st.st_ino
+            complete = st.st_size - st.st_size % self.RECORD.size
+            if complete <= self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                payload = f.read(complete - self._offset)
+            payload = payload[:len(payload) - len(payload) % self.RECORD.size]
+            self._apply(payload)
+            self._offset += len(payload)
+
+    def mark(self, marks):
+        # marks: (student id, 'YYYY-MM-DD', status) tuples, already validated.
+        self._write(b''.join(self.RECORD.pack(id_number(student_id, 's'), attendance_day(date), ATTENDANCE_CODES[status])
+                             for student_id, date, status in marks))
+
+    def forget(self, student_ids):
+        # Clears every mark for students that are deleted, so a reused id starts clean.
+        with data_write_lock():
+            self.refresh()
+            self._write(b''.join(self.RECORD.pack(id_number(student_id, 's'), day, 0)
+                                 for student_id in student_ids for day in self.recorded_days([student_id])))
+
+    def _write(self, payload):
+        if not payload:
+            return
+        with data_write_lock():
+            self.refresh()
+            with open(self.path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh()
+            if self.records >= ATTENDANCE_COMPACT_RECORDS and self.records > 2 * self._live_records():
+                self.compact()
+
+    def _live_records(self):
+        return sum(sum(counts[1:]) for counts in self.counts.values())
+
+    def compact(self):
+        with self._lock:
+            payload = b''.join(self.RECORD.pack(number, first + position, code)
+                               for number, (first, statuses) in sorted(self.days.items())
+                               for position, code in enumerate(statuses) if code)
+        self._replace(payload)
+
+    def clear(self):
+        # Drops every mark (used when the data is reset, so new students start clean).
+        with data_write_lock():
+            self._replace(b'')
+
+    def _replace(self, payload):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.refresh()
+
+    def statuses(self, student_id, days):
+        entry = self.days.get(id_number(student_id, 's'))
+        result = {}
+        for day in days:
+            code = 0
+            if entry is not None and 0 <= day - entry[0] < len(entry[1]):
+                code = entry[1][day - entry[0]]
+            result[day] = ATTENDANCE_STATUSES[code]
+        return result
+
+    def recorded_days(self, student_ids):
+        days = set()
+        for student_id in student_ids:
+            entry = self.days.get(id_number(student_id, 's'))
+            if entry is not None:
+                first, statuses = entry
+                days.update(first + position for position, code in enumerate(statuses) if code)
+        return sorted(days)
+
+    def summary(self, student_ids):
+        totals = [0] * len(ATTENDANCE_STATUSES)
+        for student_id in student_ids:
+            counts = self.counts.get(id_number(student_id, 's'))
+            if counts is not None:
+                for code, n in enumerate(counts):
+                    totals[code] += n
+        summary = {status: totals[code] for code, status in enumerate(ATTENDANCE_STATUSES) if code}
+        attended = summary['present'] + summary['late']
+        counted = attended + summary['absent']
+        summary['recorded'] = counted + summary['excused']
+        summary['rate'] = round(attended / counted * 100) if counted else None
+        return summary
+
+ATTENDANCE = AttendanceStore(ATTENDANCE_FILE)
+
+def load_attendance():
+    ATTENDANCE.refresh()
+    return ATTENDANCE
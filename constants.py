@@ -0,0 +1,49 @@
+import os
+
+# --- Constants ---
+if os.path.exists('/app/data'):
+    DATA_FILE = '/app/data/data.json'
+else:
+    DATA_FILE = 'data.json'
+
+CLASSES = ['6th', '7th', '8th', '9th']
+SECTIONS = ['Tata', 'Google', 'Infosys', 'Mahindra', 'Intel', 'Adobe', 'Verizon']
+CAMPUSES = ['Yamuna Campus', 'Subhash Nagar Campus']
+DEFAULT_CAMPUS = 'Yamuna Campus'
+CAMPUS_LOOKUP = {c.lower(): c for c in CAMPUSES}
+
+ASSIGNMENT_TYPES = ['Project', 'Quiz', 'Lab', 'Homework', 'Exam', 'Participation', 'Assessment', 'Test', 'Other']
+ASSESSMENT_FILTER_TYPES = ['Quiz', 'Exam', 'Assessment', 'Test']
+# Relative weight of each assignment type in the computed overall grade. Only the
+# types a student has scores in count, so the weights need not add up to 100.
+ASSIGNMENT_TYPE_WEIGHTS = {
+    'Exam': 30, 'Test': 20, 'Project': 20, 'Assessment': 15, 'Lab': 15,
+    'Quiz': 10, 'Homework': 10, 'Participation': 5, 'Other': 5
+}
+COMPANY_COLORS = {
+    'Blue': 'bg-blue-500',
+    'Green': 'bg-green-500',
+    'Red': 'bg-red-500',
+    'Purple': 'bg-purple-500',
+    'Sky': 'bg-sky-500',
+    'Amber': 'bg-amber-500',
+    'Teal': 'bg-teal-500'
+}
+
+SECTION_COLOR_MAP = {
+    'Tata': 'bg-red-500',
+    'Google': 'bg-blue-500',
+    'Infosys': 'bg-purple-500',
+    'Mahindra': 'bg-green-500',
+    'Intel': 'bg-sky-500',
+    'Adobe': 'bg-red-600',
+    'Verizon': 'bg-amber-500'
+}
+DEFAULT_DATE_SORT_KEY = "9999-12-31"
+
+DEFAULT_SKILLS = {
+    "Concept Understanding": 1,
+    "Practical Implementation": 1,
+    "Programming & Logic": 1,
+    "Communication": 1
+}
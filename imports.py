@@ -0,0 +1,261 @@
+import json
+import os
+import csv
+import io
+import threading
+import re
+import uuid
+from datetime import datetime, timedelta
+from constants import CAMPUS_LOOKUP, DEFAULT_CAMPUS, DEFAULT_SKILLS, DATA_FILE
+from index import DataIndex, get_index, set_index, student_key, class_key, get_status_from_grade
+from storage import (DATA_WRITE_RETRIES, DataConflictError, load_data, save_data, data_write_lock,
+                     invalidate_data_cache, write_json_atomic)
+from alerts import alert_changes, apply_alert_changes
+from photos import student_photo_path
+
+# --- CSV Import Jobs ---
+# Student CSV imports run in a background thread. The upload is saved to
+# IMPORT_JOB_DIR, read row by row and committed in batches of IMPORT_BATCH_SIZE,
+# each under the data write lock. A batch is added to a staged copy of the data
+# with its own index, and both are swapped in after the save, so requests never
+# see the shared data or index change under them. Job status and the error report are files next
+# to the upload, so any worker can answer the status/error-report requests.
+IMPORT_JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), 'import_jobs')
+IMPORT_BATCH_SIZE = 2000
+IMPORT_JOB_RETENTION = timedelta(days=7)
+
+def import_job_path(job_id, suffix):
+    return os.path.join(IMPORT_JOB_DIR, f"{job_id}{suffix}")
+
+def read_import_job(job_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+        return None
+    try:
+        with open(import_job_path(job_id, '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _update_import_job(job, **fields):
+    job.update(fields, updated=datetime.now().isoformat(timespec='seconds'))
+    write_json_atomic(import_job_path(job['id'], '.json'), job)
+
+def _import_errors_url(job_id):
+    # Built by hand: the job thread has no request context for url_for().
+    return f"/api/import_jobs/{job_id}/errors.csv"
+
+def _prune_import_jobs():
+    cutoff = (datetime.now() - IMPORT_JOB_RETENTION).timestamp()
+    try:
+        for filename in os.listdir(IMPORT_JOB_DIR):
+            path = os.path.join(IMPORT_JOB_DIR, filename)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except OSError:
+        pass
+
+def start_import_job(file_storage, dry_run=False):
+    os.makedirs(IMPORT_JOB_DIR, exist_ok=True)
+    _prune_import_jobs()
+    job_id = uuid.uuid4().hex
+    upload_path = import_job_path(job_id, '.csv')
+    file_storage.save(upload_path)
+    job = {'id': job_id, 'filename': file_storage.filename, 'dry_run': dry_run, 'created': datetime.now().isoformat(timespec='seconds')}
+    _update_import_job(job, status='queued', message='Waiting to start.', bytes_total=os.path.getsize(upload_path),
+                       bytes_read=0, progress=0, rows_processed=0, added=0, error_count=0, errors_url=None, summary=None)
+    threading.Thread(target=run_import_job, args=(job,), name=f"import-{job_id}", daemon=True).start()
+    return job
+
+# Row issues found by ImportValidator. Warnings are reported but the row is
+# still imported; any other issue skips the row.
+IMPORT_WARNINGS = {'invalid_campus', 'invalid_phone'}
+PHONE_PATTERN = re.compile(r'\+?\d{7,15}')
+
+class ImportValidator:
+    # Validates CSV rows batch by batch. Lookups against existing data are done
+    # as set intersections per batch; uids/emails seen earlier in the same file are
+    # remembered across batches so in-file duplicates are caught too.
+    def __init__(self, index):
+        self.index = index
+        self.seen_uids = {}
+        self.seen_emails = {}
+
+    @staticmethod
+    def parse_row(row):
+        row_headers = {(k or '').lower().strip().replace('\ufeff', ''): (v or '') for k, v in row.items()}
+        return {
+            'uid': row_headers.get('uid', '').strip(),
+            'name': row_headers.get('student name', '').strip(),
+            'email': row_headers.get('email', '').strip().lower(),
+            'class_name': row_headers.get('class name', '').strip(),
+            'section': row_headers.get('section', '').strip(),
+            'campus_raw': row_headers.get('campus', '').strip(),
+            'parent_phone': row_headers.get('parent phone', '').strip(),
+        }
+
+    def validate_batch(self, batch):
+        parsed = [(line_num, self.parse_row(row)) for line_num, row in batch]
+        for _, record in parsed:
+            record['campus'] = CAMPUS_LOOKUP.get(record['campus_raw'].lower(), DEFAULT_CAMPUS)
+            record['class_key'] = class_key(record['class_name'], record['section'], record['campus'])
+        existing_uids = {student_key(r['uid']) for _, r in parsed} & self.index.students_by_uid.keys()
+        existing_emails = {r['email'] for _, r in parsed} & self.index.students_by_email.keys()
+        known_classes = {r['class_key'] for _, r in parsed} & self.index.classes_by_key.keys()
+        
+        results = []
+        for line_num, record in parsed:
+            issues = []
+            uid, email = record['uid'], record['email']
+            uid_key = student_key(uid)
+            if not uid or not record['name'] or not email or not record['class_name'] or not record['section']:
+                issues.append(('missing_field', "Missing required field (UID, Student Name, Email, Class Name, or Section)."))
+            if record['campus_raw'] and record['campus_raw'].lower() not in CAMPUS_LOOKUP:
+                issues.append(('invalid_campus', f"Invalid campus '{record['campus_raw']}'. Defaulting to {DEFAULT_CAMPUS}."))
+            phone = re.sub(r'[\s\-().]', '', record['parent_phone'])
+            if phone and not PHONE_PATTERN.fullmatch(phone):
+                issues.append(('invalid_phone', f"Malformed parent phone '{record['parent_phone']}'."))
+            if uid_key:
+                if uid_key in self.seen_uids:
+                    issues.append(('duplicate_uid_in_file', f"UID '{uid}' also appears on row {self.seen_uids[uid_key]}."))
+                elif uid_key in existing_uids:
+                    issues.append(('duplicate_uid', f"UID '{uid}' already exists for student {self.index.students_by_uid[uid_key].get('name')}."))
+                else:
+                    self.seen_uids[uid_key] = line_num
+            if email:
+                if email in self.seen_emails:
+                    issues.append(('duplicate_email_in_file', f"Email '{email}' also appears on row {self.seen_emails[email]}."))
+                elif email in existing_emails:
+                    issues.append(('duplicate_email', f"Email '{email}' already exists for student {self.index.students_by_email[email].get('name')}."))
+                else:
+                    self.seen_emails[email] = line_num
+            if record['class_name'] and record['section'] and record['class_key'] not in known_classes:
+                issues.append(('unknown_class', f"Class combination not found: {record['class_name']} - {record['section']} - {record['campus']}."))
+            results.append((line_num, record, issues))
+        return results
+
+    @staticmethod
+    def importable(issues):
+        return all(code in IMPORT_WARNINGS for code, _ in issues)
+
+def _new_imported_student(index, record):
+    class_info = index.classes_by_key[record['class_key']]
+    new_student_id = index.next_id('s')
+    id_num = index.max_ids['s']
+    return {
+        'id': new_student_id,
+        'classId': class_info.get('id'),
+        'name': record['name'],
+        'email': record['email'],
+        'overallGrade': 70,
+        'status': get_status_from_grade(70),
+        'lastMilestone': 'Bulk Imported',
+        'uid': record['uid'],
+        'rollNumber': f"ROLL{id_num:03d}",
+        'campus': record['campus'],
+        'photo': student_photo_path(record['uid'], f"/static/avatars/student{(id_num % 5) + 1}.jpg"),
+        'parentPhone': record['parent_phone'],
+        'joinDate': datetime.now().strftime('%Y-%m-%d'),
+        'roboticsTeam': f"Team {record['section']}",
+        'skills': DEFAULT_SKILLS.copy()
+    }
+
+def _commit_import_batch(validator, batch):
+    for attempt in range(DATA_WRITE_RETRIES):
+        seen_uids, seen_emails = dict(validator.seen_uids), dict(validator.seen_emails)
+        try:
+            with data_write_lock(exclusive=False):
+                data = load_data()
+                staged = dict(data, students=list(data.get('students', [])), alerts=list(data.get('alerts', [])),
+                              classes=[dict(c) for c in data.get('classes', [])])
+                index = DataIndex(staged)
+                validator.index = index
+                results = validator.validate_batch(batch)
+                added = []
+                for line_num, record, issues in results:
+                    if not validator.importable(issues):
+                        continue
+                    student = _new_imported_student(index, record)
+                    staged['students'].append(student)
+                    index.add_student(student)
+                    class_info = index.classes[student['classId']]
+                    class_info['studentCount'] = class_info.get('studentCount', 0) + 1
+                    added.append(student['id'])
+                apply_alert_changes(index, alert_changes(index, added))
+                if added:
+                    save_data(staged, base=data)
+                    set_index(index)
+                return len(added), results
+        except DataConflictError:
+            validator.seen_uids, validator.seen_emails = seen_uids, seen_emails
+            invalidate_data_cache()
+    raise DataConflictError('The data kept changing during the import; please retry.')
+
+def run_import_job(job):
+    # A dry run validates the whole file against a snapshot of the data and
+    # reports what would happen; it never takes the write lock or saves.
+    job_id = job['id']
+    dry_run = job.get('dry_run', False)
+    upload_path = import_job_path(job_id, '.csv')
+    errors_path = import_job_path(job_id, '.errors.csv')
+    rows_processed = added = error_count = valid_rows = 0
+    issue_counts = {}
+    validator = ImportValidator(get_index(load_data()))
+
+    def summary():
+        return {'rows': rows_processed, 'valid_rows': valid_rows, 'skipped_rows': rows_processed - valid_rows, 'issues': issue_counts}
+
+    try:
+        _update_import_job(job, status='running', message='Validating...' if dry_run else 'Importing...')
+        with open(upload_path, 'rb') as raw, open(errors_path, 'w', newline='', encoding='utf-8') as error_file:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(['Row', 'UID', 'Severity', 'Issue', 'Message'])
+            batch = []
+            
+            def flush():
+                nonlocal added, error_count, valid_rows
+                if dry_run:
+                    results = validator.validate_batch(batch)
+                else:
+                    batch_added, results = _commit_import_batch(validator, batch)
+                    added += batch_added
+                for line_num, record, issues in results:
+                    if validator.importable(issues):
+                        valid_rows += 1
+                    if issues:
+                        error_count += 1
+                    for code, message in issues:
+                        issue_counts[code] = issue_counts.get(code, 0) + 1
+                        severity = 'warning' if code in IMPORT_WARNINGS else 'error'
+                        error_writer.writerow([line_num, record['uid'], severity, code, message])
+                error_file.flush()
+                batch.clear()
+                bytes_read = min(raw.tell(), job['bytes_total'])
+                _update_import_job(job, rows_processed=rows_processed, added=added, error_count=error_count, bytes_read=bytes_read,
+                                   progress=round(bytes_read * 100 / job['bytes_total']) if job['bytes_total'] else 100, summary=summary())
+            
+            for i, row in enumerate(reader):
+                batch.append((i + 2, row))
+                rows_processed += 1
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    flush()
+            flush()
+        
+        if dry_run:
+            message = f"Dry run: {valid_rows} of {rows_processed} rows would be imported."
+        else:
+            message = f"Import complete: {added} students added."
+        if error_count:
+            message += f" {error_count} rows had warnings/errors."
+        _update_import_job(job, status='completed', message=message, progress=100, bytes_read=job['bytes_total'], summary=summary(),
+                           errors_url=_import_errors_url(job_id) if error_count else None)
+    except Exception as e:
+        print(f"Import job {job_id} failed: {e}")
+        _update_import_job(job, status='failed', message=f'An unexpected error occurred: {e}', rows_processed=rows_processed,
+                           added=added, error_count=error_count, summary=summary(),
+                           errors_url=_import_errors_url(job_id) if error_count else None)
+    finally:
+        try:
+            os.remove(upload_path)
+        except OSError:
+            pass
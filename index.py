@@ -0,0 +1,504 @@
+import math
+import re
+import threading
+import bisect
+from constants import ASSIGNMENT_TYPE_WEIGHTS, DEFAULT_DATE_SORT_KEY
+from search import StudentSearchIndex
+from analytics import compute_class_analytics
+
+# --- In-Memory Indexes ---
+# DataIndex holds lookup tables over one loaded `data` dict. It is built once per
+# (re)load by get_index() and then kept current by the routes that mutate data:
+# they call the add_*/remove_* methods next to the list mutation they make.
+# Student keys (uid, email, roll number) are stored stripped and lower-cased.
+def student_key(value):
+    return (value or '').strip().lower()
+
+def class_key(name, section, campus):
+    return ((name or '').strip().lower(), (section or '').strip().lower(), (campus or '').strip().lower())
+
+def id_number(record_id, prefix):
+    if isinstance(record_id, str) and record_id.startswith(prefix) and record_id[len(prefix):].isdigit():
+        return int(record_id[len(prefix):])
+    return 0
+
+STATUS_NAMES = ['Excellent', 'Good', 'Needs Help', 'At Risk', 'N/A', 'Invalid']
+
+class GradeStats:
+    # Running totals behind the dashboard cards: student count, overall grade
+    # sum (and sum of squares, for the spread) and a status histogram. Students
+    # are added/removed with sign=+1/-1.
+    __slots__ = ('count', 'graded', 'grade_total', 'grade_square_total', 'status_counts')
+
+    def __init__(self):
+        self.count = 0
+        self.graded = 0
+        self.grade_total = 0
+        self.grade_square_total = 0
+        self.status_counts = dict.fromkeys(STATUS_NAMES, 0)
+
+    def add_grade(self, grade, sign=1):
+        self.count += sign
+        if isinstance(grade, (int, float)):
+            self.graded += sign
+            self.grade_total += sign * grade
+            self.grade_square_total += sign * grade * grade
+        status = get_status_from_grade(grade)
+        if status not in self.status_counts: status = 'Invalid'
+        self.status_counts[status] += sign
+
+    def merge(self, other, sign=1):
+        self.count += sign * other.count
+        self.graded += sign * other.graded
+        self.grade_total += sign * other.grade_total
+        self.grade_square_total += sign * other.grade_square_total
+        for status, n in other.status_counts.items():
+            self.status_counts[status] += sign * n
+
+    @property
+    def average(self):
+        return self.grade_total / self.graded if self.graded else 0
+
+    @property
+    def std(self):
+        if not self.graded:
+            return 0
+        return math.sqrt(max(0, self.grade_square_total / self.graded - self.average ** 2))
+
+FEEDBACK_CATEGORIES = ['knowledge', 'communication', 'approachability', 'punctuality', 'practical']
+
+def feedback_periods(date):
+    # Every rollup a feedback dated 'YYYY-MM-DD HH:MM:SS' counts towards.
+    date = str(date or '')
+    periods = ['all']
+    if re.match(r'\d{4}-\d{2}', date):
+        periods += [date[:4], date[:7]]
+    return periods
+
+class FeedbackStats:
+    # Running review count and per-category rating sums for one faculty member
+    # over one period ('all', a year or a month).
+    __slots__ = ('count', 'sums')
+
+    def __init__(self):
+        self.count = 0
+        self.sums = dict.fromkeys(FEEDBACK_CATEGORIES, 0)
+
+    def add(self, ratings, sign=1):
+        self.count += sign
+        ratings = ratings if isinstance(ratings, dict) else {}
+        for cat in FEEDBACK_CATEGORIES:
+            try:
+                self.sums[cat] += sign * int(ratings.get(cat, 0))
+            except (TypeError, ValueError):
+                pass
+
+    @property
+    def averages(self):
+        return {cat: round(self.sums[cat] / self.count, 1) if self.count else 0.0 for cat in FEEDBACK_CATEGORIES}
+
+    @property
+    def overall_average(self):
+        if not self.count:
+            return 0.0
+        return round(sum(self.averages.values()) / len(FEEDBACK_CATEGORIES), 1)
+
+def get_status_from_grade(grade):
+    if grade is None: return 'N/A'
+    if not isinstance(grade, (int, float)): return 'Invalid'
+    if grade >= 90: return 'Excellent'
+    if grade >= 70: return 'Good'
+    if grade >= 60: return 'Needs Help'
+    return 'At Risk'
+
+class DataIndex:
+    def __init__(self, data):
+        self.data = data
+        self.classes = {}
+        self.classes_by_key = {}
+        self.students = {}
+        self.students_by_uid = {}
+        self.students_by_email = {}
+        self.students_by_roll = {}
+        self.students_by_class = {}
+        self.assignments = {}
+        self.assignments_by_class = {}
+        self.users = {}
+        self.users_by_username = {}
+        # Alerts by id, by dedupe key (see alerts.alert_key()) and grouped by student/class.
+        self.alerts = {}
+        self.alerts_by_key = {}
+        self.alerts_by_student = {}
+        self.alerts_by_class = {}
+        # Feedback by id and by (lower-cased uid, faculty id), rating rollups per
+        # (faculty id, period) and each faculty member's commented feedback in
+        # date order, for paging through comments.
+        self.feedbacks = {}
+        self.feedbacks_by_key = {}
+        self.feedback_stats = {}
+        self.feedback_comments = {}
+        self.max_ids = {'s': 0, 'c': 0, 'u': 0, 'a': 0, 'fb': 0}
+        # Dashboard aggregates. Each student counts towards 'all' and its class;
+        # a class's totals are rolled into its campus/grade/section scopes, so
+        # editing a class only moves one GradeStats between scopes.
+        self.stats = {}
+        self.class_values = {'grade': {}, 'section': {}, 'campus': {}}
+        self._search = None
+        # Student ids in each listing order, built on demand and dropped when a
+        # change could reorder them.
+        self._sorted_students = {}
+        # data['grades'] is assignment -> student -> score; grades_by_student is
+        # the same scores student -> assignment. Grade writes go through
+        # set_grade()/remove_*_grades() so both stay in step.
+        self.grades_by_student = {}
+        # Each class's assignments in due-date order and its analytics, built on
+        # demand and thrown away whenever data['version'] moves on.
+        self._views_version = None
+        self._class_assignment_order = {}
+        self._class_analytics = {}
+        for cls in data.get('classes', []):
+            self.add_class(cls)
+        for student in data.get('students', []):
+            self.add_student(student)
+        for assignment in data.get('assignments', []):
+            self.add_assignment(assignment)
+        for user in data.get('users', []):
+            self.add_user(user)
+        for alert in data.get('alerts', []):
+            if isinstance(alert, dict):
+                self.add_alert(alert)
+        for feedback in data.get('feedbacks', []):
+            if isinstance(feedback, dict):
+                self.add_feedback(feedback)
+        grades = data.get('grades')
+        for assignment_id, scores in (grades.items() if isinstance(grades, dict) else ()):
+            if isinstance(scores, dict):
+                for student_id, score in scores.items():
+                    self.grades_by_student.setdefault(student_id, {})[assignment_id] = score
+
+    @property
+    def search(self):
+        # Built on first use so reloads that never search don't pay for it.
+        if self._search is None:
+            self._search = StudentSearchIndex(self.students.values())
+        return self._search
+
+    def _student_sort_key(self, sort_key):
+        def name(student):
+            return (student.get('name') or '').lower()
+        if sort_key == 'grade':
+            return lambda s: (s.get('overallGrade') if isinstance(s.get('overallGrade'), (int, float)) else -1, name(s))
+        if sort_key in ('uid', 'rollNumber'):
+            return lambda s: ((s.get(sort_key) or '').lower(), name(s))
+        if sort_key == 'class':
+            def class_order(s):
+                cls = self.classes.get(s.get('classId'), {})
+                return (cls.get('name') or '', cls.get('section') or '', cls.get('campus') or '', name(s))
+            return class_order
+        return lambda s: (name(s), s.get('id'))
+
+    def sorted_student_ids(self, sort_key):
+        ids = self._sorted_students.get(sort_key)
+        if ids is None:
+            ids = [s.get('id') for s in sorted(list(self.students.values()), key=self._student_sort_key(sort_key))]
+            self._sorted_students[sort_key] = ids
+        return ids
+
+    def next_id(self, prefix):
+        self.max_ids[prefix] += 1
+        return f"{prefix}{self.max_ids[prefix]}"
+
+    def _track_id(self, prefix, record_id):
+        self.max_ids[prefix] = max(self.max_ids[prefix], id_number(record_id, prefix))
+
+    @staticmethod
+    def _put(mapping, key, record):
+        if key:
+            mapping[key] = record
+
+    @staticmethod
+    def _drop(mapping, key, record):
+        if key and mapping.get(key) is record:
+            del mapping[key]
+
+    def stats_for(self, scope, value=None):
+        key = (scope, value)
+        if key not in self.stats:
+            self.stats[key] = GradeStats()
+        return self.stats[key]
+
+    def _class_scopes(self, cls):
+        return [(field, cls.get(field)) for field in ('campus', 'grade', 'section') if cls.get(field)]
+
+    def _count_student(self, student, sign):
+        grade = student.get('overallGrade')
+        self.stats_for('all').add_grade(grade, sign)
+        self.stats_for('class', student.get('classId')).add_grade(grade, sign)
+        cls = self.classes.get(student.get('classId'))
+        if cls is not None:
+            for scope, value in self._class_scopes(cls):
+                self.stats_for(scope, value).add_grade(grade, sign)
+
+    def available(self, field):
+        return sorted(value for value, n in self.class_values[field].items() if n > 0)
+
+    # Classes
+    def add_class(self, cls):
+        self.classes[cls.get('id')] = cls
+        self._put(self.classes_by_key, class_key(cls.get('name'), cls.get('section'), cls.get('campus')), cls)
+        self._track_id('c', cls.get('id'))
+        self._count_class(cls, 1)
+        self._sorted_students.pop('class', None)
+
+    def remove_class(self, cls):
+        if self.classes.get(cls.get('id')) is cls:
+            self._count_class(cls, -1)
+            self._sorted_students.pop('class', None)
+        self._drop(self.classes, cls.get('id'), cls)
+        self._drop(self.classes_by_key, class_key(cls.get('name'), cls.get('section'), cls.get('campus')), cls)
+
+    def _count_class(self, cls, sign):
+        class_stats = self.stats_for('class', cls.get('id'))
+        for scope, value in self._class_scopes(cls):
+            self.stats_for(scope, value).merge(class_stats, sign)
+            values = self.class_values[scope]
+            values[value] = values.get(value, 0) + sign
+
+    # Students
+    def add_student(self, student):
+        student_id = student.get('id')
+        self.students[student_id] = student
+        self._put(self.students_by_uid, student_key(student.get('uid')), student)
+        self._put(self.students_by_email, student_key(student.get('email')), student)
+        self._put(self.students_by_roll, student_key(student.get('rollNumber')), student)
+        self.students_by_class.setdefault(student.get('classId'), {})[student_id] = student
+        self._track_id('s', student_id)
+        self._count_student(student, 1)
+        self._sorted_students.clear()
+        if self._search is not None:
+            self._search.remove(student_id)
+            self._search.add(student)
+
+    def remove_student(self, student):
+        student_id = student.get('id')
+        if self.students.get(student_id) is student:
+            self._count_student(student, -1)
+            self._sorted_students.clear()
+            if self._search is not None:
+                self._search.remove(student_id)
+        self._drop(self.students, student_id, student)
+        self._drop(self.students_by_uid, student_key(student.get('uid')), student)
+        self._drop(self.students_by_email, student_key(student.get('email')), student)
+        self._drop(self.students_by_roll, student_key(student.get('rollNumber')), student)
+        self._drop(self.students_by_class.get(student.get('classId'), {}), student_id, student)
+
+    def class_students(self, class_id):
+        return list(self.students_by_class.get(class_id, {}).values())
+
+    def set_overall_grade(self, student, grade):
+        indexed = self.students.get(student.get('id')) is student
+        if indexed:
+            self._count_student(student, -1)
+        student['overallGrade'] = grade
+        student['status'] = get_status_from_grade(grade)
+        if indexed:
+            self._count_student(student, 1)
+            self._sorted_students.pop('grade', None)
+
+    # Assignments
+    def add_assignment(self, assignment):
+        self.assignments[assignment.get('id')] = assignment
+        for class_id in assignment.get('classIds', []):
+            self.assignments_by_class.setdefault(class_id, {})[assignment.get('id')] = assignment
+            self._class_assignment_order.pop(class_id, None)
+
+    def remove_assignment(self, assignment):
+        self._drop(self.assignments, assignment.get('id'), assignment)
+        for class_id in assignment.get('classIds', []):
+            self._drop(self.assignments_by_class.get(class_id, {}), assignment.get('id'), assignment)
+            self._class_assignment_order.pop(class_id, None)
+
+    def class_assignments(self, class_id):
+        return list(self.assignments_by_class.get(class_id, {}).values())
+
+    def _check_views(self):
+        if self.data.get('version') != self._views_version:
+            self._views_version = self.data.get('version')
+            self._class_assignment_order = {}
+            self._class_analytics = {}
+
+    def sorted_class_assignments(self, class_id):
+        self._check_views()
+        ordered = self._class_assignment_order.get(class_id)
+        if ordered is None:
+            ordered = sorted((a for a in self.class_assignments(class_id) if 'id' in a),
+                             key=lambda a: a.get('dueDate', DEFAULT_DATE_SORT_KEY))
+            self._class_assignment_order[class_id] = ordered
+        return ordered
+
+    def class_analytics(self, class_id):
+        self._check_views()
+        analytics = self._class_analytics.get(class_id)
+        if analytics is None:
+            analytics = self._class_analytics[class_id] = compute_class_analytics(self, class_id)
+        return analytics
+
+    # Grades
+    def student_grades(self, student_id):
+        return self.grades_by_student.get(student_id, {})
+
+    def set_grade(self, assignment_id, student_id, score):
+        grades = self.data.setdefault('grades', {})
+        assignment_grades = grades.get(assignment_id)
+        if not isinstance(assignment_grades, dict):
+            assignment_grades = grades[assignment_id] = {}
+        if score is not None:
+            assignment_grades[student_id] = score
+            self.grades_by_student.setdefault(student_id, {})[assignment_id] = score
+        else:
+            assignment_grades.pop(student_id, None)
+            student_grades = self.grades_by_student.get(student_id)
+            if student_grades is not None:
+                student_grades.pop(assignment_id, None)
+                if not student_grades:
+                    del self.grades_by_student[student_id]
+
+    def remove_student_grades(self, student_id):
+        grades = self.data.get('grades', {})
+        for assignment_id in self.grades_by_student.pop(student_id, {}):
+            assignment_grades = grades.get(assignment_id)
+            if isinstance(assignment_grades, dict):
+                assignment_grades.pop(student_id, None)
+
+    def remove_assignment_grades(self, assignment_id):
+        scores = self.data.get('grades', {}).pop(assignment_id, None)
+        student_ids = list(scores) if isinstance(scores, dict) else []
+        for student_id in student_ids:
+            student_grades = self.grades_by_student.get(student_id)
+            if student_grades is not None:
+                student_grades.pop(assignment_id, None)
+                if not student_grades:
+                    del self.grades_by_student[student_id]
+        return student_ids
+
+    def computed_overall_grade(self, student_id):
+        # Per type: points earned over points possible; the overall grade is the
+        # ASSIGNMENT_TYPE_WEIGHTS-weighted mean of those. None with no usable scores.
+        totals = {}
+        for assignment_id, score in self.student_grades(student_id).items():
+            assignment = self.assignments.get(assignment_id)
+            total_points = assignment.get('totalPoints') if assignment else None
+            if not isinstance(score, (int, float)) or not isinstance(total_points, (int, float)) or total_points <= 0:
+                continue
+            part = totals.setdefault(assignment.get('type'), [0, 0])
+            part[0] += score
+            part[1] += total_points
+        weighted = weight_sum = 0
+        for assignment_type, (earned, possible) in totals.items():
+            weight = ASSIGNMENT_TYPE_WEIGHTS.get(assignment_type, ASSIGNMENT_TYPE_WEIGHTS['Other'])
+            weighted += weight * earned / possible
+            weight_sum += weight
+        if not weight_sum:
+            return None
+        return max(0, min(100, round(weighted / weight_sum * 100)))
+
+    # Users
+    def add_user(self, user):
+        self.users[user.get('id')] = user
+        self._put(self.users_by_username, user.get('username'), user)
+        self._track_id('u', user.get('id'))
+
+    def remove_user(self, user):
+        self._drop(self.users, user.get('id'), user)
+        self._drop(self.users_by_username, user.get('username'), user)
+
+    # Feedback
+    @staticmethod
+    def feedback_key(uid, faculty_id):
+        return (student_key(uid), faculty_id)
+
+    def add_feedback(self, feedback):
+        faculty_id = feedback.get('faculty_id')
+        self.feedbacks[feedback.get('id')] = feedback
+        self._put(self.feedbacks_by_key, self.feedback_key(feedback.get('uid'), faculty_id), feedback)
+        for period in feedback_periods(feedback.get('date')):
+            self.faculty_feedback_stats(faculty_id, period).add(feedback.get('ratings'))
+        if feedback.get('comment'):
+            bisect.insort(self.feedback_comments.setdefault(faculty_id, []), feedback, key=lambda fb: str(fb.get('date') or ''))
+        self._track_id('fb', feedback.get('id'))
+
+    def faculty_feedback_stats(self, faculty_id, period='all'):
+        key = (faculty_id, period)
+        if key not in self.feedback_stats:
+            self.feedback_stats[key] = FeedbackStats()
+        return self.feedback_stats[key]
+
+    def feedback_months(self):
+        return sorted({period for _, period in self.feedback_stats if len(period) == 7}, reverse=True)
+
+    def faculty_comments(self, faculty_id, period='all', offset=0, limit=None):
+        # Newest first. A period narrows the date-ordered list by bisecting on its prefix.
+        comments = self.feedback_comments.get(faculty_id, [])
+        start, end = 0, len(comments)
+        if period != 'all':
+            date_of = lambda fb: str(fb.get('date') or '')
+            start = bisect.bisect_left(comments, period, key=date_of)
+            end = bisect.bisect_left(comments, period + '\uffff', key=date_of)
+        total = end - start
+        stop = end - offset
+        first = start if limit is None else max(start, stop - limit)
+        return comments[first:max(first, stop)][::-1], total
+
+    # Alerts
+    def add_alert(self, alert):
+        alert_id = alert.get('id')
+        self.alerts[alert_id] = alert
+        self._put(self.alerts_by_key, alert.get('key'), alert)
+        self.alerts_by_student.setdefault(alert.get('studentId'), {})[alert_id] = alert
+        self.alerts_by_class.setdefault(alert.get('classId'), {})[alert_id] = alert
+        self._track_id('a', alert_id)
+
+    def remove_alert(self, alert):
+        alert_id = alert.get('id')
+        self._drop(self.alerts, alert_id, alert)
+        self._drop(self.alerts_by_key, alert.get('key'), alert)
+        self._drop(self.alerts_by_student.get(alert.get('studentId'), {}), alert_id, alert)
+        self._drop(self.alerts_by_class.get(alert.get('classId'), {}), alert_id, alert)
+
+    def put_alert(self, alert):
+        # Insert or replace by id, keeping data['alerts'] in step.
+        current = self.alerts.get(alert.get('id'))
+        if current is not None:
+            self.remove_alert(current)
+            current.clear()
+            current.update(alert)
+            self.add_alert(current)
+        else:
+            alert = dict(alert)
+            self.data.setdefault('alerts', []).append(alert)
+            self.add_alert(alert)
+
+    def delete_alert(self, alert_id):
+        alert = self.alerts.get(alert_id)
+        if alert is not None:
+            self.remove_alert(alert)
+            self.data['alerts'] = [a for a in self.data.get('alerts', []) if a is not alert]
+
+# The previous index is kept too: requests that started before a copy was swapped
+# in keep reading the old data until they finish.
+_index_holder = {'index': None, 'previous': None}
+_index_lock = threading.Lock()
+
+def get_index(data):
+    index = _index_holder['index']
+    if index is None or index.data is not data:
+        with _index_lock:
+            for index in (_index_holder['index'], _index_holder['previous']):
+                if index is not None and index.data is data:
+                    return index
+            index = DataIndex(data)
+            set_index(index)
+    return index
+
+def set_index(index):
+    _index_holder['previous'], _index_holder['index'] = _index_holder['index'], index
@@ -0,0 +1,76 @@
+from constants import DEFAULT_CAMPUS, DEFAULT_SKILLS
+from passwords import hash_password
+
+# --- Schema Migrations ---
+# Each migration upgrades the data to its version number and returns True when
+# it changed anything. A store written by an older build is upgraded in memory as
+# it is read; `flask migrate-data` (run once per deploy, see the Procfile) writes
+# the upgrade back. Importing the app never writes.
+
+def _migrate_v1(data):
+    changed = False
+    has_admin = any(isinstance(u, dict) and u.get('role') == 'admin' for u in data.get('users', []))
+    if not has_admin:
+        data['users'].append({
+            "id": "u1",
+            "username": "admin",
+            "password": "admin123",
+            "role": "admin",
+            "name": "Super Admin"
+        })
+        data['users'].append({
+            "id": "u2",
+            "username": "teacher",
+            "password": "teacher123",
+            "role": "faculty",
+            "name": "Demo Faculty"
+        })
+        changed = True
+
+    for student in data.get('students', []):
+        if not isinstance(student.get('skills'), dict):
+            student['skills'] = DEFAULT_SKILLS.copy()
+            changed = True
+        if student.get('campus') == 'Main Campus' or not student.get('campus'):
+            student['campus'] = DEFAULT_CAMPUS
+            changed = True
+            
+    for cls in data.get('classes', []):
+        if cls.get('campus') == 'Main Campus' or not cls.get('campus'):
+            cls['campus'] = DEFAULT_CAMPUS
+            changed = True
+    
+    for assignment in data.get('assignments', []):
+        if 'classId' in assignment:
+            class_id = assignment.pop('classId')
+            if class_id:
+                assignment['classIds'] = [class_id]
+            else:
+                assignment['classIds'] = []
+            changed = True
+    return changed
+
+def _migrate_v2(data):
+    # Plain-text passwords become salted hashes.
+    changed = False
+    for user in data.get('users', []):
+        if 'password' in user:
+            user['passwordHash'] = hash_password(str(user.pop('password')))
+            changed = True
+    return changed
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate_data(data):
+    changed = False
+    current_version = data.get('schemaVersion', 0)
+    for version, migration in MIGRATIONS:
+        if version > current_version:
+            changed = migration(data) or changed
+            data['schemaVersion'] = version
+            changed = True
+    return changed
@@ -0,0 +1,19 @@
+import os
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# --- Passwords ---
+# Users keep a salted hash in 'passwordHash', never the password itself.
+# PASSWORD_HASH_METHOD is any werkzeug method string including its cost, e.g.
+# 'scrypt:32768:8:1' or 'pbkdf2:sha256:1000000'; hashes made with another
+# method are upgraded the next time their user logs in.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+def verify_password(user, password):
+    password_hash = user.get('passwordHash')
+    return bool(password_hash and password) and check_password_hash(password_hash, password)
+
+def password_needs_rehash(user):
+    return (user.get('passwordHash') or '').split('$', 1)[0] != PASSWORD_HASH_METHOD
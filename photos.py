@@ -0,0 +1,49 @@
+import os
+
+# --- Student Photos ---
+# Photos are matched to students by file name (<uid>.jpg etc.). The directory is
+# scanned at startup and on demand (/api/rescan_photos, `flask rescan-photos`);
+# the resulting uid -> filename map is reused when students are created.
+PHOTO_DIR_NAME = 'student_photos'
+PHOTO_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# The folder Flask serves /static from.
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+_student_photos = {}
+_photo_scan = {'done': False}
+
+def scan_photo_directory():
+    photo_dir_path = os.path.join(STATIC_FOLDER, PHOTO_DIR_NAME)
+    found_photos = {}
+    _photo_scan['done'] = True
+    if not os.path.exists(photo_dir_path):
+        try:
+            os.makedirs(photo_dir_path)
+        except Exception as e:
+            pass
+        return found_photos
+    try:
+        for filename in os.listdir(photo_dir_path):
+            if filename.lower().endswith(PHOTO_EXTENSIONS):
+                found_photos[os.path.splitext(filename)[0].lower()] = filename
+    except Exception as e:
+        pass
+    _student_photos.clear()
+    _student_photos.update(found_photos)
+    return found_photos
+
+def student_photo_path(uid, default=None):
+    if not _photo_scan['done']:
+        scan_photo_directory()
+    filename = _student_photos.get((uid or '').lower())
+    if filename:
+        return f"/static/{PHOTO_DIR_NAME}/{filename}"
+    return default
+
+def apply_student_photos(data):
+    updated = 0
+    for student in data.get('students', []):
+        new_photo_path = student_photo_path(student.get('uid'))
+        if new_photo_path and student.get('photo') != new_photo_path:
+            student['photo'] = new_photo_path
+            updated += 1
+    return updated
@@ -0,0 +1,305 @@
+import os
+import io
+import re
+import threading
+import tempfile
+import zipfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+    FPDF_AVAILABLE = True
+except ImportError:
+    FPDF_AVAILABLE = False
+    print("WARNING: fpdf2 not found. PDF generation will not work. Install with: pip install fpdf2")
+from constants import DATA_FILE
+from attendance import load_attendance
+from student_views import build_student_view
+
+# --- Student Report PDFs ---
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Helvetica', 'B', 12)
+        self.cell(0, 10, 'Robotics Academy - Student Report', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
+        self.ln(10)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Helvetica', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
+
+def draw_student_report(pdf, student, assignments, generation_date):
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font('Helvetica', 'B', 18)
+    pdf.cell(0, 10, student.get('name', 'Unknown Student'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.cell(0, 6, f"Class: {student.get('className', 'N/A')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(0, 6, f"Campus: {student.get('campus', 'N/A')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(0, 6, f"UID: {student.get('uid', '-')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(0, 6, f"Data as of: {generation_date}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.ln(5)
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, "Overall Performance", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.set_fill_color(248, 250, 252)
+    pdf.cell(95, 10, "Overall Grade:", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(95, 10, f"{student.get('overallGrade', 0)}%", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R', fill=True)
+    pdf.set_font('Helvetica', '', 10)
+    pdf.cell(95, 10, "Status:", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(95, 10, student.get('status', 'N/A'), border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R', fill=True)
+    attendance = student.get('attendance') or {}
+    if attendance.get('rate') is not None:
+        pdf.set_font('Helvetica', '', 10)
+        pdf.cell(95, 10, "Attendance:", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+        pdf.set_font('Helvetica', 'B', 12)
+        pdf.cell(95, 10, f"{attendance['rate']}% ({attendance['absent']} absent, {attendance['late']} late)", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R', fill=True)
+    pdf.ln(10)
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, "Basic Information", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.cell(40, 7, "Email:", new_x=XPos.RIGHT, new_y=YPos.TOP)
+    pdf.cell(0, 7, student.get('email', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(40, 7, "Parent Phone:", new_x=XPos.RIGHT, new_y=YPos.TOP)
+    pdf.cell(0, 7, student.get('parentPhone', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(40, 7, "Join Date:", new_x=XPos.RIGHT, new_y=YPos.TOP)
+    pdf.cell(0, 7, student.get('joinDate', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.cell(40, 7, "Robotics Team:", new_x=XPos.RIGHT, new_y=YPos.TOP)
+    pdf.cell(0, 7, student.get('roboticsTeam', '-'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.ln(10)
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, "Skills", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.set_font('Helvetica', '', 10)
+    skills_dict = student.get('skills', {})
+    if skills_dict and isinstance(skills_dict, dict):
+        for skill_name, rating in skills_dict.items():
+            pdf.cell(60, 7, f"{skill_name}:", new_x=XPos.RIGHT, new_y=YPos.TOP, align='L')
+            pdf.cell(0, 7, f"{rating} / 5", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    else:
+        pdf.multi_cell(0, 7, "No skills listed.", align='L')
+    pdf.ln(10)
+    if assignments:
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 14)
+        pdf.cell(0, 10, "Assignments & Scores", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+        pdf.set_font('Helvetica', 'B', 9)
+        pdf.set_fill_color(248, 250, 252)
+        col_widths = {'title': 70, 'type': 30, 'due': 25, 'max': 15, 'score': 15, 'pct': 15}
+        pdf.cell(col_widths['title'], 7, "Title", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+        pdf.cell(col_widths['type'], 7, "Type", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+        pdf.cell(col_widths['due'], 7, "Due Date", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+        pdf.cell(col_widths['max'], 7, "Max", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
+        pdf.cell(col_widths['score'], 7, "Score", border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
+        pdf.cell(col_widths['pct'], 7, "%", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
+        pdf.set_font('Helvetica', '', 9)
+        fill = False
+        for assignment in assignments:
+            pdf.set_fill_color(255, 255, 255) if not fill else pdf.set_fill_color(248, 250, 252)
+            pdf.cell(col_widths['title'], 8, str(assignment.get('title', '-'))[:40], border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+            pdf.cell(col_widths['type'], 8, str(assignment.get('type', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+            pdf.cell(col_widths['due'], 8, str(assignment.get('dueDate', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='L', fill=True)
+            pdf.cell(col_widths['max'], 8, str(assignment.get('totalPoints', '-')), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
+            score = assignment.get('score')
+            score_str = str(score) if score is not None else '-'
+            pdf.cell(col_widths['score'], 8, score_str, border=1, new_x=XPos.RIGHT, new_y=YPos.TOP, align='C', fill=True)
+            pct_str = f"{assignment['percentage']}%" if assignment.get('percentage') is not None else '-'
+            pdf.cell(col_widths['pct'], 8, pct_str, border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
+            fill = not fill
+    else:
+        pdf.set_font('Helvetica', 'I', 10)
+        pdf.cell(0, 10, "No assignments found for this student's class.", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+
+def render_student_report_pdf(student, assignments, generation_date):
+    pdf = PDF(orientation='P', unit='mm', format='A4')
+    draw_student_report(pdf, student, assignments, generation_date)
+    return bytes(pdf.output())
+
+# --- Batch Reports ---
+# Class/campus report runs render one PDF per student. fpdf2 is pure Python and
+# CPU bound, so larger runs are spread over a process pool of REPORT_PROCESSES
+# workers; small runs (or hosts where a pool cannot be started) render inline.
+# The pool is shared by every request in the process and created on first use.
+# Its workers are started with forkserver (or spawn), never by forking this
+# process, which has request and background threads that may hold locks.
+# The ZIP is written entry by entry into the response as each PDF comes back.
+REPORT_PROCESSES = int(os.environ.get('REPORT_PROCESSES', 0)) or os.cpu_count() or 1
+REPORT_POOL_MIN_JOBS = 8
+_report_pool = {'pool': None}
+_report_pool_lock = threading.Lock()
+
+def report_pool():
+    with _report_pool_lock:
+        if _report_pool['pool'] is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _report_pool['pool'] = ProcessPoolExecutor(max_workers=REPORT_PROCESSES,
+                                                       mp_context=multiprocessing.get_context(start_method))
+        return _report_pool['pool']
+
+def _discard_report_pool(pool):
+    with _report_pool_lock:
+        if _report_pool['pool'] is pool:
+            _report_pool['pool'] = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def report_classes(index, class_id=None, campus=None, grade=None, section=None):
+    if class_id:
+        cls = index.classes.get(class_id)
+        return [cls] if cls else []
+    classes = [c for c in index.classes.values()
+               if (not campus or c.get('campus') == campus)
+               and (not grade or c.get('grade') == grade)
+               and (not section or c.get('section') == section)]
+    return sorted(classes, key=lambda c: (c.get('campus', ''), c.get('name', ''), c.get('section', '')))
+
+def report_filename(student):
+    name = re.sub(r'[^A-Za-z0-9._-]+', '_', student.get('name', 'Student')).strip('_') or 'Student'
+    return f"Report_{name}_{student.get('id', '')}.pdf"
+
+def build_report_jobs(index, classes):
+    jobs = []
+    today = datetime.now().strftime('%Y-%m-%d')
+    attendance = load_attendance()
+    for cls in classes:
+        for student in sorted(index.class_students(cls.get('id')), key=lambda s: s.get('name', '')):
+            view, assignments, _ = build_student_view(index, student, today, attendance)
+            jobs.append((report_filename(view), view, assignments))
+    return jobs
+
+def _render_report_job(job):
+    filename, student, assignments, generation_date = job
+    return filename, render_student_report_pdf(student, assignments, generation_date)
+
+def render_report_jobs(jobs, generation_date):
+    work = [(filename, student, assignments, generation_date) for filename, student, assignments in jobs]
+    pool = None
+    if REPORT_PROCESSES > 1 and len(work) >= REPORT_POOL_MIN_JOBS:
+        try:
+            pool = report_pool()
+        except (OSError, NotImplementedError, ValueError) as e:
+            print(f"Report process pool unavailable, rendering inline: {e}")
+    if pool is None:
+        for job in work:
+            yield _render_report_job(job)
+        return
+    chunksize = max(1, min(16, len(work) // (REPORT_PROCESSES * 4)))
+    try:
+        # Closing this generator (e.g. the client went away) cancels the chunks not yet started.
+        yield from pool.map(_render_report_job, work, chunksize=chunksize)
+    except GeneratorExit:
+        raise
+    except BrokenProcessPool:
+        # A worker died; the next run starts a fresh pool.
+        _discard_report_pool(pool)
+        raise
+
+def render_merged_report(jobs, generation_date):
+    pdf = PDF(orientation='P', unit='mm', format='A4')
+    for _, student, assignments in jobs:
+        draw_student_report(pdf, student, assignments, generation_date)
+    return bytes(pdf.output())
+
+class _ZipStream(io.RawIOBase):
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buffer += b
+        self.offset += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.offset
+
+    def drain(self):
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        return chunk
+
+def stream_report_zip(rendered):
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for filename, pdf_bytes in rendered:
+            zf.writestr(filename, pdf_bytes)
+            yield stream.drain()
+    yield stream.drain()
+
+# --- Report PDF Cache ---
+# Rendered single-student reports are kept in REPORT_CACHE_DIR under the student
+# id and the data version they were rendered from. The only other input is the
+# day: an ungraded assignment turns from Pending to Missing once it is past due.
+# For one version that is fully described by how many are missing, so that count
+# is part of the key too. The page is dated with the data's last update rather
+# than today, so an unchanged report stays cached across days. The key doubles as
+# the ETag. Storing a student's report removes their older versions. A hit touches
+# the file's mtime, and when the directory grows past REPORT_CACHE_MAX_BYTES the
+# least recently used files are removed.
+REPORT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), 'report_cache')
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+def report_cache_key(data, student, assignments):
+    missing = sum(1 for a in assignments if a['workStatus'] == 'Missing')
+    return f"{student.get('id')}-v{data.get('version', 0)}-m{missing}"
+
+def _report_cache_path(key):
+    return os.path.join(REPORT_CACHE_DIR, f"{key}.pdf")
+
+def read_cached_report(key):
+    path = _report_cache_path(key)
+    try:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+        os.utime(path)
+        return pdf_bytes
+    except OSError:
+        return None
+
+def store_cached_report(key, pdf_bytes):
+    try:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=REPORT_CACHE_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, _report_cache_path(key))
+        _evict_cached_reports(key)
+    except OSError as e:
+        print(f"Could not cache report {key}: {e}")
+
+def _evict_cached_reports(key):
+    student_prefix = key.split('-v', 1)[0] + '-v'
+    entries = []
+    total = 0
+    for entry in os.scandir(REPORT_CACHE_DIR):
+        if not entry.name.endswith('.pdf'):
+            continue
+        if entry.name.startswith(student_prefix) and entry.name != f"{key}.pdf":
+            # An older version of the report just stored.
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        total += st.st_size
+    if total <= REPORT_CACHE_MAX_BYTES:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= REPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,163 @@
+import bisect
+import heapq
+import re
+
+# --- Student Search ---
+class StudentSearchIndex:
+    # Token index for /search. Each student is split into lower-case tokens
+    # (words of the name/email plus whole uid, roll number, email and phone digits),
+    # weighted by the field they came from. A query term matches a token exactly
+    # or as a prefix (bisect over the sorted token list), as a substring (token
+    # trigrams) or, for name words, within one typo (shared single-letter deletions).
+    FIELD_WEIGHTS = (('name', 3), ('uid', 3), ('rollNumber', 2), ('email', 2), ('parentPhone', 1))
+    EXACT, PREFIX, SUBSTRING, FUZZY = 1.0, 0.8, 0.5, 0.3
+    FUZZY_MIN_LENGTH = 4
+
+    def __init__(self, students=()):
+        self.postings = {}
+        self.student_tokens = {}
+        self.trigrams = {}
+        self.deletions = {}
+        for student in students:
+            self._index_student(student)
+        self.tokens = sorted(self.postings)
+        for token in self.tokens:
+            self._add_token_keys(token)
+
+    @staticmethod
+    def tokenize(student):
+        tokens = {}
+        for field, weight in StudentSearchIndex.FIELD_WEIGHTS:
+            value = str(student.get(field) or '').strip().lower()
+            if not value:
+                continue
+            if field == 'parentPhone':
+                parts = [re.sub(r'\D', '', value)]
+            elif field == 'name':
+                parts = re.split(r'[^0-9a-z]+', value)
+            else:
+                parts = re.split(r'[^0-9a-z]+', value) + [value]
+            for part in parts:
+                if part and tokens.get(part, 0) < weight:
+                    tokens[part] = weight
+        return tokens
+
+    @staticmethod
+    def _grams(token):
+        return {token[i:i + 3] for i in range(len(token) - 2)}
+
+    @staticmethod
+    def _deletion_keys(token):
+        return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+    def _is_fuzzy_token(self, token):
+        return len(token) >= self.FUZZY_MIN_LENGTH and token.isalpha() and 3 in self.postings[token]
+
+    def _add_token_keys(self, token):
+        if token.isalnum():
+            for gram in self._grams(token):
+                self.trigrams.setdefault(gram, set()).add(token)
+        if self._is_fuzzy_token(token):
+            for key in self._deletion_keys(token):
+                self.deletions.setdefault(key, set()).add(token)
+
+    def _drop_token_keys(self, token):
+        for mapping, keys in ((self.trigrams, self._grams(token)), (self.deletions, self._deletion_keys(token))):
+            for key in keys:
+                tokens = mapping.get(key)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del mapping[key]
+
+    def _index_student(self, student):
+        # postings: token -> {field weight: {student_id: None}}
+        student_id = student.get('id')
+        tokens = self.tokenize(student)
+        self.student_tokens[student_id] = tokens
+        new_tokens = []
+        for token, weight in tokens.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                new_tokens.append(token)
+            posting.setdefault(weight, {})[student_id] = None
+        return new_tokens
+
+    def add(self, student):
+        for token in self._index_student(student):
+            bisect.insort(self.tokens, token)
+            self._add_token_keys(token)
+
+    def remove(self, student_id):
+        for token, weight in self.student_tokens.pop(student_id, {}).items():
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            bucket = posting.get(weight, {})
+            bucket.pop(student_id, None)
+            if not bucket:
+                posting.pop(weight, None)
+            if not posting:
+                self._drop_token_keys(token)
+                del self.postings[token]
+                i = bisect.bisect_left(self.tokens, token)
+                if i < len(self.tokens) and self.tokens[i] == token:
+                    del self.tokens[i]
+
+    def _matching_tokens(self, term):
+        matches = {}
+        i = bisect.bisect_left(self.tokens, term)
+        while i < len(self.tokens) and self.tokens[i].startswith(term):
+            token = self.tokens[i]
+            matches[token] = self.EXACT if token == term else self.PREFIX
+            i += 1
+        gram_sets = sorted((self.trigrams.get(gram, set()) for gram in self._grams(term)), key=len)
+        if gram_sets:
+            for token in gram_sets[0].intersection(*gram_sets[1:]):
+                if token not in matches and term in token:
+                    matches[token] = self.SUBSTRING
+        if len(term) >= self.FUZZY_MIN_LENGTH:
+            for key in self._deletion_keys(term):
+                for token in self.deletions.get(key, ()):
+                    matches.setdefault(token, self.FUZZY)
+        return matches
+
+    def search(self, query, limit):
+        term_matches = [self._matching_tokens(term) for term in query.lower().split()]
+        if not term_matches or not all(term_matches):
+            return []
+        if len(term_matches) == 1:
+            # Walk (token, field weight) buckets best score first; the first time a
+            # student is seen is its best score, so stop once `limit` are found.
+            buckets = sorted(((quality * weight, token, weight)
+                              for token, quality in term_matches[0].items()
+                              for weight in self.postings[token]),
+                             key=lambda bucket: -bucket[0])
+            results = {}
+            for _, token, weight in buckets:
+                for student_id in self.postings[token][weight]:
+                    results.setdefault(student_id, None)
+                    if len(results) >= limit:
+                        return list(results)
+            return list(results)
+        # Several terms: every term has to match, so intersect the students each
+        # term reaches and only score that intersection.
+        candidates = None
+        for matches in term_matches:
+            reached = set().union(*(bucket for token in matches for bucket in self.postings[token].values()))
+            candidates = reached if candidates is None else candidates & reached
+            if not candidates:
+                return []
+        scores = dict.fromkeys(candidates, 0)
+        for matches in term_matches:
+            best = {}
+            for token, quality in matches.items():
+                for weight, bucket in self.postings[token].items():
+                    score = quality * weight
+                    for student_id in bucket.keys() & candidates:
+                        if score > best.get(student_id, 0):
+                            best[student_id] = score
+            for student_id, score in best.items():
+                scores[student_id] += score
+        return [student_id for student_id, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))]
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+import tempfile
+import sqlite3
+import secrets
+from werkzeug.datastructures import CallbackDict
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from constants import DATA_FILE
+
+# --- Sessions ---
+# Session contents live server-side in SESSION_FILE, an SQLite database shared by
+# every worker; the cookie only carries a random session id signed with the
+# app's secret key. The key comes from SECRET_KEY or is generated once into
+# SECRET_KEY_FILE, so sessions survive restarts and work across gunicorn workers.
+# A session expires SESSION_TTL seconds after it was last written. Unchanged
+# sessions are only rewritten (to push the expiry out) once half of that has
+# passed, and expired rows are purged every SESSION_PURGE_INTERVAL seconds.
+SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE', os.path.splitext(DATA_FILE)[0] + '.secret_key')
+SESSION_FILE = os.environ.get('SESSION_FILE', os.path.splitext(DATA_FILE)[0] + '.sessions.sqlite3')
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 12 * 3600))
+SESSION_PURGE_INTERVAL = 600
+
+def load_secret_key(path=SECRET_KEY_FILE):
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    # Write a complete key file and link it into place: if several workers start
+    # at once, the first link wins and everyone reads that key back.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(32))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.remove(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.replaced_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        # Same contents under a new id (at login), so an id handed out before
+        # authentication cannot be reused afterwards.
+        if self.sid is not None:
+            self.replaced_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+class SQLiteSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_purge = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires)')
+            self._local.conn = conn
+        return conn
+
+    def _signer(self, app):
+        if not app.secret_key:
+            # Loaded (or generated) on first use rather than when the app is imported.
+            app.secret_key = load_secret_key()
+        return Signer(app.secret_key, salt='server-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                row = self._connection().execute('SELECT data, expires FROM sessions WHERE id = ?', (sid,)).fetchone()
+                if row and row[1] > time.time():
+                    return ServerSession(self.serializer.loads(row[0]), sid, row[1])
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        conn = self._connection()
+        if session.replaced_sid:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session.replaced_sid,))
+        if not session:
+            if session.sid is not None:
+                conn.execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        now = time.time()
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        elif not session.modified and session.expires - now > self.ttl / 2:
+            return
+        session.expires = now + self.ttl
+        conn.execute('INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                     (session.sid, self.serializer.dumps(dict(session)), session.expires))
+        if now - self._last_purge > SESSION_PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+        response.set_cookie(name, self._signer(app).sign(session.sid).decode('ascii'),
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
@@ -185,12 +185,15 @@ function initializeSidebarToggle() {
 // --- Search ---
 function initializeSearchFunctionality() {
     const searchInput = document.getElementById('studentSearch'); const resultsContainer = document.getElementById('searchResults'); if (!searchInput || !resultsContainer) return;
+    let searchController = null; // Aborts the previous request so a slow response can't overwrite newer results
     searchInput.addEventListener('input', debounce(async (e) => {
         const query = e.target.value.trim(); resultsContainer.innerHTML = '';
+        if (searchController) searchController.abort();
         if (query.length < 2) { resultsContainer.classList.add('hidden'); return; }
         resultsContainer.innerHTML = '<div class="p-4 text-center text-gray-500 text-sm">Searching...</div>'; resultsContainer.classList.remove('hidden');
-        try { const response = await fetch(`/search?q=${encodeURIComponent(query)}`); if (!response.ok) throw new Error(`HTTP error ${response.status}`); const students = await response.json(); displaySearchResults(students, query, resultsContainer); }
-        catch (error) { console.error('Search failed:', error); showSearchError(resultsContainer, 'Search failed.'); }
+        searchController = new AbortController();
+        try { const response = await fetch(`/search?q=${encodeURIComponent(query)}`, { signal: searchController.signal }); if (!response.ok) throw new Error(`HTTP error ${response.status}`); const students = await response.json(); displaySearchResults(students, query, resultsContainer); }
+        catch (error) { if (error.name === 'AbortError') return; console.error('Search failed:', error); showSearchError(resultsContainer, 'Search failed.'); }
     }, 300));
     document.addEventListener('click', (e) => { if (!e.target.closest('#studentSearch') && !e.target.closest('#searchResults')) { resultsContainer.classList.add('hidden'); } });
     searchInput.addEventListener('keydown', (e) => { if (e.key === 'Escape') { resultsContainer.classList.add('hidden'); searchInput.blur(); } });
@@ -229,25 +232,44 @@ async function updateGrade(studentId, newGrade, event) {
     } catch (error) { console.error('Error updating grade:', error); showToast(`Error: ${error.message}`, 'error'); if(inputElement){ inputElement.classList.remove('border-yellow-500'); inputElement.classList.add('border-red-500'); } }
     finally { if (inputElement) inputElement.disabled = false; }
 }
-async function updateAssignmentGrade(assignmentId, studentId, score, event, totalPoints) {
+// Gradebook edits are queued and saved together through /update_assignment_grades_bulk,
+// so a teacher typing down a column costs one request instead of one per cell.
+const pendingScoreEdits = new Map();
+const GRADE_SAVE_DELAY_MS = 800;
+const flushScoreEditsDebounced = debounce(() => flushScoreEdits(), GRADE_SAVE_DELAY_MS);
+
+function updateAssignmentGrade(assignmentId, studentId, score, event, totalPoints) {
     const inputElement = event ? event.target : null; let scoreToSave = null;
     if (score !== null && String(score).trim() !== '') {
         const scoreNum = parseInt(score); if (isNaN(scoreNum) || scoreNum < 0 || scoreNum > totalPoints) { showToast(`Score must be 0-${totalPoints} or empty.`, 'error'); if(inputElement) inputElement.focus(); return; }
         scoreToSave = scoreNum;
     }
-    if (inputElement) { inputElement.classList.remove('border-red-500'); inputElement.classList.add('border-yellow-500'); inputElement.disabled = true; }
+    if (inputElement) { inputElement.classList.remove('border-red-500', 'border-green-500'); inputElement.classList.add('border-yellow-500'); }
+    pendingScoreEdits.set(`${assignmentId}:${studentId}`, { assignmentId, studentId, score: scoreToSave, inputElement, totalPoints });
+    flushScoreEditsDebounced();
+}
+async function flushScoreEdits(keepalive = false) {
+    if (pendingScoreEdits.size === 0) return;
+    const edits = Array.from(pendingScoreEdits.values()); pendingScoreEdits.clear();
+    const grades = {};
+    edits.forEach(edit => { (grades[edit.assignmentId] = grades[edit.assignmentId] || {})[edit.studentId] = edit.score; });
     try {
-        const result = await fetchWithErrorHandling('/update_assignment_grade', { method: 'POST', body: JSON.stringify({ assignment_id: assignmentId, student_id: studentId, grade: scoreToSave }) });
-        if (result.success) {
-            showToast('Score updated!', 'success');
-            if (inputElement) {
-                inputElement.classList.remove('border-yellow-500'); inputElement.classList.add('border-green-500','bg-green-50/50');
-                setTimeout(() => { inputElement.classList.remove('border-green-500','bg-green-50/50'); updateAssessmentRow(inputElement.closest('tr'), scoreToSave, totalPoints); }, 1000);
-            }
-        } else { throw new Error(result.message || 'Update failed.'); }
-    } catch (error) { console.error('Error updating score:', error); showToast(`Error: ${error.message}`, 'error'); if(inputElement){ inputElement.classList.remove('border-yellow-500'); inputElement.classList.add('border-red-500'); } }
-    finally { if (inputElement) inputElement.disabled = false; }
+        const result = await fetchWithErrorHandling('/update_assignment_grades_bulk', { method: 'POST', body: JSON.stringify({ grades }), keepalive });
+        const failed = new Map((result.errors || []).map(err => [`${err.assignment_id}:${err.student_id}`, err.message]));
+        edits.forEach(edit => {
+            const input = edit.inputElement; if (!input) return;
+            input.classList.remove('border-yellow-500');
+            if (failed.has(`${edit.assignmentId}:${edit.studentId}`)) { input.classList.add('border-red-500'); input.title = failed.get(`${edit.assignmentId}:${edit.studentId}`); return; }
+            input.title = ''; input.classList.add('border-green-500','bg-green-50/50');
+            setTimeout(() => { input.classList.remove('border-green-500','bg-green-50/50'); updateAssessmentRow(input.closest('tr'), edit.score, edit.totalPoints); }, 1000);
+        });
+        showToast(result.message || 'Scores updated!', failed.size ? 'error' : 'success');
+    } catch (error) {
+        console.error('Error updating scores:', error); showToast(`Error: ${error.message}`, 'error');
+        edits.forEach(edit => { if (edit.inputElement) { edit.inputElement.classList.remove('border-yellow-500'); edit.inputElement.classList.add('border-red-500'); } });
+    }
 }
+window.addEventListener('pagehide', () => flushScoreEdits(true));
 function updateStatusBadge(studentId, grade) {
      const row = document.querySelector(`tr[data-student-id="${studentId}"]`); if (!row) return;
      const statusCell = row.querySelector('.status-cell'); if (!statusCell) return;
@@ -316,11 +338,15 @@ function updateClassSummaryStats() {
 
 
 // --- Page-Specific Initializers ---
-function initializePageSpecificFeatures() {
-    document.querySelectorAll('.grade-input, .score-input').forEach(input => {
+function initializeGradeInputs(root = document) {
+    root.querySelectorAll('.grade-input:not([data-initialized]), .score-input:not([data-initialized])').forEach(input => {
+        input.dataset.initialized = 'true';
         input.addEventListener('focus', function() { this.select(); this.classList.remove('border-green-500', 'border-red-500', 'border-yellow-500', 'bg-green-50/50'); });
         input.addEventListener('keydown', function(e) { if (e.key === 'Enter') { e.preventDefault(); this.blur(); } });
     });
+}
+function initializePageSpecificFeatures() {
+    initializeGradeInputs();
     const currentPath = window.location.pathname;
     if (document.getElementById('gradeDistributionChart')) {
         console.log("Init Dashboard...");
@@ -342,6 +368,8 @@ function initializePageSpecificFeatures() {
 // --- Page-Specific Filter/Setup Functions ---
 
 // Students Page Filters (students.html)
+// Filtering, sorting and paging happen on the server (/api/students). The first page is
+// rendered with the page; further pages are appended as the table footer scrolls into view.
 function initializeStudentPageFilters() {
     console.log("Initializing student page filters...");
     const searchInput = document.getElementById('searchInput');
@@ -349,46 +377,60 @@ function initializeStudentPageFilters() {
     const gradeFilter = document.getElementById('gradeFilter');
     const sectionFilter = document.getElementById('sectionFilter');
     const campusFilter = document.getElementById('campusFilter');
+    const sortSelect = document.getElementById('sortSelect');
     const studentTableBody = document.getElementById('studentTableBody');
-    if (!studentTableBody) { console.warn("Student table body not found."); return; }
+    const listFooter = document.getElementById('studentListFooter');
+    if (!studentTableBody || !listFooter) { console.warn("Student table body not found."); return; }
     if (!searchInput || !statusFilter || !gradeFilter || !sectionFilter || !campusFilter) { console.warn("Student filter elements not all found."); }
-    const studentRows = Array.from(studentTableBody.querySelectorAll('.student-row'));
 
-    window.filterStudentsGlobally = function filterStudents() {
-        console.log("Filtering students...");
-        const searchTerm = searchInput ? searchInput.value.toLowerCase().trim() : '';
-        const statusValue = statusFilter ? statusFilter.value : 'all';
-        const gradeValue = gradeFilter ? gradeFilter.value : 'all';
-        const sectionValue = sectionFilter ? sectionFilter.value : 'all';
-        const campusValue = campusFilter ? campusFilter.value : 'all';
-        let visibleCount = 0;
-        studentRows.forEach(row => {
-            const name = row.dataset.name || ''; const email = row.dataset.email || ''; const uid = row.dataset.uid || ''; const status = row.dataset.status || 'N/A';
-            const gradeName = row.dataset.gradeName || ''; const sectionName = row.dataset.sectionName || ''; const campusName = row.dataset.campusName || '';
-            
-            // On /students page, we filter. On /class/ page, we don't.
-            // But this function is only called on /students page, so filters are fine.
-            const matchesSearch = searchTerm === '' || name.includes(searchTerm) || email.includes(searchTerm) || uid.includes(searchTerm);
-            const matchesStatus = statusValue === 'all' || status === statusValue;
-            const matchesGrade = gradeValue === 'all' || gradeName === gradeValue.toLowerCase();
-            const matchesSection = sectionValue === 'all' || sectionName === sectionValue.toLowerCase();
-            const matchesCampus = campusValue === 'all' || campusName === campusValue.toLowerCase();
-            const isVisible = matchesSearch && matchesStatus && matchesGrade && matchesSection && matchesCampus;
-            
-            row.style.display = isVisible ? '' : 'none'; 
-            if (isVisible) visibleCount++;
-        });
-        const noStudentsRow = studentTableBody.querySelector('tr:not(.student-row)');
-        if (noStudentsRow) noStudentsRow.style.display = (visibleCount === 0) ? '' : 'none';
-        if (typeof updateBulkActionsVisibility === 'function') updateBulkActionsVisibility();
-        console.log(`Filtering done. Visible: ${visibleCount}`);
+    let currentPage = parseInt(listFooter.dataset.page) || 1;
+    let hasMore = listFooter.dataset.hasMore === 'true';
+    let loading = false;
+    let requestSeq = 0; // Responses for superseded filter states are dropped
+
+    function buildParams(page) {
+        const [sort, order] = (sortSelect ? sortSelect.value : 'name:asc').split(':');
+        const params = new URLSearchParams({ page, per_page: listFooter.dataset.perPage || 50, sort, order });
+        const filters = { q: searchInput ? searchInput.value.trim() : '', grade: gradeFilter ? gradeFilter.value : 'all', section: sectionFilter ? sectionFilter.value : 'all', campus: campusFilter ? campusFilter.value : 'all', status: statusFilter ? statusFilter.value : 'all' };
+        Object.entries(filters).forEach(([key, value]) => { if (value && value !== 'all') params.set(key, value); });
+        return params;
     }
+
+    async function loadStudentPage(page, replace) {
+        if (loading && !replace) return;
+        const seq = ++requestSeq; loading = true;
+        const params = buildParams(page);
+        try {
+            const result = await fetchWithErrorHandling(`/api/students?${params.toString()}&format=html`);
+            if (seq !== requestSeq) return;
+            if (replace) {
+                studentTableBody.innerHTML = result.html;
+                params.delete('page'); params.delete('per_page');
+                history.replaceState(null, '', `${window.location.pathname}?${params.toString()}`);
+            } else {
+                studentTableBody.insertAdjacentHTML('beforeend', result.html);
+            }
+            currentPage = result.page; hasMore = result.has_more;
+            document.getElementById('studentListShown').textContent = studentTableBody.querySelectorAll('.student-row').length;
+            document.getElementById('studentListTotal').textContent = result.total;
+            initializeGradeInputs(studentTableBody);
+            if (typeof updateBulkActionsVisibility === 'function') updateBulkActionsVisibility();
+        } catch (error) {
+            if (seq === requestSeq) { console.error('Loading students failed:', error); showToast(`Error: ${error.message}`, 'error'); }
+        } finally {
+            if (seq === requestSeq) loading = false;
+        }
+    }
+
+    window.filterStudentsGlobally = function filterStudents() { loadStudentPage(1, true); };
     if(searchInput) searchInput.addEventListener('input', debounce(window.filterStudentsGlobally, 300));
-    if(statusFilter) statusFilter.addEventListener('change', window.filterStudentsGlobally);
-    if(gradeFilter) gradeFilter.addEventListener('change', window.filterStudentsGlobally);
-    if(sectionFilter) sectionFilter.addEventListener('change', window.filterStudentsGlobally);
-    if(campusFilter) campusFilter.addEventListener('change', window.filterStudentsGlobally);
-    window.filterStudentsGlobally(); // Run on load
+    [statusFilter, gradeFilter, sectionFilter, campusFilter, sortSelect].forEach(select => { if (select) select.addEventListener('change', window.filterStudentsGlobally); });
+
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting) && hasMore && !loading) loadStudentPage(currentPage + 1, false);
+        }, { rootMargin: '400px' }).observe(listFooter);
+    }
 }
 
 
@@ -772,7 +814,7 @@ async function refreshSelectWithOptions(selectElement, apiUrl, errorMessage = 'E
      selectElement.disabled = true; if (loadingSpinner) loadingSpinner.classList.remove('hidden');
      selectElement.innerHTML = '<option value="" disabled selected>Loading...</option>';
      try {
-         const response = await fetch(apiUrl + '?nocache=' + new Date().getTime());
+         const response = await fetch(apiUrl, { cache: 'no-cache' });
          if (!response.ok) throw new Error(`HTTP ${response.status}`);
          const optionsData = await response.json(); if (!Array.isArray(optionsData)) throw new Error('Invalid data');
 
@@ -837,7 +879,7 @@ async function refreshSelectWithOptions(selectElement, apiUrl, errorMessage = 'E
 }
 
 
-function showImportStudentsModal() { showModal('importStudentsModal'); }
+function showImportStudentsModal() { document.getElementById('importProgress')?.classList.add('hidden'); showModal('importStudentsModal'); }
 function closeImportStudentsModal() { closeModal('importStudentsModal'); }
 
 async function showEditStudentModal(studentId) {
@@ -1157,6 +1199,8 @@ function initializeImportStudentsFormListener() {
 
         const formData = new FormData();
         formData.append('student_csv', fileInput.files[0]);
+        const dryRun = document.getElementById('importDryRun')?.checked;
+        if (dryRun) formData.append('dry_run', '1');
 
         try {
             // Use fetchWithErrorHandling as it's designed to handle FormData
@@ -1165,15 +1209,21 @@ function initializeImportStudentsFormListener() {
                 body: formData // No Content-Type header needed
             });
 
-            if (result.success) {
-                showToast(result.message || 'Import successful!', 'success');
-                closeImportStudentsModal();
-                // Reload the page to show new students and import summary
-                setTimeout(() => window.location.reload(), 1000);
-            } else {
+            if (!result.success) {
                 // Server returned a JSON error
                 throw new Error(result.message || 'Import failed. Please check the file.');
             }
+            // The import runs as a background job; follow it until it finishes.
+            const job = await pollImportJob(result.status_url);
+            if (job.status === 'completed') {
+                showToast(job.message || 'Import successful!', job.error_count ? 'info' : 'success');
+                if (!job.error_count && !job.dry_run) {
+                    closeImportStudentsModal();
+                    setTimeout(() => window.location.reload(), 1000);
+                }
+            } else {
+                throw new Error(job.message || 'Import failed.');
+            }
         } catch (error) {
             // Catch network errors or non-JSON errors
             console.error('Error importing students:', error);
@@ -1189,6 +1239,25 @@ function initializeImportStudentsFormListener() {
     });
 }
 
+async function pollImportJob(statusUrl, intervalMs = 1000) {
+    const progress = document.getElementById('importProgress');
+    const bar = document.getElementById('importProgressBar');
+    const text = document.getElementById('importProgressText');
+    const percent = document.getElementById('importProgressPercent');
+    const errorsLink = document.getElementById('importErrorsLink');
+    if (progress) progress.classList.remove('hidden');
+    if (errorsLink) errorsLink.classList.add('hidden');
+    while (true) {
+        const job = await fetchWithErrorHandling(statusUrl);
+        if (bar) bar.style.width = `${job.progress || 0}%`;
+        if (percent) percent.textContent = `${job.progress || 0}%`;
+        if (text) text.textContent = job.status === 'running' ? `${job.rows_processed} rows read, ${job.dry_run ? (job.summary ? job.summary.valid_rows : 0) + ' valid' : job.added + ' added'}` : job.message;
+        if (errorsLink && job.errors_url) { errorsLink.href = job.errors_url; errorsLink.classList.remove('hidden'); }
+        if (job.status === 'completed' || job.status === 'failed') return job;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 
 function initializeResetModalListeners() {
     const btn = document.getElementById('confirmReset');
@@ -1254,20 +1323,21 @@ function initializeBulkStudentActions() {
          return;
     }
 
-    const studentCheckboxes = studentTableBody.querySelectorAll('.student-checkbox');
-    if (studentCheckboxes.length === 0) { 
+    // Check if we are on the /students page (rows there are replaced/appended as pages load)
+    const onStudentsPage = (typeof window.filterStudentsGlobally === 'function');
+    const getStudentCheckboxes = () => studentTableBody.querySelectorAll('.student-checkbox');
+
+    if (getStudentCheckboxes().length === 0 && !onStudentsPage) { 
         console.log("No student checkboxes found."); 
         bulkActionContainer.classList.add('hidden'); 
         selectAllCheckbox.disabled = true; 
         return; 
     }
 
-    console.log("Initializing Bulk Student Actions... Found", studentCheckboxes.length, "checkboxes");
-
-    // Check if we are on the /students page
-    const onStudentsPage = (typeof window.filterStudentsGlobally === 'function');
+    console.log("Initializing Bulk Student Actions... Found", getStudentCheckboxes().length, "checkboxes");
 
     window.updateBulkActionsVisibility = () => {
+        const studentCheckboxes = getStudentCheckboxes();
         let visibleCheckboxes;
         if (onStudentsPage) {
             visibleCheckboxes = Array.from(studentCheckboxes).filter(cb => cb.closest('tr').style.display !== 'none');
@@ -1286,6 +1356,7 @@ function initializeBulkStudentActions() {
     };
 
     selectAllCheckbox.addEventListener('change', () => {
+        const studentCheckboxes = getStudentCheckboxes();
         let visibleCheckboxes;
         if (onStudentsPage) {
              visibleCheckboxes = Array.from(studentCheckboxes).filter(cb => cb.closest('tr').style.display !== 'none');
@@ -1303,11 +1374,10 @@ function initializeBulkStudentActions() {
         updateBulkActionsVisibility();
     });
 
-    studentCheckboxes.forEach(cb => { 
-        cb.addEventListener('change', () => {
-            console.log("Checkbox changed:", cb.value, "checked:", cb.checked);
-            updateBulkActionsVisibility();
-        });
+    studentTableBody.addEventListener('change', (e) => {
+        if (!e.target.classList.contains('student-checkbox')) return;
+        console.log("Checkbox changed:", e.target.value, "checked:", e.target.checked);
+        updateBulkActionsVisibility();
     });
 
     deleteSelectedButton.addEventListener('click', async () => {
@@ -1315,6 +1385,7 @@ function initializeBulkStudentActions() {
             console.warn("Delete already in progress. Ignoring extra click.");
             return; 
         }
+        const studentCheckboxes = getStudentCheckboxes();
         let selectedIds;
         if (onStudentsPage) {
             selectedIds = Array.from(studentCheckboxes)
@@ -1463,6 +1534,18 @@ async function resetAllData() {
     finally { if(btn) setLoadingState(btn, false, original); }
 }
 
+// --- Rescan Student Photos ---
+async function rescanStudentPhotos() {
+    const btn = document.getElementById('rescanPhotosBtn'); const original = btn ? btn.innerHTML : 'Rescan Now';
+    if(btn) setLoadingState(btn, true, original);
+    try {
+        const result = await fetchWithErrorHandling('/api/rescan_photos', { method: 'POST' });
+        if (result.success) { showToast(result.message || 'Photos rescanned.', 'success'); }
+        else { throw new Error(result.message || 'Rescan failed.'); }
+    } catch (error) { console.error('Error rescanning photos:', error); showToast(`Error: ${error.message}`, 'error'); }
+    finally { if(btn) setLoadingState(btn, false, original); }
+}
+
 // --- Dropdown Functions ---
 function toggleDropdown(targetId) { const d = document.getElementById(`dropdown-${targetId}`); if(d){ const h = d.classList.contains('hidden'); closeDropdowns(targetId); d.classList.toggle('hidden', !h); } }
 function closeDropdowns(excludeId = null) { document.querySelectorAll('[id^="dropdown-"]').forEach(d => { if ((!excludeId || d.id !== `dropdown-${excludeId}`) && !d.classList.contains('hidden')) d.classList.add('hidden'); }); }
@@ -1473,7 +1556,7 @@ async function refreshAssignmentClassCheckboxes(listElement) {
     if (!listElement) { console.error("Class list element missing for checkboxes."); return; }
     listElement.innerHTML = '<p class="text-sm text-gray-500">Loading classes...</p>';
     try {
-        const response = await fetch('/api/get_classes?nocache=' + new Date().getTime());
+        const response = await fetch('/api/get_classes', { cache: 'no-cache' });
         if (!response.ok) throw new Error(`HTTP ${response.status}`);
         const classes = await response.json();
         listElement.innerHTML = ''; // Clear loading
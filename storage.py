@@ -0,0 +1,830 @@
+import json
+import os
+import logging
+import threading
+import time
+import tempfile
+import sqlite3
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; writes are then only serialised within one process.
+    fcntl = None
+from constants import CLASSES, SECTIONS, DEFAULT_CAMPUS, SECTION_COLOR_MAP, DEFAULT_SKILLS, DATA_FILE
+from index import get_index, get_status_from_grade
+from migrations import SCHEMA_VERSION, migrate_data
+from passwords import hash_password
+
+logger = logging.getLogger(__name__)
+
+# --- Data Handling Functions ---
+
+# Routes only ever see the plain `data` dict through load_data(), save_data() and
+# record_changes(); STORAGE decides where it lives. Two backends are available,
+# selected with the STORAGE_BACKEND environment variable:
+#   json   - data.json snapshot plus an append-only change journal (default)
+#   sqlite - a single SQLite database in WAL mode with indexed tables
+# `flask migrate-to-sqlite` copies data.json into the database.
+#
+# Both keep the parsed data in memory for the life of the process and only re-read
+# when another process has written. Every write bumps data['version'] (and stamps
+# data['updatedAt'], in epoch seconds) and runs
+# under data_write_lock(), which serialises writers across threads and (where
+# fcntl exists) across gunicorn workers via an flock on a .lock file next to the
+# store. Readers never take the file lock. Within a process, the cached data and
+# index are shared: request handlers hold a read lock for the whole request (see
+# the Data Read hook in app.py), and anything that changes the cached copy in
+# place (write routes, record_changes, refreshing from disk) first takes it
+# exclusively.
+# Writers that only build a new copy and swap it in (imports, snapshots) pass
+# exclusive=False and leave readers running.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+SQLITE_FILE = os.environ.get('SQLITE_FILE', os.path.splitext(DATA_FILE)[0] + '.sqlite3')
+JOURNAL_COMPACT_THRESHOLD = 500
+DATA_WRITE_RETRIES = 3
+
+class DataConflictError(Exception):
+    """Raised when the store changed on disk after the copy being saved was loaded."""
+
+_NO_DATA = object()
+
+class _ReadWriteLock:
+    # Many readers or one writer. A thread may read inside its own write; a reader
+    # that starts writing gives up its read lock until it is done (suspend_reads),
+    # so the two never deadlock. Waiting writers hold back new readers.
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def reading(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+    def acquire_read(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            me = threading.get_ident()
+            with self._cond:
+                while self._writer != me and (self._writer is not None or self._writers_waiting):
+                    self._cond.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+
+    def release_read(self):
+        self._local.depth -= 1
+        if not self._local.depth:
+            with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def suspend_reads(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            yield
+            return
+        self._local.depth = 1
+        self.release_read()
+        try:
+            yield
+        finally:
+            self.acquire_read()
+            self._local.depth = depth
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+class Storage:
+    """Shared cache and locking; subclasses implement reading and writing."""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.data = None
+        self._cache_lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._rw_lock = _ReadWriteLock()
+        self._reader = threading.local()
+        self._lock_depth = 0
+        self._lock_file = None
+        # Schema version of the store as last read, when it had to be migrated on
+        # load; `flask migrate-data` (or init_data_store()) writes the upgrade back.
+        # Until then the next save does.
+        self.migrated_from = None
+
+    # Lock order: thread lock, file lock, then the read/write lock.
+    @contextmanager
+    def write_lock(self, exclusive=True):
+        with self._rw_lock.suspend_reads(), self._write_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                lock_file = open(self.lock_path, 'a')
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                self._lock_file = lock_file
+            self._lock_depth += 1
+            try:
+                if exclusive:
+                    with self._rw_lock.write():
+                        yield
+                else:
+                    yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    lock_file, self._lock_file = self._lock_file, None
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def begin_read(self):
+        self._rw_lock.acquire_read()
+        self._reader.data = self.data
+
+    def end_read(self):
+        self._reader.data = None
+        self._rw_lock.release_read()
+
+    def load(self):
+        if self._rw_lock.reading() and getattr(self._reader, 'data', None) is not None:
+            # A reader keeps the copy it started with for the rest of its request.
+            return self._reader.data
+        if self._is_current():
+            return self.data
+        with self._rw_lock.suspend_reads(), self._rw_lock.write(), self._cache_lock:
+            # Another thread may have refreshed the cache while we waited for the lock.
+            if self._is_current():
+                return self.data
+            data = self._refresh()
+        if data is not _NO_DATA:
+            return data
+        # Nothing stored yet (or the store was unreadable): create the default data
+        # the way any other writer would.
+        with self.write_lock():
+            with self._cache_lock:
+                data = self._refresh()
+            if data is not _NO_DATA:
+                return data
+            return create_default_data()
+
+    def invalidate(self):
+        with self._cache_lock:
+            self.data = None
+            self._forget()
+
+    def _upgrade(self, data):
+        # A store written by an older build is upgraded in memory as it is read.
+        if data.get('schemaVersion', 0) < SCHEMA_VERSION:
+            self.migrated_from = data.get('schemaVersion', 0)
+            migrate_data(data)
+        return data
+
+    def check_not_stale(self, data):
+        if self.data is not data or not self._is_current():
+            raise DataConflictError("the data store changed since this copy was loaded")
+
+    # `replace=True` writes `data` even if it was not loaded from the current store
+    # (used when creating, resetting or migrating the store). `base` is the loaded
+    # copy that `data` was staged from; it becomes the cached copy only once written.
+    def save(self, data, replace=False, base=None):
+        # Writing a snapshot only reads `data`, so readers can carry on meanwhile.
+        with self.write_lock(exclusive=False):
+            if not replace:
+                self.check_not_stale(data if base is None else base)
+            try:
+                if not isinstance(data.get('grades'), dict): data['grades'] = {}
+                if not isinstance(data.get('assignments'), list): data['assignments'] = []
+                if not isinstance(data.get('students'), list): data['students'] = []
+                if not isinstance(data.get('classes'), list): data['classes'] = []
+                if not isinstance(data.get('users'), list): data['users'] = []
+                # Versions only ever move forward, even when replacing the whole store.
+                data['version'] = max(data.get('version', 0), self._stored_version()) + 1
+                data['updatedAt'] = int(time.time())
+                with self._cache_lock:
+                    self._write_snapshot(data, base)
+                    self.data = data
+            except Exception:
+                # The cached copy may hold edits that never reached the store; drop it
+                # and let the caller fail rather than report a save that did not happen.
+                logger.exception("Error saving data")
+                self.invalidate()
+                raise
+
+    # Apply small edits (see _apply_change) to `data` and persist just those edits.
+    def record_changes(self, data, changes):
+        if not changes:
+            return
+        with self.write_lock():
+            self.check_not_stale(data)
+            version = data.get('version', 0)
+            updated_at = int(time.time())
+            for change in changes:
+                version += 1
+                change['version'] = version
+                change['updatedAt'] = updated_at
+                _apply_change(data, change)
+            try:
+                with self._cache_lock:
+                    self._append_changes(data, changes)
+            except Exception:
+                logger.exception("Error recording changes")
+                self.invalidate()
+                raise
+
+class JSONFileStorage(Storage):
+    # Small, frequent edits (grade entry) are appended to an append-only change
+    # journal next to data.json (one JSON object per line) and replayed on load.
+    # Snapshots are written atomically and empty the journal; once the journal grows
+    # past JOURNAL_COMPACT_THRESHOLD entries a background thread folds it into a
+    # fresh snapshot. The cache is current while data.json's stat signature and the
+    # journal length are what we last read or wrote.
+
+    def __init__(self, path):
+        super().__init__(path + '.lock')
+        self.path = path
+        self.journal_path = path + '.journal'
+        self._compaction_thread = None
+        self._forget()
+
+    def _forget(self):
+        self._signature = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _stored_version(self):
+        return self.data.get('version', 0) if self.data is not None else 0
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def _is_current(self):
+        return (self.data is not None
+                and self._signature == _file_signature(self.path)
+                and self._journal_offset == self._journal_size())
+
+    def _refresh(self):
+        data = self.data
+        if (data is not None and self._signature == _file_signature(self.path)
+                and self._journal_size() > self._journal_offset):
+            # Same snapshot, longer journal: another process appended changes.
+            offset, applied = self._replay_journal(data, self._journal_offset)
+            self._journal_offset = offset
+            self._journal_entries += applied
+            return data
+        for attempt in range(DATA_WRITE_RETRIES):
+            signature = _file_signature(self.path)
+            data = self._read_file()
+            if data is None:
+                return self.data
+            if data is _NO_DATA:
+                return _NO_DATA
+            offset, applied = self._replay_journal(data, 0)
+            # A compaction that swapped the snapshot while we were reading means the
+            # journal we replayed may not belong to it; read the pair again.
+            if _file_signature(self.path) == signature:
+                break
+        self.data = data
+        self._signature = signature
+        self._journal_offset = offset
+        self._journal_entries = applied
+        return data
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return _NO_DATA
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("top-level value is not an object")
+            return self._upgrade(ensure_data_structure(data))
+        except ValueError as e:
+            print(f"Error reading {self.path}: {e}")
+            if self.data is not None:
+                # Keep serving the last good copy rather than replacing real data.
+                return None
+            # Nothing to fall back on: keep the damaged file for recovery and start fresh.
+            corrupt_path = f"{self.path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            try:
+                os.replace(self.path, corrupt_path)
+                print(f"Moved unreadable data file to {corrupt_path}")
+            except OSError:
+                print(f"Could not move {self.path} aside; refusing to overwrite it.")
+                raise
+            return _NO_DATA
+
+    def _replay_journal(self, data, offset):
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except OSError:
+            return offset, 0
+        # A line without its trailing newline is still being written; leave it for next time.
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        applied = 0
+        for line in complete.splitlines():
+            try:
+                _apply_change(data, json.loads(line))
+                applied += 1
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Skipping unreadable journal entry: {e}")
+        return offset + len(complete), applied
+
+    def _write_snapshot(self, data, base=None):
+        write_json_atomic(self.path, data)
+        # The snapshot now contains every journalled change.
+        with open(self.journal_path, 'wb'):
+            pass
+        self._signature = _file_signature(self.path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _append_changes(self, data, changes):
+        payload = ''.join(json.dumps(change, separators=(',', ':')) + '\n' for change in changes).encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.data is data:
+            self._journal_offset += len(payload)
+            self._journal_entries += len(changes)
+            if self._journal_entries >= JOURNAL_COMPACT_THRESHOLD:
+                self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, name='journal-compaction', daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self):
+        try:
+            with self.write_lock(exclusive=False):
+                self.save(self.load())
+        except Exception:
+            # The journal is left as it is and compaction is tried again later.
+            pass
+
+class SQLiteStorage(Storage):
+    # One table per record list, keyed by id, holding the record as JSON plus the
+    # fields we look records up by as indexed columns. Grades live in a
+    # (assignment_id, student_id) table; everything else at the top level of the
+    # data dict (version, schemaVersion, ...) lives in `meta`. Saves only write rows
+    # whose JSON changed. record_changes() updates the affected rows and appends to
+    # `changes`, which other processes replay instead of re-reading every table.
+    COLLECTIONS = {
+        'classes': {},
+        'students': {'uid': 'uid', 'email': 'email', 'roll_number': 'rollNumber', 'class_id': 'classId'},
+        'assignments': {},
+        'users': {'username': 'username'},
+        'feedbacks': {'uid': 'uid', 'faculty_id': 'faculty_id'},
+        'alerts': {'student_id': 'studentId', 'class_id': 'classId'},
+    }
+    NOCASE_COLUMNS = {'uid', 'email', 'roll_number', 'username'}
+
+    def __init__(self, path):
+        super().__init__(path + '.lock')
+        self.path = path
+        self._local = threading.local()
+        self._forget()
+        with self._connection() as conn:
+            self._create_schema(conn)
+
+    def _forget(self):
+        self._saved = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _SQLiteTransaction(conn)
+
+    def _create_schema(self, conn):
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        for table, columns in self.COLLECTIONS.items():
+            column_defs = ''.join(
+                f", {column} TEXT{' COLLATE NOCASE' if column in self.NOCASE_COLUMNS else ''}"
+                for column in columns)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, seq INTEGER NOT NULL, doc TEXT NOT NULL{column_defs})')
+            for column in columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})')
+        conn.execute('CREATE TABLE IF NOT EXISTS grades (assignment_id TEXT NOT NULL, student_id TEXT NOT NULL, score NUMERIC, '
+                     'PRIMARY KEY (assignment_id, student_id)) WITHOUT ROWID')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_grades_student ON grades(student_id)')
+        conn.execute('CREATE TABLE IF NOT EXISTS changes (version INTEGER PRIMARY KEY, change TEXT NOT NULL)')
+
+    def _meta(self, conn, key):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _stored_version(self):
+        with self._connection() as conn:
+            return self._meta(conn, 'version') or 0
+
+    def _is_current(self):
+        if self.data is None:
+            return False
+        with self._connection() as conn:
+            return self._meta(conn, 'version') == self.data.get('version')
+
+    def _refresh(self):
+        with self._connection() as conn:
+            # A read transaction gives a consistent view of meta, changes and tables.
+            conn.begin(immediate=False)
+            version = self._meta(conn, 'version')
+            if version is None:
+                return _NO_DATA
+            data = self.data
+            if (data is not None and version > data.get('version', 0)
+                    and (self._meta(conn, 'snapshotVersion') or 0) <= data.get('version', 0)):
+                # Only small edits since our copy: replay them.
+                changes = [json.loads(change) for (change,) in
+                           conn.execute('SELECT change FROM changes WHERE version > ? ORDER BY version', (data.get('version', 0),))]
+                for change in changes:
+                    _apply_change(data, change)
+                    self._track_change(conn, change)
+                return data
+            data = self._read_tables(conn)
+        self.data = data
+        return data
+
+    def _read_tables(self, conn):
+        data = {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM meta')}
+        data.pop('snapshotVersion', None)
+        saved = {'seq': {}, 'docs': {}, 'grades': {}, 'meta': {}}
+        for table in self.COLLECTIONS:
+            records = data[table] = []
+            saved['seq'][table] = {}
+            saved['docs'][table] = {}
+            for key, seq, doc in conn.execute(f'SELECT id, seq, doc FROM {table} ORDER BY seq'):
+                records.append(json.loads(doc))
+                saved['seq'][table][key] = seq
+                saved['docs'][table][key] = doc
+        grades = data['grades'] = {}
+        for assignment_id, student_id, score in conn.execute('SELECT assignment_id, student_id, score FROM grades'):
+            grades.setdefault(assignment_id, {})[student_id] = score
+            saved['grades'][(assignment_id, student_id)] = score
+        data = ensure_data_structure(data)
+        saved['meta'] = {key: json.dumps(value) for key, value in data.items()
+                         if key not in self.COLLECTIONS and key != 'grades'}
+        self._saved = saved
+        # After the baseline is taken, so the next save writes the migration back.
+        return self._upgrade(data)
+
+    def _record_row(self, table, record, seq, key, doc):
+        columns = self.COLLECTIONS[table]
+        values = [key, seq, doc] + [record.get(field) for field in columns.values()]
+        names = ', '.join(['id', 'seq', 'doc'] + list(columns))
+        marks = ', '.join('?' * len(values))
+        return f'INSERT OR REPLACE INTO {table} ({names}) VALUES ({marks})', values
+
+    def _write_snapshot(self, data, base=None):
+        saved = self._saved
+        with self._connection() as conn:
+            conn.begin()
+            if saved is None or self.data is not (data if base is None else base):
+                # No baseline to diff against: rewrite every table.
+                for table in list(self.COLLECTIONS) + ['grades', 'meta', 'changes']:
+                    conn.execute(f'DELETE FROM {table}')
+                saved = {'seq': {}, 'docs': {}, 'grades': {}, 'meta': {}}
+            new_saved = {'seq': {}, 'docs': {}, 'grades': {}, 'meta': {}}
+            for table in self.COLLECTIONS:
+                old_seq = saved['seq'].get(table, {})
+                old_docs = saved['docs'].get(table, {})
+                seqs = new_saved['seq'][table] = {}
+                docs = new_saved['docs'][table] = {}
+                next_seq = max(old_seq.values(), default=0) + 1
+                last_seq = 0
+                for position, record in enumerate(data.get(table, [])):
+                    key = str(record.get('id') or f'#{position}')
+                    if key in seqs:
+                        key = f'{key}#{position}'
+                    doc = json.dumps(record, separators=(',', ':'))
+                    seq = old_seq.get(key)
+                    if seq is None or seq <= last_seq:
+                        # New record, or the list was reordered: give it a later slot.
+                        seq = next_seq
+                        next_seq += 1
+                    if seq != old_seq.get(key) or doc != old_docs.get(key):
+                        conn.execute(*self._record_row(table, record, seq, key, doc))
+                    seqs[key] = seq
+                    docs[key] = doc
+                    last_seq = seq
+                removed = [(key,) for key in old_seq if key not in seqs]
+                conn.executemany(f'DELETE FROM {table} WHERE id = ?', removed)
+            grades = new_saved['grades']
+            for assignment_id, scores in data.get('grades', {}).items():
+                if isinstance(scores, dict):
+                    for student_id, score in scores.items():
+                        grades[(assignment_id, student_id)] = score
+            conn.executemany('INSERT OR REPLACE INTO grades (assignment_id, student_id, score) VALUES (?, ?, ?)',
+                             [(a, s, score) for (a, s), score in grades.items() if saved['grades'].get((a, s), _NO_DATA) != score])
+            conn.executemany('DELETE FROM grades WHERE assignment_id = ? AND student_id = ?',
+                             [key for key in saved['grades'] if key not in grades])
+            meta = new_saved['meta'] = {key: json.dumps(value) for key, value in data.items()
+                                        if key not in self.COLLECTIONS and key != 'grades'}
+            meta['snapshotVersion'] = json.dumps(data['version'])
+            conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                             [(key, value) for key, value in meta.items() if saved['meta'].get(key) != value])
+            conn.executemany('DELETE FROM meta WHERE key = ?', [(key,) for key in saved['meta'] if key not in meta])
+            conn.execute('DELETE FROM changes')
+        self._saved = new_saved
+
+    def _append_changes(self, data, changes):
+        with self._connection() as conn:
+            conn.begin()
+            for change in changes:
+                op = change['op']
+                if op == 'set_grade':
+                    if change.get('score') is not None:
+                        conn.execute('INSERT OR REPLACE INTO grades (assignment_id, student_id, score) VALUES (?, ?, ?)',
+                                     (change['assignment_id'], change['student_id'], change['score']))
+                    else:
+                        conn.execute('DELETE FROM grades WHERE assignment_id = ? AND student_id = ?',
+                                     (change['assignment_id'], change['student_id']))
+                elif op == 'set_overall_grade':
+                    student = get_index(data).students.get(change['student_id'])
+                    if student is not None:
+                        conn.execute('UPDATE students SET doc = ? WHERE id = ?',
+                                     (json.dumps(student, separators=(',', ':')), change['student_id']))
+                elif op == 'put_alert':
+                    alert = change['alert']
+                    row = conn.execute('SELECT seq FROM alerts WHERE id = ?', (alert['id'],)).fetchone()
+                    seq = row[0] if row else conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM alerts').fetchone()[0]
+                    conn.execute(*self._record_row('alerts', alert, seq, alert['id'], json.dumps(alert, separators=(',', ':'))))
+                elif op == 'remove_alert':
+                    conn.execute('DELETE FROM alerts WHERE id = ?', (change['alert_id'],))
+                elif op == 'add_feedback':
+                    feedback = change['feedback']
+                    seq = conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM feedbacks').fetchone()[0]
+                    conn.execute(*self._record_row('feedbacks', feedback, seq, feedback['id'], json.dumps(feedback, separators=(',', ':'))))
+                elif op == 'set_alerts_checked':
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('alertsCheckedThrough', ?)", (json.dumps(change['date']),))
+                else:
+                    raise ValueError(f"Unsupported change: {op}")
+                self._track_change(conn, change)
+                conn.execute('INSERT INTO changes (version, change) VALUES (?, ?)',
+                             (change['version'], json.dumps(change, separators=(',', ':'))))
+            conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                             [(key, json.dumps(data[key])) for key in ('version', 'updatedAt') if key in data])
+            if self._saved is not None:
+                for key in ('version', 'updatedAt'):
+                    if key in data:
+                        self._saved['meta'][key] = json.dumps(data[key])
+            # Keep the replay log short; readers further behind than this re-read the tables.
+            pruned = data['version'] - JOURNAL_COMPACT_THRESHOLD
+            if pruned > (self._meta(conn, 'snapshotVersion') or 0):
+                conn.execute('DELETE FROM changes WHERE version <= ?', (pruned,))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('snapshotVersion', ?)", (json.dumps(pruned),))
+
+    # Rows written by a change (here or in another process) must be in the diff
+    # baseline too, or the next snapshot would neither rewrite nor delete them.
+    def _track_change(self, conn, change):
+        saved = self._saved
+        if saved is None:
+            return
+        op = change['op']
+        if op == 'set_grade':
+            key = (change['assignment_id'], change['student_id'])
+            if change.get('score') is not None:
+                saved['grades'][key] = change['score']
+            else:
+                saved['grades'].pop(key, None)
+            return
+        if op == 'set_alerts_checked':
+            saved['meta']['alertsCheckedThrough'] = json.dumps(change['date'])
+            return
+        if op == 'set_overall_grade':
+            table, key = 'students', change['student_id']
+        elif op == 'put_alert':
+            table, key = 'alerts', change['alert']['id']
+        elif op == 'remove_alert':
+            table, key = 'alerts', change['alert_id']
+        elif op == 'add_feedback':
+            table, key = 'feedbacks', change['feedback']['id']
+        else:
+            return
+        row = conn.execute(f'SELECT seq, doc FROM {table} WHERE id = ?', (key,)).fetchone()
+        if row is None:
+            saved['seq'].get(table, {}).pop(key, None)
+            saved['docs'].get(table, {}).pop(key, None)
+        else:
+            saved['seq'].setdefault(table, {})[key] = row[0]
+            saved['docs'].setdefault(table, {})[key] = row[1]
+
+class _SQLiteTransaction:
+    # `with` wrapper around a connection: begin() opens a write-capable transaction
+    # that is committed on success and rolled back on error.
+    def __init__(self, conn):
+        self.conn = conn
+        self.active = False
+
+    def begin(self, immediate=True):
+        self.conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        self.active = True
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.active:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+            self.active = False
+        return False
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def write_json_atomic(path, payload):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+# --- Change Journal ---
+# Small edits are described as change records so every backend can persist and
+# replay them without rewriting the whole store.
+def _apply_change(data, change):
+    if change.get('version', 0) <= data.get('version', 0):
+        # Already contained in the snapshot (the journal outlived a compaction).
+        return
+    data['version'] = change['version']
+    if 'updatedAt' in change:
+        data['updatedAt'] = change['updatedAt']
+    op = change.get('op')
+    if op == 'set_grade':
+        get_index(data).set_grade(change['assignment_id'], change['student_id'], change.get('score'))
+    elif op == 'set_overall_grade':
+        index = get_index(data)
+        student = index.students.get(change['student_id'])
+        if student is not None:
+            index.set_overall_grade(student, change['grade'])
+    elif op == 'put_alert':
+        get_index(data).put_alert(change['alert'])
+    elif op == 'remove_alert':
+        get_index(data).delete_alert(change['alert_id'])
+    elif op == 'set_alerts_checked':
+        data['alertsCheckedThrough'] = change['date']
+    elif op == 'add_feedback':
+        data.setdefault('feedbacks', []).append(change['feedback'])
+        get_index(data).add_feedback(change['feedback'])
+
+def create_storage(backend=STORAGE_BACKEND):
+    if backend == 'sqlite':
+        return SQLiteStorage(SQLITE_FILE)
+    return JSONFileStorage(DATA_FILE)
+
+STORAGE = create_storage()
+
+def load_data():
+    return STORAGE.load()
+
+def save_data(data, replace=False, base=None):
+    STORAGE.save(data, replace, base)
+
+def record_changes(data, changes):
+    STORAGE.record_changes(data, changes)
+
+def data_write_lock(exclusive=True):
+    return STORAGE.write_lock(exclusive)
+
+def invalidate_data_cache():
+    STORAGE.invalidate()
+
+# Cheap shape check run whenever data.json is (re)parsed. It never scans the photo
+# directory or writes the file.
+def ensure_data_structure(data):
+    required_keys = {'classes': [], 'students': [], 'alerts': [], 'assignments': [], 'grades': {}, 'users': [], 'feedbacks': []}
+    
+    for key, default in required_keys.items():
+        current_value = data.get(key)
+        if current_value is None:
+            data[key] = default
+        elif key == 'grades' and not isinstance(current_value, dict):
+            data[key] = default
+        elif key != 'grades' and not isinstance(current_value, list):
+            data[key] = default
+        elif isinstance(current_value, list):
+            valid_items = [item for item in current_value if isinstance(item, dict)]
+            if len(valid_items) != len(current_value):
+                data[key] = valid_items
+    return data
+
+# Sample classes, students and logins, written by Storage.load() when there is no
+# store yet.
+def create_default_data():
+    default_data = {"schemaVersion": SCHEMA_VERSION, "classes": [], "students": [], "alerts": [], "assignments": [], "grades": {}, "users": [], "feedbacks": []}
+    
+    default_data["users"] = [
+        {"id": "u1", "username": "admin", "passwordHash": hash_password("admin123"), "role": "admin", "name": "Super Admin"},
+        {"id": "u2", "username": "teacher", "passwordHash": hash_password("teacher123"), "role": "faculty", "name": "Demo Faculty"}
+    ]
+    
+    class_id_c = 1
+    student_id_c = 1
+    for grade in CLASSES:
+        for section in SECTIONS:
+            c_id = f"c{class_id_c}"
+            class_data = {
+                "id": c_id,
+                "name": f"Grade {grade}",
+                "section": section,
+                "studentCount": 5,
+                "color": SECTION_COLOR_MAP.get(section, 'bg-gray-500'),
+                "grade": grade,
+                "campus": DEFAULT_CAMPUS
+            }
+            default_data["classes"].append(class_data)
+            for i in range(1, 6):
+                s_id = f"s{student_id_c}"
+                student = {
+                    "id": s_id,
+                    "classId": c_id,
+                    "name": f"Student {student_id_c}",
+                    "email": f"student{student_id_c}@school.edu",
+                    "overallGrade": 70 + (student_id_c % 30),
+                    "status": "Active",
+                    "lastMilestone": "Initial Setup",
+                    "uid": f"UID{1000 + student_id_c}",
+                    "rollNumber": f"ROLL{student_id_c:03d}",
+                    "campus": DEFAULT_CAMPUS,
+                    "photo": f"/static/avatars/student{(student_id_c % 5) + 1}.jpg",
+                    "parentPhone": "+91 98765 43210",
+                    "joinDate": datetime.now().strftime('%Y-%m-%d'),
+                    "roboticsTeam": f"Team {section}",
+                    "skills": DEFAULT_SKILLS.copy()
+                }
+                student['status'] = get_status_from_grade(student['overallGrade'])
+                default_data["students"].append(student)
+                student_id_c += 1
+            class_id_c += 1
+    default_data["alerts"] = [
+        {"id": "a1", "studentId": "s5", "classId": "c1", "issue": "Low score on Quiz 1", "type": "grade"},
+        {"id": "a2", "studentId": "s12", "classId": "c3", "issue": "Overall grade dropped below 60%", "type": "grade"},
+        {"id": "a3", "studentId": "s25", "classId": "c5", "issue": "Project 'RoboDesign' overdue", "type": "assignment"}
+    ]
+    default_data["assignments"] = [
+        {"id": "as1", "classIds": ["c1"], "title": "Intro Circuit Lab", "dueDate": (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'), "totalPoints": 50, "type": "Lab"},
+        {"id": "as2", "classIds": ["c1", "c2"], "title": "Unit 1 Test", "dueDate": (datetime.now() + timedelta(days=5)).strftime('%Y-%m-%d'), "totalPoints": 100, "type": "Test"},
+        {"id": "as3", "classIds": ["c3"], "title": "Algorithm Quiz", "dueDate": (datetime.now() + timedelta(days=9)).strftime('%Y-%m-%d'), "totalPoints": 20, "type": "Quiz"}
+    ]
+    default_data["grades"] = {
+        "as1": {"s1": 40, "s2": 45, "s3": 35},
+        "as2": {"s1": 78, "s2": 85, "s4": 91, "s6": 72},
+        "as3": {"s11": 15, "s12": 18}
+    }
+    previous = STORAGE.data
+    default_data['version'] = previous.get('version', 0) if previous else 0
+    save_data(default_data, replace=True)
+    return default_data
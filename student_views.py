@@ -0,0 +1,47 @@
+from datetime import datetime
+from constants import DEFAULT_DATE_SORT_KEY, DEFAULT_SKILLS
+from index import get_status_from_grade
+from attendance import load_attendance
+
+# --- Student Assignment Views ---
+# One place that turns a student into what the profile and report pages show:
+# the student with class details filled in, their class's assignments (due-date
+# order, cached per data version on the index) joined with their scores from
+# index.grades_by_student, graded/missing/pending counts and the average score.
+# Unscored work is Missing once its due date has passed. The student's attendance
+# summary rides along on the view.
+def build_student_view(index, student, today=None, attendance=None):
+    # Callers looping over many students refresh the attendance log once and pass it in.
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    attendance = attendance if attendance is not None else load_attendance()
+    student_id = student.get('id')
+    view = student.copy()
+    student_class = index.classes.get(student.get('classId'), {})
+    view['className'] = f"{student_class.get('name', '')} - {student_class.get('section', '')}"
+    view['campus'] = student_class.get('campus', student.get('campus', 'N/A'))
+    view['status'] = get_status_from_grade(student.get('overallGrade', 0))
+    view['skills'] = student.get('skills', DEFAULT_SKILLS.copy())
+    view['attendance'] = attendance.summary([student_id])
+    scores = index.student_grades(student_id)
+    summary = {'total': 0, 'graded': 0, 'missing': 0, 'pending': 0, 'average': None}
+    percentages = []
+    assignments = []
+    for assignment in index.sorted_class_assignments(student.get('classId')):
+        score = scores.get(assignment['id'])
+        total_points = assignment.get('totalPoints')
+        percentage = None
+        if isinstance(score, (int, float)) and isinstance(total_points, (int, float)) and total_points > 0:
+            percentage = round(score / total_points * 100)
+            percentages.append(score / total_points * 100)
+        if score is not None:
+            work_status = 'Graded'
+        elif str(assignment.get('dueDate') or DEFAULT_DATE_SORT_KEY) < today:
+            work_status = 'Missing'
+        else:
+            work_status = 'Pending'
+        summary['total'] += 1
+        summary[work_status.lower()] += 1
+        assignments.append(dict(assignment, score=score, percentage=percentage, workStatus=work_status))
+    if percentages:
+        summary['average'] = round(sum(percentages) / len(percentages))
+    return view, assignments, summary
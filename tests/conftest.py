@@ -0,0 +1,41 @@
+import copy
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.py keeps its data files in the working directory; give it a scratch one.
+os.chdir(tempfile.mkdtemp(prefix='sms-tests-'))
+os.environ.setdefault('ALERT_SWEEP_INTERVAL', '0')
+
+from app import app  # noqa: E402
+from storage import JSONFileStorage, SQLiteStorage, load_data  # noqa: E402
+
+
+@pytest.fixture
+def seed_data():
+    return copy.deepcopy(load_data())
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmp_path, seed_data):
+    if request.param == 'sqlite':
+        store = SQLiteStorage(str(tmp_path / 'data.sqlite3'))
+    else:
+        store = JSONFileStorage(str(tmp_path / 'data.json'))
+    store.save(seed_data, replace=True)
+    return store
+
+
+def reopen(store):
+    # A second handle on the same files, as another worker process would have.
+    return type(store)(store.path)
+
+
+@pytest.fixture
+def client():
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
@@ -0,0 +1,73 @@
+from alerts import (ALERT_ATTENDANCE_MIN_DAYS, ALERT_GRADE_THRESHOLD, alert_key, apply_alert_changes,
+                    evaluate_student_alerts)
+from attendance import AttendanceStore
+from conftest import reopen
+from index import DataIndex
+
+# Nothing in the seed data is due before this, so no work counts as missing.
+TODAY = '2000-01-01'
+
+
+def _rule_changes(changes, rule):
+    return [c for c in changes
+            if c['op'] == 'remove_alert' or c['alert'].get('rule') == rule]
+
+
+def test_low_grade_alert_is_raised_once_and_cleared(seed_data, tmp_path):
+    attendance = AttendanceStore(str(tmp_path / 'data.attendance'))
+    seed_data['alerts'] = []
+    student = seed_data['students'][0]
+    student['overallGrade'] = ALERT_GRADE_THRESHOLD - 1
+    index = DataIndex(seed_data)
+
+    changes = evaluate_student_alerts(index, student['id'], TODAY, attendance)
+    raised = _rule_changes(changes, 'low_grade')
+    assert [c['op'] for c in raised] == ['put_alert']
+    assert raised[0]['alert']['key'] == alert_key(student['id'], 'low_grade')
+    apply_alert_changes(index, changes)
+    assert [a['rule'] for a in seed_data['alerts'] if a['studentId'] == student['id']].count('low_grade') == 1
+    assert evaluate_student_alerts(index, student['id'], TODAY, attendance) == []
+
+    student['overallGrade'] = ALERT_GRADE_THRESHOLD + 20
+    changes = evaluate_student_alerts(index, student['id'], TODAY, attendance)
+    alert_id = index.alerts_by_key[alert_key(student['id'], 'low_grade')]['id']
+    assert {'op': 'remove_alert', 'alert_id': alert_id} in changes
+    apply_alert_changes(index, changes)
+    assert not [a for a in seed_data['alerts'] if a.get('rule') == 'low_grade' and a['studentId'] == student['id']]
+
+
+def test_low_attendance_alert_follows_the_marks(seed_data, tmp_path):
+    attendance = AttendanceStore(str(tmp_path / 'data.attendance'))
+    seed_data['alerts'] = []
+    student = seed_data['students'][0]
+    student['overallGrade'] = 90
+    index = DataIndex(seed_data)
+    days = [f"2025-01-{d:02d}" for d in range(6, 6 + ALERT_ATTENDANCE_MIN_DAYS)]
+    attendance.mark([(student['id'], day, 'absent') for day in days])
+
+    changes = evaluate_student_alerts(index, student['id'], TODAY, attendance)
+    assert [c['alert']['rule'] for c in changes] == ['low_attendance']
+    apply_alert_changes(index, changes)
+
+    attendance.mark([(student['id'], day, 'present') for day in days])
+    changes = evaluate_student_alerts(index, student['id'], TODAY, attendance)
+    assert changes == [{'op': 'remove_alert', 'alert_id': index.alerts_by_key[alert_key(student['id'], 'low_attendance')]['id']}]
+
+
+def test_alerts_persist_through_record_changes(storage, tmp_path):
+    attendance = AttendanceStore(str(tmp_path / 'data.attendance'))
+    with storage.write_lock():
+        data = storage.load()
+        student = next(s for s in data['students'] if s['id'] not in {a.get('studentId') for a in data['alerts']})
+        student['overallGrade'] = ALERT_GRADE_THRESHOLD - 1
+        storage.save(data)
+        changes = evaluate_student_alerts(DataIndex(data), student['id'], TODAY, attendance)
+        storage.record_changes(data, changes)
+    stored = [a for a in reopen(storage).load()['alerts'] if a['studentId'] == student['id']]
+    assert [a['rule'] for a in stored] == ['low_grade']
+    with storage.write_lock():
+        data = storage.load()
+        next(s for s in data['students'] if s['id'] == student['id'])['overallGrade'] = 95
+        storage.save(data)
+        storage.record_changes(data, evaluate_student_alerts(DataIndex(data), student['id'], TODAY, attendance))
+    assert not [a for a in reopen(storage).load()['alerts'] if a['studentId'] == student['id']]
@@ -0,0 +1,50 @@
+from attendance import ATTENDANCE_CODES, AttendanceStore, attendance_date, attendance_day
+
+
+def test_marks_round_trip_through_the_log(tmp_path):
+    path = str(tmp_path / 'data.attendance')
+    store = AttendanceStore(path)
+    store.mark([('s1', '2025-01-06', 'present'), ('s1', '2025-01-07', 'absent'),
+                ('s12', '2025-01-06', 'late'), ('s1', '2025-01-03', 'excused')])
+    assert len(open(path, 'rb').read()) == 4 * AttendanceStore.RECORD.size
+    reader = AttendanceStore(path)
+    reader.refresh()
+    days = [attendance_day(d) for d in ('2025-01-03', '2025-01-06', '2025-01-07', '2025-01-08')]
+    assert list(reader.statuses('s1', days).values()) == ['excused', 'present', 'absent', 'not-recorded']
+    assert reader.statuses('s12', days)[days[1]] == 'late'
+    assert [attendance_date(d) for d in reader.recorded_days(['s1'])] == ['2025-01-03', '2025-01-06', '2025-01-07']
+    summary = reader.summary(['s1'])
+    assert (summary['present'], summary['absent'], summary['excused'], summary['recorded'], summary['rate']) == (1, 1, 1, 3, 50)
+
+
+def test_later_marks_win_and_compaction_keeps_them(tmp_path):
+    path = str(tmp_path / 'data.attendance')
+    store = AttendanceStore(path)
+    store.mark([('s3', '2025-02-03', 'absent')])
+    store.mark([('s3', '2025-02-03', 'present'), ('s4', '2025-02-03', 'absent')])
+    store.forget(['s4'])
+    day = attendance_day('2025-02-03')
+    assert store.statuses('s3', [day])[day] == 'present'
+    assert store.records == 4
+    store.compact()
+    assert store.records == 1
+    reader = AttendanceStore(path)
+    reader.refresh()
+    assert reader.statuses('s3', [day])[day] == 'present'
+    assert reader.statuses('s4', [day])[day] == 'not-recorded'
+    assert reader.summary(['s4'])['recorded'] == 0
+
+
+def test_trailing_partial_record_is_ignored(tmp_path):
+    path = str(tmp_path / 'data.attendance')
+    record = AttendanceStore.RECORD.pack(7, attendance_day('2025-03-03'), ATTENDANCE_CODES['late'])
+    with open(path, 'wb') as f:
+        f.write(record + record[:3])
+    store = AttendanceStore(path)
+    store.refresh()
+    assert store.records == 1
+    with open(path, 'ab') as f:
+        f.write(record[3:])
+    store.refresh()
+    assert store.records == 2
+    assert store.summary(['s7'])['late'] == 1
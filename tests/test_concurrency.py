@@ -0,0 +1,89 @@
+import threading
+import time
+
+from app import app
+from constants import DEFAULT_CAMPUS
+from storage import STORAGE, data_write_lock, load_data, record_changes
+
+
+def test_in_place_writer_waits_for_readers():
+    events = []
+    reading = threading.Event()
+
+    def reader():
+        STORAGE.begin_read()
+        reading.set()
+        time.sleep(0.2)
+        events.append('read done')
+        STORAGE.end_read()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    reading.wait()
+    with data_write_lock():
+        events.append('write')
+    thread.join()
+    assert events == ['read done', 'write']
+
+
+def test_copy_writer_does_not_wait_for_readers():
+    STORAGE.begin_read()
+    try:
+        finished = threading.Event()
+
+        def writer():
+            with data_write_lock(exclusive=False):
+                finished.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        assert finished.wait(2)
+        thread.join()
+    finally:
+        STORAGE.end_read()
+
+
+def test_reader_that_writes_does_not_deadlock():
+    STORAGE.begin_read()
+    try:
+        pinned = load_data()
+        with data_write_lock():
+            data = load_data()
+            record_changes(data, [{'op': 'set_alerts_checked', 'date': '2000-01-01'}])
+        assert load_data() is pinned
+    finally:
+        STORAGE.end_read()
+    assert load_data().get('alertsCheckedThrough') == '2000-01-01'
+
+
+def test_readers_never_see_a_write_half_applied(client):
+    class_id = load_data()['classes'][0]['id']
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        reader = app.test_client()
+        reader.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        while not stop.is_set():
+            for url in ('/', '/students', '/api/alerts', '/api/attendance/summary'):
+                status = reader.get(url).status_code
+                if status >= 500:
+                    errors.append((url, status))
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    try:
+        for n in range(15):
+            ids = []
+            for i in range(5):
+                response = client.post('/add_student', json={
+                    'name': f'Load {n}-{i}', 'email': f'load{n}-{i}@example.com', 'classId': class_id,
+                    'uid': f'LOAD{n}-{i}', 'rollNumber': f'LOADR{n}-{i}', 'campus': DEFAULT_CAMPUS})
+                ids.append(response.get_json()['student_id'])
+            assert client.post('/delete_students_bulk', json={'student_ids': ids}).status_code == 200
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+    assert errors == []
@@ -0,0 +1,54 @@
+import time
+
+from app import app
+from storage import load_data
+
+
+def _touch(client):
+    student = load_data()['students'][0]
+    assert client.post('/update_grade', json={'student_id': student['id'], 'new_grade': 80}).status_code == 200
+
+
+def test_unchanged_version_answers_304(client):
+    response = client.get('/api/get_classes')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"v') and etag.endswith('-admin"')
+    assert 'Cookie' in response.headers['Vary']
+    assert client.get('/api/get_classes', headers={'If-None-Match': etag}).status_code == 304
+    _touch(client)
+    assert client.get('/api/get_classes', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_depends_on_role(client):
+    etag = client.get('/api/students?format=html').headers['ETag']
+    faculty = app.test_client()
+    faculty.post('/login', data={'username': 'teacher', 'password': 'teacher123'})
+    response = faculty.get('/api/students?format=html', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_no_last_modified_within_the_write_second(client):
+    _touch(client)
+    if load_data()['updatedAt'] < int(time.time()):
+        # The clock ticked over between the write and this request; try once more.
+        _touch(client)
+    response = client.get('/api/get_classes')
+    if load_data()['updatedAt'] == int(time.time()):
+        assert 'Last-Modified' not in response.headers
+    time.sleep(1.05)
+    response = client.get('/api/get_classes')
+    assert 'Last-Modified' in response.headers
+    since = response.headers['Last-Modified']
+    assert client.get('/api/get_classes', headers={'If-Modified-Since': since}).status_code == 304
+    _touch(client)
+    assert client.get('/api/get_classes', headers={'If-Modified-Since': since}).status_code == 200
+
+
+def test_if_none_match_wins_over_if_modified_since(client):
+    time.sleep(1.05)
+    response = client.get('/api/get_classes')
+    since = response.headers['Last-Modified']
+    response = client.get('/api/get_classes', headers={'If-None-Match': 'W/"v0-admin"', 'If-Modified-Since': since})
+    assert response.status_code == 200
@@ -0,0 +1,82 @@
+import io
+import os
+import time
+import uuid
+
+from imports import IMPORT_JOB_DIR, import_job_path, read_import_job, run_import_job
+from storage import load_data
+
+HEADER = 'UID,Student Name,Email,Class Name,Section,Campus,Parent Phone\n'
+
+
+def _csv(tag):
+    klass = load_data()['classes'][0]
+    existing = load_data()['students'][0]
+    where = f"{klass['name']},{klass['section']},{klass['campus']}"
+    return HEADER + ''.join([
+        f"U{tag}1,New One,{tag}1@example.com,{where},+91 98765 43210\n",
+        f"U{tag}2,New Two,{tag}2@example.com,{where},not-a-phone\n",
+        f"{existing['uid']},Clash,{tag}3@example.com,{where},\n",
+        f"U{tag}4,Dup Email,{tag}1@example.com,{where},\n",
+        f"U{tag}5,Nowhere,{tag}5@example.com,No Such Class,Z,{klass['campus']},\n",
+    ])
+
+
+def _run(text, dry_run):
+    os.makedirs(IMPORT_JOB_DIR, exist_ok=True)
+    job = {'id': uuid.uuid4().hex, 'filename': 'students.csv', 'dry_run': dry_run}
+    path = import_job_path(job['id'], '.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    job['bytes_total'] = os.path.getsize(path)
+    run_import_job(job)
+    return read_import_job(job['id'])
+
+
+def _uids():
+    return {s['uid'] for s in load_data()['students']}
+
+
+def test_dry_run_reports_without_saving():
+    tag = uuid.uuid4().hex[:8]
+    version = load_data()['version']
+    job = _run(_csv(tag), dry_run=True)
+    assert job['status'] == 'completed'
+    assert job['added'] == 0
+    assert job['summary']['rows'] == 5
+    assert job['summary']['valid_rows'] == 2
+    assert job['summary']['issues'] == {'invalid_phone': 1, 'duplicate_uid': 1, 'duplicate_email_in_file': 1, 'unknown_class': 1}
+    assert load_data()['version'] == version
+    assert not {f"U{tag}1", f"U{tag}2"} & _uids()
+
+
+def test_commit_adds_the_valid_rows():
+    tag = uuid.uuid4().hex[:8]
+    before = len(load_data()['students'])
+    job = _run(_csv(tag), dry_run=False)
+    assert job['status'] == 'completed'
+    assert job['added'] == 2
+    assert job['summary']['valid_rows'] == 2
+    assert len(load_data()['students']) == before + 2
+    assert {f"U{tag}1", f"U{tag}2"} <= _uids()
+    assert not {f"U{tag}4", f"U{tag}5"} & _uids()
+    with open(import_job_path(job['id'], '.errors.csv'), encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 1 + job['error_count']
+
+
+def test_upload_route_runs_a_dry_run_job(client):
+    tag = uuid.uuid4().hex[:8]
+    response = client.post('/upload_students_csv', data={
+        'dry_run': 'true', 'student_csv': (io.BytesIO(_csv(tag).encode('utf-8')), 'students.csv')})
+    assert response.status_code == 202
+    status_url = response.json['status_url']
+    for _ in range(100):
+        job = client.get(status_url).json
+        if job['status'] in ('completed', 'failed'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'completed'
+    assert job['dry_run'] is True
+    assert job['summary']['valid_rows'] == 2
+    assert client.get(job['errors_url']).status_code == 200
+    assert f"U{tag}1" not in _uids()
@@ -0,0 +1,62 @@
+import json
+import os
+
+import storage
+from conftest import reopen
+
+
+def _grade_change(data, score):
+    assignment = data['assignments'][0]
+    class_id = assignment['classIds'][0]
+    student_id = next(s['id'] for s in data['students'] if s['classId'] == class_id)
+    return {'op': 'set_grade', 'assignment_id': assignment['id'], 'student_id': student_id, 'score': score}
+
+
+def _json_storage(tmp_path, seed_data):
+    store = storage.JSONFileStorage(str(tmp_path / 'data.json'))
+    store.save(seed_data, replace=True)
+    return store
+
+
+def test_changes_are_journalled_and_replayed(tmp_path, seed_data):
+    store = _json_storage(tmp_path, seed_data)
+    other = reopen(store)
+    other.load()
+    snapshot = os.path.getmtime(store.path), os.path.getsize(store.path)
+    with store.write_lock():
+        data = store.load()
+        change = _grade_change(data, 42)
+        store.record_changes(data, [change])
+    assert (os.path.getmtime(store.path), os.path.getsize(store.path)) == snapshot
+    assert os.path.getsize(store.journal_path) > 0
+    for handle in (other, reopen(store)):
+        assert handle.load()['grades'][change['assignment_id']][change['student_id']] == 42
+
+
+def test_partly_written_journal_line_waits_for_its_newline(tmp_path, seed_data):
+    store = _json_storage(tmp_path, seed_data)
+    data = store.load()
+    change = dict(_grade_change(data, 17), version=data['version'] + 1)
+    line = json.dumps(change).encode('utf-8') + b'\n'
+    with open(store.journal_path, 'ab') as f:
+        f.write(line[:10])
+    reader = reopen(store)
+    assert reader.load()['grades'][change['assignment_id']].get(change['student_id']) != 17
+    with open(store.journal_path, 'ab') as f:
+        f.write(line[10:])
+    assert reader.load()['grades'][change['assignment_id']][change['student_id']] == 17
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path, seed_data, monkeypatch):
+    monkeypatch.setattr(storage, 'JOURNAL_COMPACT_THRESHOLD', 3)
+    store = _json_storage(tmp_path, seed_data)
+    with store.write_lock():
+        data = store.load()
+        for score in (1, 2, 3):
+            change = _grade_change(data, score)
+            store.record_changes(data, [change])
+    store._compaction_thread.join(10)
+    assert os.path.getsize(store.journal_path) == 0
+    with open(store.path, encoding='utf-8') as f:
+        assert json.load(f)['grades'][change['assignment_id']][change['student_id']] == 3
+    assert reopen(store).load()['grades'][change['assignment_id']][change['student_id']] == 3
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from migrations import SCHEMA_VERSION
+from passwords import verify_password
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _old_store(tmp_path):
+    # Schema 1: no schemaVersion and plaintext passwords, like the shipped data.json.
+    with open(os.path.join(ROOT, 'data.json'), encoding='utf-8') as f:
+        data = json.load(f)
+    data.pop('schemaVersion', None)
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+def _run(tmp_path, code):
+    env = dict(os.environ, PYTHONPATH=ROOT, ALERT_SWEEP_INTERVAL='0')
+    return subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def test_importing_the_app_writes_nothing(tmp_path):
+    path = _old_store(tmp_path)
+    before = path.read_bytes()
+    _run(tmp_path, 'import app')
+    assert path.read_bytes() == before
+    assert sorted(os.listdir(tmp_path)) == ['data.json']
+
+
+def test_migrate_data_hashes_passwords_and_persists(tmp_path):
+    path = _old_store(tmp_path)
+    output = _run(tmp_path, "import app; app.app.test_cli_runner().invoke(args=['migrate-data'])\n"
+                            "print(app.app.test_cli_runner().invoke(args=['migrate-data']).output)")
+    assert f'version {SCHEMA_VERSION} (was {SCHEMA_VERSION})' in output
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['schemaVersion'] == SCHEMA_VERSION
+    for user in data['users']:
+        assert 'password' not in user
+        assert user['passwordHash'] != 'admin123'
+    admin = next(u for u in data['users'] if u['username'] == 'admin')
+    assert verify_password(admin, 'admin123')
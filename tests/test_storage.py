@@ -0,0 +1,89 @@
+import pytest
+
+from alerts import alert_key
+from conftest import reopen
+from index import get_index
+from storage import STORAGE, load_data
+
+
+def _student_with_assignment(data):
+    index = get_index(data)
+    for assignment in data['assignments']:
+        for class_id in assignment.get('classIds', []):
+            for student_id in index.students_by_class.get(class_id, {}):
+                return student_id, assignment['id']
+    raise AssertionError('seed data has no graded class')
+
+
+def _alert(data, student_id):
+    index = get_index(data)
+    return {'id': index.next_id('a'), 'studentId': student_id, 'classId': index.students[student_id]['classId'],
+            'type': 'grade', 'rule': 'low_grade', 'key': alert_key(student_id, 'low_grade'), 'issue': 'test'}
+
+
+def _delete_student(data, student_id):
+    data['students'] = [s for s in data['students'] if s['id'] != student_id]
+    data['alerts'] = [a for a in data['alerts'] if a.get('studentId') != student_id]
+    for scores in data['grades'].values():
+        scores.pop(student_id, None)
+
+
+def test_changed_rows_are_deleted_by_the_next_snapshot(storage):
+    with storage.write_lock():
+        data = storage.load()
+        student_id, assignment_id = _student_with_assignment(data)
+        storage.record_changes(data, [
+            {'op': 'set_grade', 'assignment_id': assignment_id, 'student_id': student_id, 'score': 5},
+            {'op': 'put_alert', 'alert': _alert(data, student_id)},
+        ])
+        _delete_student(data, student_id)
+        storage.save(data)
+    fresh = reopen(storage).load()
+    assert student_id not in {s['id'] for s in fresh['students']}
+    assert not [a for a in fresh['alerts'] if a.get('studentId') == student_id]
+    assert student_id not in fresh['grades'].get(assignment_id, {})
+
+
+def test_changes_replayed_from_another_process_are_deleted_too(storage):
+    other = reopen(storage)
+    other.load()
+    with storage.write_lock():
+        data = storage.load()
+        student_id, assignment_id = _student_with_assignment(data)
+        storage.record_changes(data, [
+            {'op': 'set_grade', 'assignment_id': assignment_id, 'student_id': student_id, 'score': 5},
+            {'op': 'put_alert', 'alert': _alert(data, student_id)},
+        ])
+    with other.write_lock():
+        data = other.load()
+        assert [a for a in data['alerts'] if a.get('studentId') == student_id]
+        _delete_student(data, student_id)
+        other.save(data)
+    fresh = reopen(storage).load()
+    assert not [a for a in fresh['alerts'] if a.get('studentId') == student_id]
+    assert student_id not in fresh['grades'].get(assignment_id, {})
+
+
+def test_failed_save_raises_and_drops_the_cache(storage, monkeypatch):
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(storage, '_write_snapshot', fail)
+    with storage.write_lock():
+        data = storage.load()
+        data['classes'][0]['name'] = 'Never saved'
+        with pytest.raises(OSError):
+            storage.save(data)
+    monkeypatch.undo()
+    assert storage.data is None
+    assert storage.load()['classes'][0]['name'] != 'Never saved'
+
+
+def test_route_reports_a_failed_save(client, monkeypatch):
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(STORAGE, '_write_snapshot', fail)
+    student = load_data()['students'][0]
+    response = client.post(f"/delete_student/{student['id']}")
+    monkeypatch.undo()
+    assert response.status_code == 500
+    assert student['id'] in get_index(load_data()).students